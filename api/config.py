@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import List
+from typing import Dict, List
 
 try:
     from pydantic_settings import BaseSettings
@@ -14,6 +14,28 @@ class APISettings(BaseSettings):
     cors_allow_credentials: bool = False
     cors_allow_methods: List[str] = ["*"]
     cors_allow_headers: List[str] = ["*"]
+    # Inference worker pools: blocking model calls run here, off the event loop.
+    # queue_depth is how many requests may wait for a free worker before we answer 503.
+    asr_workers: int = 1
+    asr_queue_depth: int = 4
+    llm_workers: int = 1
+    llm_queue_depth: int = 4
+    retry_after_s: int = 5
+    # Multi-turn chat sessions (in memory only): idle expiry and max concurrent conversations
+    session_ttl_s: float = 900.0
+    session_max_count: int = 16
+    # Model registry: extra Whisper names/paths and named Qwen snapshot dirs selectable per request
+    # via ?asr_model= / ?llm_model=. Loaded on first use; idle ones are evicted LRU to stay
+    # under model_memory_mb (0 = no limit).
+    asr_models: List[str] = []
+    llm_models: Dict[str, str] = {}
+    model_memory_mb: float = 0.0
+    # Startup loads the default models in the background; until then /readyz answers 503.
+    # Requests for a model still loading wait up to model_wait_s, then get 503 (0 = fail fast).
+    preload_models: bool = True
+    model_wait_s: float = 30.0
+    # /api/asr-llm: prefill the LLM on transcript segments while later ones are still decoding
+    pipelined_asr_llm: bool = True
 
     class Config:
         env_prefix = "NEZHA_LLM_API_"
@@ -1,19 +1,136 @@
 from __future__ import annotations
-from typing import Optional
+from dataclasses import replace
+from functools import partial
+from operator import methodcaller
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+from fastapi import HTTPException, Query, status
+from asr.batching import ASRBatcher
+from asr.config import config as asr_config
+from asr.faster_whisper_backend import FasterWhisperBackend
+from asr.replicas import ASRReplicaPool
 from asr.service import ASRService
+from llm.batching import LLMBatcher
+from llm.continuous import ContinuousBatcher
+from llm.config import DEFAULT_LLM_CONFIG, LLMConfig
 from llm.service import LLMService
+from llm.sessions import SessionStore
+from .config import settings
+from .executor import InferenceExecutor
+from .registry import ModelNotReady, ModelRegistry, ModelSpec
 
-_asr_service: Optional[ASRService] = None
-_llm_service: Optional[LLMService] = None
+_model_registry: Optional[ModelRegistry] = None
+_asr_executor: Optional[InferenceExecutor] = None
+_llm_executor: Optional[InferenceExecutor] = None
+_session_store: Optional[SessionStore] = None
 
-def get_asr_service() -> ASRService:
-    global _asr_service
-    if _asr_service is None:
-        _asr_service = ASRService()
-    return _asr_service
+def build_asr_service(model_name: str) -> ASRService:
+    # Several model replicas in worker processes scale with cores; one in-process model otherwise
+    if asr_config.replicas > 1:
+        backend = ASRReplicaPool(model_name=model_name)
+    else:
+        backend = FasterWhisperBackend(model_name=model_name)
+    # Concurrent uploads share batched encoder/decoder passes
+    if asr_config.max_batch_size > 1:
+        backend = ASRBatcher(backend, max_batch_size=asr_config.max_batch_size, max_wait_ms=asr_config.batch_wait_ms)
+    return ASRService(backend=backend)
 
-def get_llm_service() -> LLMService:
-    global _llm_service
-    if _llm_service is None:
-        _llm_service = LLMService()
-    return _llm_service
+def build_llm_service(cfg: LLMConfig) -> LLMService:
+    service = LLMService(cfg)
+    # Batchers keep the generate()/stream() surface; concurrent requests share forward passes
+    if cfg.max_batch_size > 1 and cfg.batching == "continuous":
+        service = ContinuousBatcher(service, max_batch_size=cfg.max_batch_size)
+    elif cfg.max_batch_size > 1:
+        service = LLMBatcher(service, max_batch_size=cfg.max_batch_size, max_wait_ms=cfg.batch_wait_ms)
+    return service
+
+def asr_key(name: Optional[str] = None) -> str:
+    return f"asr:{name or asr_config.model_name}"
+
+def llm_key(name: Optional[str] = None) -> str:
+    return f"llm:{name or 'default'}"
+
+def get_llm_key(llm_model: Optional[str] = Query(None, max_length=256)) -> str:
+    # Chat sessions are per model, so routes pass this to SessionStore.get
+    return llm_key(llm_model)
+
+def _weights_bytes(model_dir: Path) -> int:
+    # Size estimate for the registry's budget before a model has been loaded once
+    try:
+        return sum(p.stat().st_size for p in Path(model_dir).iterdir() if p.suffix in (".safetensors", ".bin"))
+    except OSError:
+        return 0
+
+def get_model_registry() -> ModelRegistry:
+    global _model_registry
+    if _model_registry is None:
+        registry = ModelRegistry(int(settings.model_memory_mb * 1024 * 1024))
+        warmup = methodcaller("warmup")
+        for name in dict.fromkeys([asr_config.model_name, *settings.asr_models]):
+            registry.register(ModelSpec(asr_key(name), partial(build_asr_service, name), warmup))
+        registry.register(ModelSpec(llm_key(), partial(build_llm_service, DEFAULT_LLM_CONFIG), warmup,
+                                    _weights_bytes(DEFAULT_LLM_CONFIG.model_dir)))
+        for name, model_dir in settings.llm_models.items():
+            cfg = replace(DEFAULT_LLM_CONFIG, model_dir=Path(model_dir))
+            registry.register(ModelSpec(llm_key(name), partial(build_llm_service, cfg), warmup, _weights_bytes(cfg.model_dir)))
+        _model_registry = registry
+    return _model_registry
+
+def _acquire(key: str):
+    registry = get_model_registry()
+    if key not in registry:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, f"Unknown model '{key}'")
+    try:
+        service = registry.acquire(key, timeout=settings.model_wait_s)
+    except ModelNotReady as e:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, f"Model '{key}' is still loading; retry later",
+                            headers={"Retry-After": str(settings.retry_after_s)}) from e
+    except Exception as e:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, f"Model '{key}' failed to load",
+                            headers={"Retry-After": str(settings.retry_after_s)}) from e
+    return service
+
+def _lease(key: str) -> Iterator:
+    service = _acquire(key)
+    # Held until the endpoint returns, so the model cannot be evicted mid-request
+    try:
+        yield service
+    finally:
+        get_model_registry().release(key)
+
+def get_asr_service(asr_model: Optional[str] = Query(None, max_length=256)) -> Iterator[ASRService]:
+    yield from _lease(asr_key(asr_model))
+
+def get_llm_service(llm_model: Optional[str] = Query(None, max_length=256)) -> Iterator[LLMService]:
+    yield from _lease(llm_key(llm_model))
+
+def get_llm_lease(llm_model: Optional[str] = Query(None, max_length=256)) -> Tuple[LLMService, Callable[[], None]]:
+    # For streaming responses: `yield` dependencies are torn down before the body is sent,
+    # so the route calls `release` itself once generation has finished
+    key = llm_key(llm_model)
+    return _acquire(key), partial(get_model_registry().release, key)
+
+def get_asr_executor() -> InferenceExecutor:
+    global _asr_executor
+    if _asr_executor is None:
+        workers = settings.asr_workers
+        if asr_config.replicas > 1:
+            # Enough threads to keep every replica busy
+            workers = max(workers, asr_config.replicas * asr_config.num_workers)
+        if asr_config.max_batch_size > 1:
+            # A batch only fills if that many requests can wait on it at once
+            workers = max(workers, asr_config.max_batch_size)
+        _asr_executor = InferenceExecutor("asr", workers, settings.asr_queue_depth, settings.retry_after_s)
+    return _asr_executor
+
+def get_llm_executor() -> InferenceExecutor:
+    global _llm_executor
+    if _llm_executor is None:
+        _llm_executor = InferenceExecutor("llm", settings.llm_workers, settings.llm_queue_depth, settings.retry_after_s)
+    return _llm_executor
+
+def get_session_store() -> SessionStore:
+    global _session_store
+    if _session_store is None:
+        _session_store = SessionStore(max_sessions=settings.session_max_count, ttl_s=settings.session_ttl_s)
+    return _session_store
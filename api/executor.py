@@ -0,0 +1,62 @@
+from __future__ import annotations
+import asyncio, functools, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class ExecutorSaturated(RuntimeError):
+    def __init__(self, name: str, retry_after_s: int):
+        super().__init__(f"{name} executor is saturated")
+        self.name = name
+        self.retry_after_s = retry_after_s
+
+class InferenceExecutor:
+    """Bounded thread pool for blocking ASR/LLM calls.
+
+    At most `max_workers` calls run at once and at most `queue_depth` more wait for a worker;
+    anything beyond that is rejected immediately with `ExecutorSaturated` instead of piling up.
+    """
+
+    def __init__(self, name: str, max_workers: int = 1, queue_depth: int = 4, retry_after_s: int = 5):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.queue_depth = max(0, queue_depth)
+        self.retry_after_s = retry_after_s
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{name}-infer")
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.queue_depth)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _release(self, _fut) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any):
+        if not self._slots.acquire(blocking=False):
+            logger.warning("%s executor saturated (%d in flight)", self.name, self._in_flight)
+            raise ExecutorSaturated(self.name, self.retry_after_s)
+        with self._lock:
+            self._in_flight += 1
+        try:
+            fut = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # Slot is freed when the work finishes, not when the caller stops waiting,
+        # so a disconnected client cannot make us over-commit the pool.
+        fut.add_done_callback(self._release)
+        return fut
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
@@ -6,7 +6,7 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .config import settings
 from .routes import router
-from .deps import get_asr_service, get_llm_service
+from .deps import asr_key, get_model_registry, llm_key
 
 LOG_CONFIG = {
   "version": 1,
@@ -27,9 +27,12 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     async def preload_models() -> None:
-        # Preload ASR and LLM so the first request is fast; services are cached in deps
-        get_asr_service()
-        get_llm_service()
+        # Load the default ASR and LLM in parallel on background threads so the server answers
+        # /healthz immediately; /readyz reports when they are done. Others load on first use.
+        if settings.preload_models:
+            registry = get_model_registry()
+            registry.load_async(asr_key())
+            registry.load_async(llm_key())
 
     app.include_router(router)
     return app
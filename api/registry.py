@@ -0,0 +1,209 @@
+from __future__ import annotations
+import logging, threading, time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class UnknownModel(KeyError):
+    def __init__(self, key: str):
+        super().__init__(key)
+        self.key = key
+
+class ModelNotReady(RuntimeError):
+    """The model is still loading and did not become ready within the caller's timeout."""
+    def __init__(self, key: str):
+        super().__init__(f"Model '{key}' is still loading")
+        self.key = key
+
+@dataclass
+class ModelSpec:
+    """How to build one named model: `load()` returns the service, `warmup(service)` primes it.
+
+    `nbytes` estimates the loaded size before the first load (0 = unknown); once loaded, the
+    service's own `nbytes` is used instead.
+    """
+    key: str
+    load: Callable[[], Any]
+    warmup: Optional[Callable[[Any], None]] = None
+    nbytes: int = 0
+
+@dataclass
+class _Entry:
+    spec: ModelSpec
+    service: Any = None
+    nbytes: int = 0
+    last_nbytes: int = 0  # size at the last load, kept after eviction
+    state: str = "unloaded"  # unloaded | loading | ready | failed
+    error: Optional[BaseException] = None
+    load_s: Optional[float] = None
+    warmup_s: Optional[float] = None
+    load_started: Optional[float] = None
+    last_used: float = 0.0
+    leases: int = 0
+    done: threading.Event = field(default_factory=threading.Event)
+
+class ModelRegistry:
+    """Named ASR/LLM services loaded on first use and evicted least-recently-used.
+
+    Every model that may be served is registered up front with a loader; nothing is loaded
+    until a request (or startup preload) asks for it. Loads run on background threads, so
+    several models load in parallel and callers choose how long to wait. After loading, `warmup` runs one small
+    inference so the first real request does not pay for lazy initialisation. The estimated
+    size of loaded services (their `nbytes` attribute) is kept under `budget_bytes` (0 = no
+    limit) by closing idle models in LRU order; a model held by `lease` is never evicted.
+    Room is made before `load()` runs, using the model's last loaded size (or its spec's
+    estimate), so the new model and the ones it replaces are never resident together.
+    """
+
+    def __init__(self, budget_bytes: int = 0) -> None:
+        self.budget_bytes = budget_bytes
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, spec: ModelSpec) -> None:
+        with self._lock:
+            self._entries[spec.key] = _Entry(spec)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._entries)
+
+    @property
+    def loaded_bytes(self) -> int:
+        return sum(e.nbytes for e in self._entries.values() if e.state == "ready")
+
+    def status(self) -> Dict[str, dict]:
+        with self._lock:
+            now = time.monotonic()
+            return {k: {"state": e.state, "load_s": e.load_s, "warmup_s": e.warmup_s, "bytes": e.nbytes,
+                        "loading_for_s": round(now - e.load_started, 3) if e.state == "loading" else None,
+                        "error": repr(e.error) if e.error else None}
+                    for k, e in self._entries.items()}
+
+    def ready(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.state == "ready"
+
+    def load_async(self, key: str) -> None:
+        """Start loading `key` on a background thread unless it is loaded or loading already."""
+        entry = self._entries.get(key)
+        if entry is None:
+            raise UnknownModel(key)
+        with self._lock:
+            if entry.state in ("ready", "loading"):
+                return
+            entry.state, entry.error = "loading", None
+            entry.load_started = time.monotonic()
+            entry.done.clear()
+        threading.Thread(target=self._load, args=(entry,), name=f"load-{key}", daemon=True).start()
+
+    def get(self, key: str, timeout: Optional[float] = None) -> Any:
+        """Return the service for `key`, loading it (and evicting others) if needed."""
+        service = self.acquire(key, timeout)
+        self.release(key)
+        return service
+
+    def acquire(self, key: str, timeout: Optional[float] = None) -> Any:
+        """Lease `key`'s service, waiting up to `timeout` seconds (None = forever) for it to load.
+
+        Raises:
+            UnknownModel: `key` was never registered.
+            ModelNotReady: The model is still loading after `timeout`; loading carries on.
+            Exception: Whatever the loader raised, if loading failed.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            raise UnknownModel(key)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if entry.state == "ready":
+                    entry.leases += 1
+                    entry.last_used = time.monotonic()
+                    return entry.service
+            self.load_async(key)
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not entry.done.wait(remaining):
+                raise ModelNotReady(key)
+            if entry.state == "failed":
+                raise entry.error
+
+    def release(self, key: str) -> None:
+        entry = self._entries[key]
+        with self._lock:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+
+    @contextmanager
+    def lease(self, key: str, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Hold `key`'s service for the duration of a request so it cannot be evicted meanwhile."""
+        service = self.acquire(key, timeout)
+        try:
+            yield service
+        finally:
+            self.release(key)
+
+    def _load(self, entry: _Entry) -> None:
+        key = entry.spec.key
+        with self._lock:
+            evicted = self._pick_evictions(keep=key)
+        for victim_key, victim in evicted:
+            self._close(victim_key, victim)
+        try:
+            started = time.perf_counter()
+            service = entry.spec.load()
+            loaded = time.perf_counter()
+            if entry.spec.warmup is not None:
+                entry.spec.warmup(service)
+            entry.load_s = round(loaded - started, 3)
+            entry.warmup_s = round(time.perf_counter() - loaded, 3)
+        except BaseException as exc:
+            with self._lock:
+                entry.state, entry.error = "failed", exc
+            entry.done.set()
+            logger.exception("Loading model %s failed", key)
+            return
+        with self._lock:
+            entry.service = service
+            entry.nbytes = entry.last_nbytes = int(getattr(service, "nbytes", 0) or 0)
+            entry.state = "ready"
+            entry.last_used = time.monotonic()
+            # The estimate may have been low; check again with the real size
+            evicted = self._pick_evictions(keep=key)
+        entry.done.set()
+        logger.info("Loaded model %s in %.2fs (+%.2fs warmup, ~%d MB)", key, entry.load_s, entry.warmup_s, entry.nbytes >> 20)
+        for victim_key, victim in evicted:
+            self._close(victim_key, victim)
+
+    def _pick_evictions(self, keep: str) -> List[tuple]:
+        if not self.budget_bytes:
+            return []
+        # Models still loading count at their expected size
+        total = self.loaded_bytes + sum(e.last_nbytes or e.spec.nbytes for e in self._entries.values() if e.state == "loading")
+        idle = sorted((e for k, e in self._entries.items() if k != keep and e.state == "ready" and not e.leases),
+                      key=lambda e: e.last_used)
+        victims = []
+        for e in idle:
+            if total <= self.budget_bytes:
+                break
+            victims.append((e.spec.key, e.service))
+            total -= e.nbytes
+            e.state, e.service, e.nbytes = "unloaded", None, 0
+        if total > self.budget_bytes:
+            logger.warning("Models in use exceed the memory budget (%d MB > %d MB)", total >> 20, self.budget_bytes >> 20)
+        return victims
+
+    @staticmethod
+    def _close(key: str, service: Any) -> None:
+        logger.info("Evicted model %s (LRU)", key)
+        close = getattr(service, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                logger.exception("Closing evicted model %s failed", key)
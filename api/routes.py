@@ -1,16 +1,23 @@
 from __future__ import annotations
-import logging, tempfile
+import asyncio, json, logging
+import numpy as np
 from datetime import datetime, timezone
-from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status
+from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from asr.service import ASRService
+from llm.pipeline import prefill_pipelined
 from llm.service import LLMService
+from llm.sessions import SessionStore
 from llm.types import LLMRequest
 
-from .deps import get_asr_service, get_llm_service
+from .config import settings
+from .deps import (asr_key, get_asr_executor, get_asr_service, get_llm_executor, get_llm_key, get_llm_lease,
+                   get_llm_service, get_model_registry, get_session_store, llm_key)
+from .executor import InferenceExecutor, ExecutorSaturated
+from .registry import ModelRegistry
 from .schemas import TextRequest, LLMReply, ASRLLMReply
 
 logger = logging.getLogger(__name__)
@@ -20,49 +27,240 @@ router = APIRouter()
 def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
+def saturated(e: ExecutorSaturated) -> HTTPException:
+    return HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, f"{e.name} busy; retry later",
+                         headers={"Retry-After": str(e.retry_after_s)})
+
 @router.post("/api/llm", response_model=LLMReply)
-async def run_llm(payload: TextRequest, llm: Annotated[LLMService, Depends(get_llm_service)]) -> LLMReply:
+async def run_llm(
+    payload: TextRequest,
+    llm: Annotated[LLMService, Depends(get_llm_service)],
+    llm_pool: Annotated[InferenceExecutor, Depends(get_llm_executor)],
+    sessions: Annotated[SessionStore, Depends(get_session_store)],
+    model_key: Annotated[str, Depends(get_llm_key)],
+) -> LLMReply:
     try:
         req = LLMRequest(text=payload.message,
                          max_new_tokens=payload.max_new_tokens,
                          temperature=payload.temperature)
         # Log when we dispatch to LLM to make request flow visible in console
         logger.info("Sending LLM generate request \n(string:%s)", payload.message)        
-        rep = llm.generate(req)
-        return LLMReply(text=rep.text, timestamp=utcnow())
+        if payload.session_id:
+            rep = await llm_pool.run(llm.chat, req, sessions.get(payload.session_id, model_key=model_key))
+        else:
+            rep = await llm_pool.run(llm.generate, req)
+        return LLMReply(text=rep.text, timestamp=utcnow(), session_id=payload.session_id)
+    except ExecutorSaturated as e:
+        raise saturated(e) from e
     except Exception as e:
         logger.exception("LLM failed")
         raise HTTPException(500, "LLM failure") from e
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/api/llm/stream")
+async def stream_llm(
+    payload: TextRequest,
+    lease: Annotated[tuple, Depends(get_llm_lease)],
+    llm_pool: Annotated[InferenceExecutor, Depends(get_llm_executor)],
+    sessions: Annotated[SessionStore, Depends(get_session_store)],
+    model_key: Annotated[str, Depends(get_llm_key)],
+) -> StreamingResponse:
+    """Server-sent events: one `token` event per text piece, then `done` (or `error`).
+
+    The model lease outlives this function: `produce` releases it once generation ends, so the
+    model cannot be evicted while tokens are still being sent.
+    """
+    llm, release = lease
+    req = LLMRequest(text=payload.message,
+                     max_new_tokens=payload.max_new_tokens,
+                     temperature=payload.temperature)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = False
+
+    def produce() -> None:
+        # Runs on an LLM worker so streaming counts against the same pool as /api/llm
+        try:
+            if payload.session_id:
+                pieces = llm.chat_stream(req, sessions.get(payload.session_id, model_key=model_key))
+            else:
+                pieces = llm.stream(req)
+            try:
+                for piece in pieces:
+                    if cancelled:
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, piece)
+            finally:
+                pieces.close()
+        finally:
+            release()
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    logger.info("Sending LLM stream request \n(string:%s)", payload.message)
+    try:
+        job = llm_pool.submit(produce)
+    except ExecutorSaturated as e:
+        release()
+        raise saturated(e) from e
+    except BaseException:
+        release()
+        raise
+
+    async def events():
+        nonlocal cancelled
+        try:
+            while (piece := await queue.get()) is not None:
+                yield sse_event("token", {"text": piece})
+            await asyncio.wrap_future(job)
+            yield sse_event("done", {"timestamp": utcnow().isoformat(), "session_id": payload.session_id})
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("LLM stream failed")
+            yield sse_event("error", {"detail": "LLM failure"})
+        finally:
+            cancelled = True
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.post("/api/asr-llm", response_model=ASRLLMReply)
 async def asr_llm(
     asr: Annotated[ASRService, Depends(get_asr_service)],
     llm: Annotated[LLMService, Depends(get_llm_service)],
+    asr_pool: Annotated[InferenceExecutor, Depends(get_asr_executor)],
+    llm_pool: Annotated[InferenceExecutor, Depends(get_llm_executor)],
+    sessions: Annotated[SessionStore, Depends(get_session_store)],
+    model_key: Annotated[str, Depends(get_llm_key)],
     audio: UploadFile = File(...),
+    session_id: Optional[str] = Form(None, max_length=128),
 ) -> ASRLLMReply:
-    tmp = None
     try:
-        suffix = Path(audio.filename).suffix or ".webm"
-        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
-            tmp = Path(f.name)
-            f.write(await audio.read())
+        data = await audio.read()
+        # Guard: empty or too-short audio -> skip LLM
+        min_duration_s = 0.3
+        msg = "No speech detected; please try again."
 
-        asr_res = asr.transcribe_file(str(tmp))
+        if settings.pipelined_asr_llm and not session_id:
+            # Decode once, then overlap Whisper's segment decoding with LLM prefill. Segments are
+            # consumed on the ASR worker; only each prefill and the final reply take an LLM worker.
+            pcm = await asr_pool.run(asr.decode, data)
+            if len(pcm) / asr.sample_rate < min_duration_s:
+                return ASRLLMReply(text=msg, transcript="", timestamp=utcnow(), session_id=session_id)
+            segments, prompt = await asr_pool.run(
+                prefill_pipelined, asr.iter_segments(pcm), llm, submit=llm_pool.submit
+            )
+            transcript = " ".join(s.text.strip() for s in segments if s.text.strip())
+            if not transcript:
+                return ASRLLMReply(text=msg, transcript=transcript, timestamp=utcnow(), session_id=session_id)
+            llm_res = await llm_pool.run(prompt.finish, transcript)
+            return ASRLLMReply(text=llm_res.text, transcript=transcript, timestamp=utcnow(), session_id=session_id)
+
+        asr_res = await asr_pool.run(asr.transcribe_bytes, data)
         transcript = asr_res.text.strip()
 
-        # Guard: empty or too-short audio -> skip LLM
-        min_duration_s = 0.3
         if not transcript or (getattr(asr_res, "duration", 0.0) or 0.0) < min_duration_s:   
-            msg = "No speech detected; please try again."
-            return ASRLLMReply(text=msg, transcript=transcript, timestamp=utcnow())
+            return ASRLLMReply(text=msg, transcript=transcript, timestamp=utcnow(), session_id=session_id)
 
         req = LLMRequest(text=transcript)
-        llm_res = llm.generate(req)
+        if session_id:
+            llm_res = await llm_pool.run(llm.chat, req, sessions.get(session_id, model_key=model_key))
+        else:
+            llm_res = await llm_pool.run(llm.generate, req)
 
-        return ASRLLMReply(text=llm_res.text, transcript=transcript, timestamp=utcnow())
+        return ASRLLMReply(text=llm_res.text, transcript=transcript, timestamp=utcnow(), session_id=session_id)
+    except ExecutorSaturated as e:
+        raise saturated(e) from e
     except Exception as e:
         logger.exception("ASR+LLM error")
         raise HTTPException(500, "ASR+LLM pipeline failed") from e
-    finally:
-        if tmp:
-            tmp.unlink(missing_ok=True)
+
+def segment_event(event) -> dict:
+    seg = event.segment
+    return {"type": event.type, "start": seg.start, "end": seg.end, "text": seg.text}
+
+@router.websocket("/api/asr/stream")
+async def asr_stream(
+    ws: WebSocket,
+    asr: Annotated[ASRService, Depends(get_asr_service)],
+    llm: Annotated[LLMService, Depends(get_llm_service)],
+    asr_pool: Annotated[InferenceExecutor, Depends(get_asr_executor)],
+    llm_pool: Annotated[InferenceExecutor, Depends(get_llm_executor)],
+    sessions: Annotated[SessionStore, Depends(get_session_store)],
+    model_key: Annotated[str, Depends(get_llm_key)],
+) -> None:
+    """Live ASR: binary frames are little-endian int16 mono PCM at `?sample_rate=` (default 16 kHz).
+
+    Sends `partial`/`final` segment events while the user speaks; at end of speech (silence,
+    or a `{"type": "end"}` text frame) sends `transcript` and immediately runs the LLM, then `reply`.
+    """
+    await ws.accept()
+    try:
+        rate = int(ws.query_params.get("sample_rate") or asr.sample_rate)
+        if not 1000 <= rate <= 384000:
+            raise ValueError(rate)
+    except ValueError:
+        await ws.send_json({"type": "error", "detail": "sample_rate must be an integer between 1000 and 384000"})
+        await ws.close(code=1008)
+        return
+    session_id = ws.query_params.get("session_id") or None
+    transcriber = asr.stream_transcriber(input_rate=rate)
+
+    async def respond(transcript: str) -> None:
+        await ws.send_json({"type": "transcript", "text": transcript})
+        if not transcript:
+            await ws.send_json({"type": "reply", "text": "No speech detected; please try again.", "timestamp": utcnow().isoformat()})
+            return
+        req = LLMRequest(text=transcript)
+        if session_id:
+            rep = await llm_pool.run(llm.chat, req, sessions.get(session_id, model_key=model_key))
+        else:
+            rep = await llm_pool.run(llm.generate, req)
+        await ws.send_json({"type": "reply", "text": rep.text, "timestamp": utcnow().isoformat(), "session_id": session_id})
+
+    async def relay(events) -> None:
+        for event in events:
+            if event.type == "end_of_speech":
+                await respond(event.text)
+            else:
+                await ws.send_json(segment_event(event))
+
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            if msg.get("bytes"):
+                pcm = np.frombuffer(msg["bytes"], dtype="<i2").astype(np.float32) / 32768.0
+                await relay(await asr_pool.run(transcriber.feed, pcm))
+            elif msg.get("text") and json.loads(msg["text"]).get("type") == "end":
+                await relay(await asr_pool.run(transcriber.finish))
+                await ws.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    except ExecutorSaturated as e:
+        await ws.send_json({"type": "error", "detail": f"{e.name} busy; retry later", "retry_after": e.retry_after_s})
+        await ws.close(code=1013)
+    except Exception:
+        logger.exception("Streaming ASR failed")
+        await ws.send_json({"type": "error", "detail": "ASR stream failed"})
+        await ws.close(code=1011)
+
+@router.delete("/api/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def end_session(session_id: str, sessions: Annotated[SessionStore, Depends(get_session_store)]) -> None:
+    sessions.drop(session_id)
+
+@router.get("/healthz")
+async def healthz() -> dict:
+    """Liveness: the process is up and serving, whether or not models have loaded."""
+    return {"status": "ok"}
+
+@router.get("/readyz")
+async def readyz(registry: Annotated[ModelRegistry, Depends(get_model_registry)]) -> JSONResponse:
+    """Readiness: 200 once the default ASR and LLM models are loaded, else 503; per-model detail in `models`."""
+    ready = all(registry.ready(key) for key in (asr_key(), llm_key()))
+    return JSONResponse({"ready": ready, "models": registry.status()},
+                        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
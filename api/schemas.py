@@ -7,10 +7,12 @@ class TextRequest(BaseModel):
     message: str = Field(..., min_length=1)
     max_new_tokens: Optional[int] = None
     temperature: Optional[float] = None
+    session_id: Optional[str] = Field(None, max_length=128)
 
 class LLMReply(BaseModel):
     text: str
     timestamp: datetime
+    session_id: Optional[str] = None
 
 class ASRLLMReply(LLMReply):
     transcript: Optional[str] = None
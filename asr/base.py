@@ -1,8 +1,17 @@
 
 from __future__ import annotations
-from typing import Protocol, Optional
-from .types import ASRResult
+from typing import Iterator, List, Protocol, Optional, Sequence
+from .types import ASRResult, ASRSegment
 
 class ASRBackend(Protocol):
     def transcribe(self, audio_path: str, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
         ...
+
+    def transcribe_audio(self, audio_data, sample_rate: int = 16000, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
+        ...
+
+    def iter_segments(self, audio_data, sample_rate: int = 16000, *, language: Optional[str] = None, prompt: Optional[str] = None) -> Iterator[ASRSegment]:
+        ...
+
+    def transcribe_many(self, audios: Sequence, *, language: Optional[str] = None, prompt: Optional[str] = None) -> List[ASRResult]:
+        ...
@@ -0,0 +1,165 @@
+from __future__ import annotations
+import logging, queue, threading, time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from .config import config
+from .types import ASRResult, ASRSegment
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _Pending:
+    audio: np.ndarray
+    language: Optional[str]
+    prompt: Optional[str]
+    future: Future = field(default_factory=Future)
+
+class ASRBatcher:
+    """Collects concurrent `transcribe_audio` calls and runs them through `backend.transcribe_many`.
+
+    The ASR counterpart of `llm.batching.LLMBatcher`: callers block as with the backend itself,
+    while one scheduler thread takes the first queued clip, waits up to `max_wait_ms` for more
+    (stopping early at `max_batch_size`), groups them by language and prompt and runs one
+    batched encoder/decoder pass per group. Without a fixed language, the languages of all
+    clips in the batch are detected together first (one batched encoder pass over their first
+    30 s, via `backend.detect_languages`), so clips in different languages are never decoded
+    as one. Backends without `detect_languages` share one detection per batch; set
+    `ASR_LANGUAGE` for those.
+
+    `iter_segments` is batched too, so its segments arrive together once the batch is done.
+    Batching only helps when several threads call at once; size the API ASR pool to at least
+    `max_batch_size`.
+    """
+
+    def __init__(self, backend, *, max_batch_size: int = 8, max_wait_ms: float = 20.0) -> None:
+        self._backend = backend
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self._queue: queue.Queue[Optional[_Pending]] = queue.Queue()
+        self._batches = 0
+        self._batched_requests = 0
+        self._detect = getattr(backend, "detect_languages", None)
+        if config.language is None and not callable(self._detect):
+            logger.warning("ASR batching without ASR_LANGUAGE: clips in one batch share a single language detection")
+        self._worker = threading.Thread(target=self._run, name="asr-batcher", daemon=True)
+        self._worker.start()
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self._backend, "model_name", type(self._backend).__name__)
+
+    @property
+    def compute_type(self) -> str:
+        return getattr(self._backend, "compute_type", config.compute_type)
+
+    @property
+    def nbytes(self) -> int:
+        return int(getattr(self._backend, "nbytes", 0) or 0)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Number of `transcribe_many` calls issued and the mean number of clips per call."""
+        mean = self._batched_requests / self._batches if self._batches else 0.0
+        return {"batches": self._batches, "requests": self._batched_requests, "mean_batch_size": mean}
+
+    def warmup(self) -> None:
+        warmup = getattr(self._backend, "warmup", None)
+        if callable(warmup):
+            warmup()
+        else:
+            self.transcribe_audio(np.zeros(16000, dtype=np.float32))
+
+    def close(self) -> None:
+        """Stop the scheduler thread once queued clips have been served, then close the backend."""
+        self._queue.put(None)
+        self._worker.join()
+        close = getattr(self._backend, "close", None)
+        if callable(close):
+            close()
+
+    def transcribe(self, audio_path: str, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
+        """Files go straight to the backend."""
+        return self._backend.transcribe(audio_path, language=language, prompt=prompt)
+
+    def transcribe_many(self, audios: Sequence, *, language: Optional[str] = None, prompt: Optional[str] = None) -> List[ASRResult]:
+        """Offline batches are already batched; they bypass the queue."""
+        return self._backend.transcribe_many(audios, language=language, prompt=prompt)
+
+    def transcribe_audio(self, audio_data, sample_rate: int = 16000, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
+        """Queue a clip for the next batch and wait for its result."""
+        audio = np.asarray(audio_data, dtype=np.float32)
+        if sample_rate != 16000:
+            from .resample import resample
+            audio = resample(audio, sample_rate, 16000)
+        pending = _Pending(audio, language or config.language, prompt)
+        self._queue.put(pending)
+        return pending.future.result()
+
+    def iter_segments(self, audio_data, sample_rate: int = 16000, *, language: Optional[str] = None, prompt: Optional[str] = None) -> Iterator[ASRSegment]:
+        yield from self.transcribe_audio(audio_data, sample_rate, language=language, prompt=prompt).segments
+
+    def _collect(self, first: _Pending) -> Tuple[List[_Pending], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self._max_wait_s
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+            self._detect_languages(batch)
+
+            groups: Dict[Tuple[Any, ...], List[_Pending]] = {}
+            for pending in batch:
+                groups.setdefault((pending.language, pending.prompt), []).append(pending)
+
+            for group in groups.values():
+                self._dispatch(group)
+
+    def _detect_languages(self, batch: List[_Pending]) -> None:
+        unknown = [p for p in batch if p.language is None and len(p.audio)]
+        if not unknown or not callable(self._detect):
+            return
+        try:
+            languages = self._detect([p.audio for p in unknown])
+        except Exception:
+            # Leave them undetected: transcribe_many detects once for their group instead
+            logger.warning("Batched language detection failed", exc_info=True)
+            return
+        for pending, language in zip(unknown, languages):
+            pending.language = language
+
+    def _dispatch(self, group: List[_Pending]) -> None:
+        self._batches += 1
+        self._batched_requests += len(group)
+        logger.debug("Dispatching ASR batch of %d clip(s)", len(group))
+        try:
+            results = self._backend.transcribe_many(
+                [p.audio for p in group], language=group[0].language, prompt=group[0].prompt
+            )
+        except Exception as exc:
+            for pending in group:
+                pending.future.set_exception(exc)
+            return
+        for pending, result in zip(group, results):
+            pending.future.set_result(result)
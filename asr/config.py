@@ -8,9 +8,31 @@ class ASRConfig:
     model_name: str = os.getenv("ASR_MODEL_NAME", "tiny")
     device: str = os.getenv("ASR_DEVICE", "cpu")
     compute_type: str = os.getenv("ASR_COMPUTE_TYPE", "int8")
+    cpu_threads: int = int(os.getenv("ASR_CPU_THREADS", "0"))  # CTranslate2 intra-op threads per model; 0 = library default
+    num_workers: int = int(os.getenv("ASR_NUM_WORKERS", "1"))  # concurrent transcriptions per model instance
+    replicas: int = int(os.getenv("ASR_REPLICAS", "1"))  # >1 = one model per worker process (asr/replicas.py)
+    dispatch: str = os.getenv("ASR_DISPATCH", "least_loaded")  # replica choice: least_loaded | round_robin
     sample_rate: int = int(os.getenv("ASR_SAMPLE_RATE", "16000"))
     beam_size: int = int(os.getenv("ASR_BEAM_SIZE", "5"))
     vad_filter: bool = os.getenv("ASR_VAD_FILTER", "1") == "1"
     language: str | None = os.getenv("ASR_LANGUAGE") or None
+    stream_step_s: float = float(os.getenv("ASR_STREAM_STEP_S", "1.0"))  # re-decode cadence for live audio
+    stream_end_silence_s: float = float(os.getenv("ASR_STREAM_END_SILENCE_S", "0.7"))  # silence that ends an utterance
+    batch_size: int = int(os.getenv("ASR_BATCH_SIZE", "8"))  # chunks per decoder pass in transcribe_many
+    max_batch_size: int = int(os.getenv("ASR_MAX_BATCH_SIZE", "1"))  # >1 = concurrent API clips share batched passes (asr/batching.py)
+    batch_wait_ms: float = float(os.getenv("ASR_BATCH_WAIT_MS", "20"))  # how long the first clip waits for others to join its batch
+    ffmpeg_workers: int = int(os.getenv("ASR_FFMPEG_WORKERS", "2"))  # max concurrent ffmpeg decodes; 0 = spawn per call
+    speech_gate: bool = os.getenv("ASR_SPEECH_GATE", "1") == "1"  # reject silent/short/clipped uploads and trim silence before Whisper
+    gate_min_speech_s: float = float(os.getenv("ASR_GATE_MIN_SPEECH_S", "0.15"))  # speech frames needed to pass the gate
+    gate_max_clipped: float = float(os.getenv("ASR_GATE_MAX_CLIPPED", "0.05"))  # fraction of full-scale samples that rejects a clip
+    long_workers: int = int(os.getenv("ASR_LONG_WORKERS", "0"))  # concurrent chunks; 0 = replicas * num_workers
+    # Clips this long are split at pauses and the chunks run concurrently; 0 = off. Defaults to
+    # 300 only when more than one chunk can run at once: with a single worker, chunking is slower
+    # than one pass, so raise ASR_NUM_WORKERS/ASR_REPLICAS (or ASR_LONG_WORKERS) to benefit.
+    long_audio_s: float = float(os.getenv("ASR_LONG_AUDIO_S", "300" if (long_workers or max(1, replicas) * max(1, num_workers)) > 1 else "0"))
+    long_chunk_s: float = float(os.getenv("ASR_LONG_CHUNK_S", "60"))  # target chunk length for long audio (cut at the quietest point up to 1.5x)
+    transcript_cache_entries: int = int(os.getenv("ASR_TRANSCRIPT_CACHE_ENTRIES", "128"))  # in-memory LRU of results for repeated audio; 0 = off
+    transcript_cache_path: str | None = os.getenv("ASR_TRANSCRIPT_CACHE_PATH") or None  # optional SQLite disk tier (stores transcripts)
+    transcript_cache_disk_mb: float = float(os.getenv("ASR_TRANSCRIPT_CACHE_DISK_MB", "64"))
 
 config = ASRConfig()
@@ -0,0 +1,55 @@
+from __future__ import annotations
+import io, logging
+import numpy as np
+from .exceptions import AudioPreprocessingError
+from .ffmpeg_io import decode_with_ffmpeg
+from .resample import resample
+
+logger = logging.getLogger(__name__)
+
+def _to_mono_float32(audio: np.ndarray) -> np.ndarray:
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+def _decode_soundfile(data: bytes, sample_rate: int) -> np.ndarray:
+    import soundfile as sf
+    audio, rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=False)
+    return resample(_to_mono_float32(audio), rate, sample_rate)
+
+def _decode_pyav(data: bytes, sample_rate: int) -> np.ndarray:
+    import av
+    chunks = []
+    with av.open(io.BytesIO(data), mode="r") as container:
+        stream = next(s for s in container.streams if s.type == "audio")
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+        for frame in container.decode(stream):
+            chunks.extend(f.to_ndarray().reshape(-1) for f in resampler.resample(frame))
+        chunks.extend(f.to_ndarray().reshape(-1) for f in resampler.resample(None))
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks).astype(np.float32, copy=False)
+
+# Tried in order: libsndfile handles WAV/FLAC/OGG cheaply; PyAV (bundled with faster-whisper) covers
+# browser webm/opus and mp4/aac; the ffmpeg CLI piped through stdin/stdout is the last resort.
+DECODERS = (("soundfile", _decode_soundfile), ("pyav", _decode_pyav), ("ffmpeg", decode_with_ffmpeg))
+
+def decode_audio_bytes(data: bytes, sample_rate: int = 16000, *, ffmpeg=None) -> np.ndarray:
+    """Decode an encoded audio file held in memory to mono float32 PCM at `sample_rate`.
+
+    `ffmpeg` optionally replaces the last-resort decoder, e.g. with `FFmpegDecoderPool.decode`.
+    """
+    if not data:
+        raise AudioPreprocessingError("Empty audio upload")
+    decoders = DECODERS if ffmpeg is None else DECODERS[:-1] + (("ffmpeg", ffmpeg),)
+    for name, decoder in decoders:
+        try:
+            audio = decoder(data, sample_rate)
+        except ImportError:
+            continue
+        except Exception as exc:
+            logger.debug("%s could not decode audio: %s", name, exc)
+            continue
+        logger.debug("Decoded %d samples with %s", len(audio), name)
+        return audio
+    raise AudioPreprocessingError("Could not decode audio")
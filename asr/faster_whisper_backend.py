@@ -1,8 +1,9 @@
 
 from __future__ import annotations
+import bisect
 import logging
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Dict, Iterator, Optional, List, Sequence
 from faster_whisper import WhisperModel
 from .types import ASRResult, ASRSegment
 from .exceptions import ASRModelError
@@ -15,17 +16,54 @@ class FasterWhisperBackend:
     model_name: str = config.model_name
     device: str = config.device
     compute_type: str = config.compute_type
+    cpu_threads: int = config.cpu_threads
+    num_workers: int = config.num_workers
 
     def __post_init__(self):
         try:
-            self._model = WhisperModel(self.model_name, device=self.device, compute_type=self.compute_type)
+            self._model = WhisperModel(
+                self.model_name,
+                device=self.device,
+                compute_type=self.compute_type,
+                cpu_threads=self.cpu_threads,
+                num_workers=self.num_workers,
+            )
         except Exception as exc:
             raise ASRModelError("Failed to load model") from exc
 
-    def transcribe(self, audio_path: str, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the model (size of its CTranslate2 weights file)."""
+        return model_file_bytes(self.model_name)
+
+    def warmup(self) -> None:
+        """Run the encoder and decoder once on a second of silence (VAD off, so it is not skipped)."""
+        import numpy as np
+
+        segments, _ = self._model.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1, vad_filter=False, language=config.language or "en")
+        list(segments)
+
+    def detect_languages(self, audios: Sequence) -> List[str]:
+        """Whisper's language guess for the first 30 s of each 16 kHz clip, from one batched encoder pass."""
+        import numpy as np
+        from faster_whisper.audio import pad_or_trim
+
+        extractor = self._model.feature_extractor
+        try:
+            features = np.stack([
+                pad_or_trim(extractor(self._prepare(audio, 16000)[: extractor.n_samples]), extractor.nb_max_frames)
+                for audio in audios
+            ])
+            results = self._model.model.detect_language(self._model.encode(features))
+        except Exception as exc:
+            raise ASRModelError("Language detection failed") from exc
+        # Each result lists (token, probability) best first; tokens look like "<|en|>"
+        return [probs[0][0][2:-2] for probs in results]
+
+    def _segments(self, audio, *, language: Optional[str], prompt: Optional[str]):
         try:
             segments_iter, info = self._model.transcribe(
-                audio_path,
+                audio,
                 language=language or config.language,
                 beam_size=config.beam_size,
                 vad_filter=config.vad_filter,
@@ -34,24 +72,39 @@ class FasterWhisperBackend:
         except Exception as exc:
             raise ASRModelError("Transcription failed") from exc
 
-        segments: List[ASRSegment] = []
-        texts: List[str] = []
+        def _iter() -> Iterator[ASRSegment]:
+            # faster-whisper decodes lazily: each segment is produced as this loop pulls it
+            for seg in segments_iter:
+                t = seg.text.strip()
+                if t:
+                    yield ASRSegment(float(seg.start), float(seg.end), t)
 
-        for seg in segments_iter:
-            t = seg.text.strip()
-            if t:
-                segments.append(ASRSegment(float(seg.start), float(seg.end), t))
-                texts.append(t)
+        return _iter(), info
 
+    @staticmethod
+    def _collect(segments_iter: Iterator[ASRSegment], info) -> ASRResult:
+        segments: List[ASRSegment] = list(segments_iter)
         return ASRResult(
-            text=" ".join(texts).strip(),
+            text=" ".join(s.text for s in segments).strip(),
             language=getattr(info, "language", None),
             segments=segments,
             duration=getattr(info, "duration", None),
         )
 
+    def transcribe(self, audio_path: str, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
+        return self._collect(*self._segments(audio_path, language=language, prompt=prompt))
+
     def transcribe_audio(self, audio_data, sample_rate: int = 16000, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
         """Transcribe from numpy array audio data directly (no file needed)."""
+        return self._collect(*self._segments(self._prepare(audio_data, sample_rate), language=language, prompt=prompt))
+
+    def iter_segments(self, audio_data, sample_rate: int = 16000, *, language: Optional[str] = None, prompt: Optional[str] = None) -> Iterator[ASRSegment]:
+        """Yield segments of numpy array audio as the decoder produces them."""
+        segments_iter, _ = self._segments(self._prepare(audio_data, sample_rate), language=language, prompt=prompt)
+        return segments_iter
+
+    @staticmethod
+    def _prepare(audio_data, sample_rate: int):
         import numpy as np
         
         # Ensure audio is float32 and normalized for faster_whisper
@@ -60,32 +113,134 @@ class FasterWhisperBackend:
         
         # Resample if needed (faster_whisper expects 16kHz)
         if sample_rate != 16000:
-            import scipy.signal
-            audio_data = scipy.signal.resample(audio_data, int(len(audio_data) * 16000 / sample_rate))
-        
-        try:
-            segments_iter, info = self._model.transcribe(
-                audio_data,
-                language=language or config.language,
-                beam_size=config.beam_size,
-                vad_filter=config.vad_filter,
-                initial_prompt=prompt,
+            from .resample import resample
+            audio_data = resample(audio_data, sample_rate, 16000)
+        return audio_data
+
+    def transcribe_many(self, audios: Sequence, *, language: Optional[str] = None, prompt: Optional[str] = None, batch_size: int = config.batch_size) -> List[ASRResult]:
+        """Transcribe several 16 kHz float32 clips with batched decoder passes.
+
+        Each clip is cut into <=30 s speech chunks (Silero VAD when `vad_filter` is on, fixed
+        windows otherwise). Chunks from all clips are laid end to end and handed to
+        `BatchedInferencePipeline` as explicit clips, so a batch can mix chunks from different
+        files; segment times are mapped back to each file's own timeline. With `language`
+        unset, each clip's language is detected (one batched encoder pass, `detect_languages`)
+        and every language gets its own batched pass.
+        """
+        audios = [self._prepare(audio, 16000) for audio in audios]
+        language = language or config.language
+        if language is not None or len(audios) <= 1:
+            return self._transcribe_batch(audios, language, prompt, batch_size)
+
+        # Empty clips have nothing to detect; they go through with language=None and yield no text
+        spoken = [i for i, audio in enumerate(audios) if len(audio)]
+        groups: Dict[Optional[str], List[int]] = {None: [i for i, audio in enumerate(audios) if not len(audio)]}
+        for i, detected in zip(spoken, self.detect_languages([audios[i] for i in spoken]) if spoken else []):
+            groups.setdefault(detected, []).append(i)
+
+        results: List[Optional[ASRResult]] = [None] * len(audios)
+        for detected, indices in groups.items():
+            if indices:
+                batch = self._transcribe_batch([audios[i] for i in indices], detected, prompt, batch_size)
+                for i, result in zip(indices, batch):
+                    results[i] = result
+        return results
+
+    def _transcribe_batch(self, audios: List, language: Optional[str], prompt: Optional[str], batch_size: int) -> List[ASRResult]:
+        import numpy as np
+        from faster_whisper import BatchedInferencePipeline
+        from faster_whisper.vad import SpeechTimestampsMap, VadOptions, get_speech_timestamps
+
+        if getattr(self, "_batched", None) is None:
+            self._batched = BatchedInferencePipeline(self._model)
+        sr = 16000
+        max_s = 30
+
+        pieces, clips, owners = [], [], []  # owners[i] = (audio index, timestamp map for clip i)
+        offset = 0
+        for idx, audio in enumerate(audios):
+            if config.vad_filter:
+                speech = get_speech_timestamps(audio, VadOptions(max_speech_duration_s=max_s, min_silence_duration_ms=160))
+            else:
+                speech = [{"start": s, "end": min(s + max_s * sr, len(audio))} for s in range(0, len(audio), max_s * sr)]
+            if not speech:
+                continue
+            for spans in _group_spans(speech, max_s * sr):
+                chunk = np.concatenate([audio[s["start"]:s["end"]] for s in spans])
+                pieces.append(chunk)
+                clips.append({"start": offset / sr, "end": (offset + len(chunk)) / sr})
+                owners.append((idx, SpeechTimestampsMap(spans, sr)))
+                offset += len(chunk)
+
+        per_file: List[List[ASRSegment]] = [[] for _ in audios]
+        info = None
+        if pieces:
+            try:
+                segments_iter, info = self._batched.transcribe(
+                    np.concatenate(pieces),
+                    language=language,
+                    beam_size=config.beam_size,
+                    initial_prompt=prompt,
+                    vad_filter=False,
+                    clip_timestamps=clips,
+                    batch_size=batch_size,
+                )
+                segments = list(segments_iter)
+            except Exception as exc:
+                raise ASRModelError("Batched transcription failed") from exc
+
+            starts = [c["start"] for c in clips]
+            for seg in segments:
+                t = seg.text.strip()
+                if not t:
+                    continue
+                clip = max(bisect.bisect_right(starts, float(seg.start) + 1e-3) - 1, 0)
+                idx, timeline = owners[clip]
+                local_start = max(float(seg.start) - starts[clip], 0.0)
+                local_end = max(min(float(seg.end), clips[clip]["end"]) - starts[clip], local_start)
+                per_file[idx].append(ASRSegment(
+                    timeline.get_original_time(local_start),
+                    timeline.get_original_time(local_end, is_end=True),
+                    t,
+                ))
+
+        return [
+            ASRResult(
+                text=" ".join(s.text for s in segs).strip(),
+                language=getattr(info, "language", None),
+                segments=segs,
+                duration=len(audio) / sr,
             )
-        except Exception as exc:
-            raise ASRModelError("Transcription failed") from exc
+            for audio, segs in zip(audios, per_file)
+        ]
 
-        segments: List[ASRSegment] = []
-        texts: List[str] = []
 
-        for seg in segments_iter:
-            t = seg.text.strip()
-            if t:
-                segments.append(ASRSegment(float(seg.start), float(seg.end), t))
-                texts.append(t)
+def _group_spans(spans: List[dict], max_samples: int) -> Iterator[List[dict]]:
+    """Group consecutive speech spans (sample offsets) into runs of at most `max_samples`."""
+    group: List[dict] = []
+    total = 0
+    for span in spans:
+        n = span["end"] - span["start"]
+        if group and total + n > max_samples:
+            yield group
+            group, total = [], 0
+        group.append(span)
+        total += n
+    if group:
+        yield group
 
-        return ASRResult(
-            text=" ".join(texts).strip(),
-            language=getattr(info, "language", None),
-            segments=segments,
-            duration=getattr(info, "duration", None),
-        )
+
+def model_file_bytes(model_name: str) -> int:
+    """Size of `model.bin` for a local model dir or an already-downloaded model name; 0 if unknown."""
+    from pathlib import Path
+
+    path = Path(model_name)
+    if not path.is_dir():
+        try:
+            from faster_whisper.utils import download_model
+
+            path = Path(download_model(model_name, local_files_only=True))
+        except Exception:
+            return 0
+    weights = path / "model.bin"
+    return weights.stat().st_size if weights.exists() else 0
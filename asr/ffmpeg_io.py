@@ -1,5 +1,9 @@
 
-import logging, subprocess
+import asyncio, logging, queue, subprocess, threading, time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
 from pathlib import Path
 from .exceptions import AudioPreprocessingError
 
@@ -19,3 +23,125 @@ def normalize_to_wav(input_path: str, output_path: str, sample_rate: int = 16000
         raise AudioPreprocessingError("ffmpeg failed") from exc
 
     return str(out_path)
+
+def decode_with_ffmpeg(data: bytes, sample_rate: int = 16000) -> np.ndarray:
+    # No temp files: encoded bytes go in on stdin, raw float32 mono PCM comes back on stdout
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+           "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"]
+    try:
+        proc = subprocess.run(cmd, input=data, check=True, capture_output=True)
+    except FileNotFoundError as exc:
+        raise AudioPreprocessingError("ffmpeg not found") from exc
+    except subprocess.CalledProcessError as exc:
+        raise AudioPreprocessingError("ffmpeg failed") from exc
+    return np.frombuffer(proc.stdout, dtype=np.float32)
+
+@dataclass
+class DecodeTiming:
+    wait_s: float    # waiting for a free decoder slot
+    spawn_s: float   # starting ffmpeg on the request path; 0.0 when a warm process was ready
+    decode_s: float  # feeding stdin and draining stdout
+    samples: int
+
+class FFmpegDecoderPool:
+    """Caps concurrent ffmpeg decodes and keeps warm processes ready.
+
+    ffmpeg handles one input per process, so "persistent" here means pre-spawned: up to `size`
+    processes wait on stdin with the output format already set; a decode takes one, streams the
+    encoded bytes in and reads raw PCM out, and a replacement is spawned in the background so
+    process start-up stays off the request path. Only warm processes are replaced, so after
+    `prewarm()` at most `size` wait idle. Recent timings are kept in `timings`.
+    """
+
+    def __init__(self, size: int = 2, sample_rate: int = 16000, timeout_s: float = 30.0, history: int = 256):
+        self.size = max(1, size)
+        self.sample_rate = sample_rate
+        self.timeout_s = timeout_s
+        self.timings: deque[DecodeTiming] = deque(maxlen=history)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle: queue.SimpleQueue[subprocess.Popen] = queue.SimpleQueue()
+        self._idle_lock = threading.Lock()
+        self._closed = False
+
+    def _cmd(self) -> list[str]:
+        return ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+                "-f", "f32le", "-ac", "1", "-ar", str(self.sample_rate), "pipe:1"]
+
+    def _spawn(self) -> subprocess.Popen:
+        try:
+            return subprocess.Popen(self._cmd(), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError as exc:
+            raise AudioPreprocessingError("ffmpeg not found") from exc
+
+    @staticmethod
+    def _kill(proc: subprocess.Popen) -> None:
+        proc.kill()
+        proc.communicate()
+
+    def _replenish(self) -> None:
+        if self._closed:
+            return
+        try:
+            proc = self._spawn()
+        except AudioPreprocessingError:
+            logger.warning("Could not pre-spawn ffmpeg decoder")
+            return
+        with self._idle_lock:
+            # close() may have run while ffmpeg was starting
+            keep = not self._closed and self._idle.qsize() < self.size
+            if keep:
+                self._idle.put(proc)
+        if not keep:
+            self._kill(proc)
+
+    def prewarm(self) -> None:
+        for _ in range(self.size):
+            self._replenish()
+
+    def decode_timed(self, data: bytes) -> tuple[np.ndarray, DecodeTiming]:
+        if self._closed:
+            raise AudioPreprocessingError("Decoder pool is closed")
+        t0 = time.perf_counter()
+        with self._slots:
+            t1 = time.perf_counter()
+            try:
+                proc = self._idle.get_nowait()
+            except queue.Empty:
+                proc = self._spawn()
+            else:
+                threading.Thread(target=self._replenish, name="ffmpeg-prespawn", daemon=True).start()
+            t2 = time.perf_counter()
+            try:
+                out, err = proc.communicate(data, timeout=self.timeout_s)
+            except subprocess.TimeoutExpired as exc:
+                self._kill(proc)
+                raise AudioPreprocessingError("ffmpeg timed out") from exc
+            if proc.returncode != 0:
+                logger.debug("ffmpeg stderr: %s", err.decode(errors="replace").strip())
+                raise AudioPreprocessingError("ffmpeg failed")
+        audio = np.frombuffer(out, dtype=np.float32)
+        timing = DecodeTiming(wait_s=t1 - t0, spawn_s=t2 - t1, decode_s=time.perf_counter() - t2, samples=len(audio))
+        self.timings.append(timing)
+        return audio, timing
+
+    def decode(self, data: bytes, sample_rate: Optional[int] = None) -> np.ndarray:
+        if sample_rate is not None and sample_rate != self.sample_rate:
+            # Warm processes are set up for the pool's rate; spawn one for this call, within the cap
+            if self._closed:
+                raise AudioPreprocessingError("Decoder pool is closed")
+            with self._slots:
+                return decode_with_ffmpeg(data, sample_rate)
+        return self.decode_timed(data)[0]
+
+    async def decode_async(self, data: bytes) -> tuple[np.ndarray, DecodeTiming]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.decode_timed, data)
+
+    def close(self) -> None:
+        with self._idle_lock:
+            self._closed = True
+        while True:
+            try:
+                proc = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._kill(proc)
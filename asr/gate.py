@@ -0,0 +1,64 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+from .vad import EnergyVAD
+
+@dataclass
+class GateDecision:
+    """Outcome of `SpeechGate.screen`: `audio` is trimmed to the speech, starting `offset_s` into the input."""
+    audio: np.ndarray
+    offset_s: float
+    speech_s: float
+    reason: Optional[str] = None  # "too_short" | "no_speech" | "clipped"; None = send to ASR
+
+    @property
+    def passed(self) -> bool:
+        return self.reason is None
+
+@dataclass
+class SpeechGate:
+    """Pre-ASR screen on decoded PCM, a few milliseconds per clip instead of a Whisper pass.
+
+    A frame counts as speech if it is louder than `vad.threshold_db` and its zero-crossing rate
+    is below `max_zcr` (broadband hiss crosses zero on about half its samples, voice far less).
+    Clips shorter than `min_duration_s`, with under `min_speech_s` of speech frames, or with
+    more than `max_clipped` of samples at full scale are rejected. Accepted clips are trimmed to
+    the first and last speech frame, keeping `pad_s` either side so word edges survive.
+    """
+    sample_rate: int = 16000
+    min_duration_s: float = 0.3
+    min_speech_s: float = 0.15
+    max_zcr: float = 0.4
+    max_clipped: float = 0.05
+    pad_s: float = 0.2
+    vad: Optional[EnergyVAD] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.vad = self.vad or EnergyVAD(self.sample_rate)
+
+    def speech_frames(self, audio: np.ndarray) -> np.ndarray:
+        loud = self.vad.speech_frames(audio)
+        n, frame = len(loud), self.vad.frame_len
+        if n == 0:
+            return loud
+        signs = np.signbit(audio[: n * frame]).reshape(n, frame)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame - 1 or 1)
+        return loud & (zcr < self.max_zcr)
+
+    def screen(self, audio: np.ndarray) -> GateDecision:
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        if len(audio) < self.min_duration_s * self.sample_rate:
+            return GateDecision(audio, 0.0, 0.0, "too_short")
+        if np.count_nonzero(np.abs(audio) >= 0.999) > self.max_clipped * len(audio):
+            return GateDecision(audio, 0.0, 0.0, "clipped")
+        speech = self.speech_frames(audio)
+        frame = self.vad.frame_len
+        speech_s = np.count_nonzero(speech) * frame / self.sample_rate
+        if speech_s < self.min_speech_s:
+            return GateDecision(audio, 0.0, speech_s, "no_speech")
+        on = np.flatnonzero(speech)
+        pad = int(self.pad_s * self.sample_rate)
+        start = max(0, int(on[0]) * frame - pad)
+        end = min(len(audio), (int(on[-1]) + 1) * frame + pad)
+        return GateDecision(audio[start:end], start / self.sample_rate, speech_s)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+import numpy as np
+from .types import ASRResult, ASRSegment
+from .vad import EnergyVAD
+
+@dataclass
+class Chunk:
+    """Samples `[start, end)` of the recording; segments starting in `[keep_from, keep_to)` seconds are kept."""
+    start: int
+    end: int
+    keep_from: float
+    keep_to: float
+
+def split_at_silences(audio: np.ndarray, sample_rate: int = 16000, *, chunk_s: float = 60.0, max_s: float = 90.0, overlap_s: float = 2.0, vad: Optional[EnergyVAD] = None) -> List[Chunk]:
+    """Cut a long recording into chunks of `chunk_s`..`max_s` seconds, preferring pauses.
+
+    Each cut goes at the quietest ~0.3 s stretch in that range. When even that is louder than
+    the VAD threshold (continuous speech or music), the neighbouring chunks overlap by
+    `overlap_s` and split the overlap at its middle when stitched.
+    """
+    vad = vad or EnergyVAD(sample_rate)
+    frame = vad.frame_len
+    levels = vad.frame_levels(audio)
+    # A frame's level is the loudest within ~0.3 s, so only real pauses look quiet
+    width = max(1, int(0.3 * sample_rate / frame))
+    if len(levels) >= width:
+        padded = np.pad(levels, (width // 2, width - 1 - width // 2), mode="edge")
+        levels = np.lib.stride_tricks.sliding_window_view(padded, width).max(axis=1)
+
+    chunks: List[Chunk] = []
+    start, keep_from = 0, 0.0
+    half = int(overlap_s * sample_rate / 2)
+    while len(audio) - start > max_s * sample_rate:
+        lo = (start + int(chunk_s * sample_rate)) // frame
+        hi = max(lo + 1, (start + int(max_s * sample_rate)) // frame)
+        f = lo + int(np.argmin(levels[lo:hi]))
+        cut = f * frame + frame // 2
+        if levels[f] <= vad.threshold_db:
+            chunks.append(Chunk(start, cut, keep_from, cut / sample_rate))
+            start, keep_from = cut, cut / sample_rate
+        else:
+            chunks.append(Chunk(start, cut + half, keep_from, cut / sample_rate))
+            start, keep_from = cut - half, cut / sample_rate
+    chunks.append(Chunk(start, len(audio), keep_from, float("inf")))
+    return chunks
+
+def stitch(chunks: Sequence[Chunk], results: Sequence[ASRResult], sample_rate: int = 16000) -> List[ASRSegment]:
+    """Shift each chunk's segments onto the recording's timeline and drop overlap duplicates."""
+    segments: List[ASRSegment] = []
+    for chunk, result in zip(chunks, results):
+        offset = chunk.start / sample_rate
+        for seg in result.segments:
+            start, end = seg.start + offset, seg.end + offset
+            if not chunk.keep_from <= start < chunk.keep_to:
+                continue
+            # The same words decoded on both sides of a hard cut
+            if segments and segments[-1].text == seg.text and start < segments[-1].end:
+                continue
+            segments.append(ASRSegment(start, end, seg.text))
+    return segments
+
+def transcribe_long(backend, audio: np.ndarray, sample_rate: int = 16000, *, workers: int = 2, chunk_s: float = 60.0, max_s: float = 90.0, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
+    """Transcribe a long recording as concurrent chunks with `backend.transcribe_audio`.
+
+    `workers` threads call the backend at once: give `FasterWhisperBackend` as many
+    `num_workers`, or pass an `ASRReplicaPool` to spread chunks across processes.
+    """
+    chunks = split_at_silences(audio, sample_rate, chunk_s=chunk_s, max_s=max_s)
+    if len(chunks) == 1:
+        return backend.transcribe_audio(audio, sample_rate, language=language, prompt=prompt)
+    with ThreadPoolExecutor(max(1, min(workers, len(chunks))), thread_name_prefix="asr-chunk") as pool:
+        results = list(pool.map(
+            lambda c: backend.transcribe_audio(audio[c.start:c.end], sample_rate, language=language, prompt=prompt),
+            chunks,
+        ))
+    segments = stitch(chunks, results, sample_rate)
+    languages = Counter(r.language for r in results if r.language)
+    return ASRResult(
+        text=" ".join(s.text for s in segments),
+        language=language or (languages.most_common(1)[0][0] if languages else None),
+        segments=segments,
+        duration=len(audio) / sample_rate,
+    )
@@ -0,0 +1,315 @@
+"""Multi-process ASR: N model replicas, each in its own worker process.
+
+CTranslate2 scales poorly past a few intra-op threads for small Whisper models, so on many-core
+machines throughput comes from running several independent replicas instead. `ASRReplicaPool`
+implements the `ASRBackend` protocol; wrap it in `ASRService(backend=...)` and nothing else
+changes.
+"""
+
+from __future__ import annotations
+
+import functools
+import itertools
+import logging
+import multiprocessing as mp
+import multiprocessing.connection
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+from .config import config
+from .exceptions import ASRModelError
+from .faster_whisper_backend import FasterWhisperBackend, model_file_bytes
+from .types import ASRResult, ASRSegment
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_POLICIES = ("least_loaded", "round_robin")
+_END = object()
+_SWEEP_S = 1.0  # how often calls on replicas that exited are failed
+
+
+def _replica_main(index: int, factory: Callable[[], Any], jobs, conn, num_workers: int) -> None:
+    """Worker process: load one backend, then serve `(job_id, method, args, kwargs)` jobs.
+
+    Messages go back on this replica's own pipe `conn`, so a replica that dies mid-send
+    cannot leave a lock shared with the other replicas held.
+    """
+    send_lock = threading.Lock()
+
+    def send(message: tuple) -> None:
+        with send_lock:
+            conn.send(message)
+
+    try:
+        backend = factory()
+    except BaseException as exc:
+        send(("failed", index, _picklable(exc)))
+        return
+    send(("ready", index, None))
+
+    def run(job_id: int, method: str, args: tuple, kwargs: dict) -> None:
+        try:
+            if method == "iter_segments":
+                for seg in backend.iter_segments(*args, **kwargs):
+                    send(("segment", job_id, seg))
+                send(("result", job_id, None))
+            else:
+                send(("result", job_id, getattr(backend, method)(*args, **kwargs)))
+        except BaseException as exc:
+            send(("error", job_id, _picklable(exc)))
+
+    # num_workers > 1 lets one replica's model run that many transcriptions at once
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as pool:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            pool.submit(run, *job)
+
+
+def _picklable(exc: BaseException) -> BaseException:
+    import pickle
+
+    try:
+        pickle.dumps(exc)
+        return exc
+    except Exception:
+        return ASRModelError(f"{type(exc).__name__}: {exc}")
+
+
+@dataclass
+class _Replica:
+    index: int
+    process: Any
+    jobs: Any
+    results: Any  # read end of the replica's result pipe
+    in_flight: int = 0
+    served: int = 0
+    gone: bool = False  # its pipe closed: the process exited
+
+    @property
+    def alive(self) -> bool:
+        return not self.gone and self.process.is_alive()
+
+
+@dataclass
+class _Job:
+    replica: _Replica
+    future: Future = field(default_factory=Future)
+    segments: Optional[queue.Queue] = None
+
+
+class ASRReplicaPool:
+    """Load `replicas` ASR backends in separate processes and spread calls across them.
+
+    Each call is sent to one replica chosen by `dispatch`: `"least_loaded"` (fewest calls in
+    flight, ties broken round-robin) or `"round_robin"`. `transcribe_many` splits its clips
+    across replicas. Workers use the `spawn` start method, so `backend_factory` must be
+    picklable (a module-level callable or `functools.partial` of one).
+
+    Callers still need enough threads to keep every replica busy; size the API ASR pool
+    (`asr_workers`) to at least `replicas * num_workers`. A replica that exits is not
+    restarted: new calls skip it, its calls in flight fail as soon as its pipe closes (and a
+    once-a-second sweep catches anything missed), and once no replica is left every call
+    raises `ASRModelError`.
+    """
+
+    def __init__(
+        self,
+        replicas: int = config.replicas,
+        *,
+        model_name: str = config.model_name,
+        dispatch: str = config.dispatch,
+        num_workers: int = config.num_workers,
+        backend_factory: Callable[[], Any] | None = None,
+        start_timeout_s: float = 600.0,
+    ) -> None:
+        if dispatch not in DISPATCH_POLICIES:
+            raise ValueError(f"dispatch must be one of {DISPATCH_POLICIES}, got {dispatch!r}")
+        self.dispatch = dispatch
+        self.model_name = model_name
+        factory = backend_factory or functools.partial(
+            FasterWhisperBackend, model_name=model_name, cpu_threads=config.cpu_threads, num_workers=num_workers
+        )
+        # Every replica holds its own copy of the weights
+        self.nbytes = 0 if backend_factory else max(1, replicas) * model_file_bytes(model_name)
+
+        ctx = mp.get_context("spawn")
+        self._closed = False
+        self._replicas: List[_Replica] = []
+        for index in range(max(1, replicas)):
+            jobs = ctx.Queue()
+            results, conn = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=_replica_main,
+                args=(index, factory, jobs, conn, num_workers),
+                name=f"asr-replica-{index}",
+                daemon=True,
+            )
+            process.start()
+            conn.close()  # only the replica writes; the pipe reports EOF once it exits
+            self._replicas.append(_Replica(index, process, jobs, results))
+
+        self._lock = threading.Lock()
+        self._jobs: dict[int, _Job] = {}
+        self._ids = itertools.count()
+        self._rr = itertools.cycle(range(len(self._replicas)))
+        self._wait_ready(start_timeout_s)
+        self._reader = threading.Thread(target=self._read_results, name="asr-replica-results", daemon=True)
+        self._reader.start()
+        logger.info("Started %d ASR replica process(es), dispatch=%s", len(self._replicas), dispatch)
+
+    @property
+    def size(self) -> int:
+        return len(self._replicas)
+
+    @property
+    def stats(self) -> list[dict[str, int]]:
+        with self._lock:
+            return [{"replica": r.index, "in_flight": r.in_flight, "served": r.served} for r in self._replicas]
+
+    # -- ASRBackend protocol ----------------------------------------------------------------
+
+    def transcribe(self, audio_path: str, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
+        return self._submit("transcribe", audio_path, language=language, prompt=prompt).result()
+
+    def transcribe_audio(self, audio_data, sample_rate: int = 16000, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
+        return self._submit("transcribe_audio", audio_data, sample_rate, language=language, prompt=prompt).result()
+
+    def iter_segments(self, audio_data, sample_rate: int = 16000, *, language: Optional[str] = None, prompt: Optional[str] = None) -> Iterator[ASRSegment]:
+        """Yield segments as the replica decodes them (sent back one message per segment)."""
+        segments: queue.Queue = queue.Queue()
+        future = self._submit("iter_segments", audio_data, sample_rate, language=language, prompt=prompt, segments=segments)
+        while True:
+            item = segments.get()
+            if item is _END:
+                break
+            yield item
+        future.result()  # re-raise a replica-side failure
+
+    def detect_languages(self, audios: Sequence) -> List[str]:
+        return self._submit("detect_languages", list(audios)).result()
+
+    def transcribe_many(self, audios: Sequence, *, language: Optional[str] = None, prompt: Optional[str] = None) -> List[ASRResult]:
+        """Split clips into one contiguous share per replica and transcribe the shares in parallel."""
+        audios = list(audios)
+        shares = min(len(self._replicas), len(audios))
+        if not shares:
+            return []
+        bounds = [round(i * len(audios) / shares) for i in range(shares + 1)]
+        futures = [
+            self._submit("transcribe_many", audios[lo:hi], language=language, prompt=prompt)
+            for lo, hi in zip(bounds, bounds[1:])
+        ]
+        return [result for f in futures for result in f.result()]
+
+    def warmup(self) -> None:
+        """Warm every replica, not just the one the dispatcher would pick."""
+        futures = [self._submit("warmup", replica=r) for r in self._replicas]
+        for future in futures:
+            future.result()
+
+    def close(self, timeout_s: float = 10.0) -> None:
+        self._closed = True  # the reader stops at its next wake-up
+        for replica in self._replicas:
+            if replica.alive:
+                replica.jobs.put(None)
+        for replica in self._replicas:
+            replica.process.join(timeout_s)
+            if replica.process.is_alive():
+                replica.process.terminate()
+
+    # -- internals ----------------------------------------------------------------------------
+
+    def _choose(self) -> _Replica:
+        start = next(self._rr)
+        ordered = [r for r in self._replicas[start:] + self._replicas[:start] if r.alive]
+        if not ordered:
+            raise ASRModelError("No ASR replica is running")
+        if self.dispatch == "round_robin":
+            return ordered[0]
+        return min(ordered, key=lambda r: r.in_flight)
+
+    def _submit(self, method: str, *args: Any, segments: Optional[queue.Queue] = None, replica: Optional[_Replica] = None, **kwargs: Any) -> Future:
+        with self._lock:
+            replica = replica or self._choose()
+            replica.in_flight += 1
+            job_id = next(self._ids)
+            job = _Job(replica, segments=segments)
+            self._jobs[job_id] = job
+        replica.jobs.put((job_id, method, args, kwargs))
+        return job.future
+
+    def _wait_ready(self, timeout_s: float) -> None:
+        pending = {r.results: r for r in self._replicas}
+        deadline = time.monotonic() + timeout_s
+        while pending:
+            ready = mp.connection.wait(list(pending), timeout=max(0.0, deadline - time.monotonic()))
+            if not ready:
+                self.close(timeout_s=0)
+                raise ASRModelError(f"ASR replicas {sorted(r.index for r in pending.values())} did not start within {timeout_s}s")
+            for conn in ready:
+                replica = pending.pop(conn)
+                try:
+                    kind, _, payload = conn.recv()
+                except EOFError:
+                    kind, payload = "failed", None  # exited before reporting
+                if kind == "failed":
+                    self.close(timeout_s=0)
+                    raise ASRModelError(f"ASR replica {replica.index} failed to load") from payload
+
+    def _read_results(self) -> None:
+        # Sweep on a timer as well, not only when every pipe is quiet, which a busy pool never is
+        last_sweep = time.monotonic()
+        while not self._closed:
+            if time.monotonic() - last_sweep >= _SWEEP_S:
+                self._fail_dead_replicas()
+                last_sweep = time.monotonic()
+            conns = {r.results: r for r in self._replicas if not r.gone}
+            if not conns:
+                self._fail_dead_replicas()
+                break
+            for conn in mp.connection.wait(list(conns), timeout=_SWEEP_S):
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    conns[conn].gone = True
+                    logger.error("ASR replica %d exited", conns[conn].index)
+                    self._fail_dead_replicas()
+                    continue
+                self._deliver(message)
+
+    def _deliver(self, message: tuple) -> None:
+        kind, job_id, payload = message
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        if kind == "segment":
+            job.segments.put(payload)
+            return
+        with self._lock:
+            del self._jobs[job_id]
+            job.replica.in_flight -= 1
+            job.replica.served += 1
+        if job.segments is not None:
+            job.segments.put(_END)
+        if kind == "error":
+            job.future.set_exception(payload)
+        else:
+            job.future.set_result(payload)
+
+    def _fail_dead_replicas(self) -> None:
+        with self._lock:
+            lost = [(job_id, job) for job_id, job in self._jobs.items() if not job.replica.alive]
+            for job_id, job in lost:
+                del self._jobs[job_id]
+                job.replica.in_flight -= 1
+        for _, job in lost:
+            logger.error("ASR replica %d exited with a call in flight", job.replica.index)
+            if job.segments is not None:
+                job.segments.put(_END)
+            job.future.set_exception(ASRModelError(f"ASR replica {job.replica.index} exited"))
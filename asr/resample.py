@@ -0,0 +1,113 @@
+"""Rational-ratio (polyphase) resampling for 44.1/48 kHz capture down to Whisper's 16 kHz.
+
+`resample` converts a whole clip; `StreamingResampler` converts a live stream chunk by chunk and
+produces exactly the samples `resample` would give for the concatenated stream, so there are no
+clicks at chunk boundaries. Both use the same Kaiser-windowed low-pass design as
+`scipy.signal.resample_poly`, built once per rate pair and cached.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from math import gcd
+import numpy as np
+
+# Outputs computed per gather in StreamingResampler; bounds the temporary (outputs x taps) matrix
+_BLOCK = 4096
+
+def ratio(src_rate: int, dst_rate: int) -> tuple[int, int]:
+    """`(up, down)` in lowest terms, e.g. 48000 -> 16000 is (1, 3) and 44100 -> 16000 is (160, 441)."""
+    if src_rate <= 0 or dst_rate <= 0:
+        raise ValueError(f"Sample rates must be positive, got {src_rate} -> {dst_rate}")
+    g = gcd(src_rate, dst_rate)
+    return dst_rate // g, src_rate // g
+
+@lru_cache(maxsize=32)
+def design_filter(up: int, down: int) -> np.ndarray:
+    """Low-pass FIR for an `up`/`down` ratio (unscaled, read-only); `resample_poly`'s default design."""
+    from scipy.signal import firwin
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)).astype(np.float32)
+    h.flags.writeable = False
+    return h
+
+@lru_cache(maxsize=32)
+def _polyphase(up: int, down: int) -> np.ndarray:
+    """Filter split into `up` phases: row p holds taps p, p + up, p + 2*up, ... (scaled by `up`)."""
+    h = design_filter(up, down) * up
+    taps = -(-len(h) // up)
+    phases = np.zeros(taps * up, dtype=np.float32)
+    phases[: len(h)] = h
+    phases = np.ascontiguousarray(phases.reshape(taps, up).T)
+    phases.flags.writeable = False
+    return phases
+
+def resample(audio: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Resample mono float audio from `src_rate` to `dst_rate` (float32 out)."""
+    audio = np.asarray(audio, dtype=np.float32)
+    if src_rate == dst_rate:
+        return audio
+    from scipy.signal import resample_poly
+    up, down = ratio(src_rate, dst_rate)
+    return resample_poly(audio, up, down, window=design_filter(up, down)).astype(np.float32, copy=False)
+
+class StreamingResampler:
+    """Stateful polyphase resampler for audio that arrives in chunks (microphone, WebSocket).
+
+    `process(chunk)` returns every output sample whose filter support is already available,
+    so output lags input by about half the filter length (~0.6 ms at 48 kHz -> 16 kHz);
+    `flush()` returns the tail and resets for a new stream.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int) -> None:
+        self.src_rate, self.dst_rate = src_rate, dst_rate
+        self.up, self.down = ratio(src_rate, dst_rate)
+        if self.up == self.down:  # pass-through
+            self._phases, self._taps, self._half = np.ones((1, 1), dtype=np.float32), 1, 0
+        else:
+            self._phases = _polyphase(self.up, self.down)
+            self._taps = self._phases.shape[1]
+            self._half = (len(design_filter(self.up, self.down)) - 1) // 2
+        self.reset()
+
+    def reset(self) -> None:
+        # The buffer starts with `taps` zeros standing in for the signal before the stream began
+        self._buf = np.zeros(self._taps, dtype=np.float32)
+        self._buf_start = -self._taps
+        self._received = 0
+        self._emitted = 0
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        if self.up == self.down:
+            return chunk
+        self._buf = np.concatenate([self._buf, chunk])
+        self._received += len(chunk)
+        # Output n needs input up to index (n * down + half) // up
+        ready = (self._received * self.up - 1 - self._half) // self.down + 1
+        return self._emit(max(ready, self._emitted))
+
+    def flush(self) -> np.ndarray:
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.float32)
+        total = -(-self._received * self.up // self.down)
+        self._buf = np.concatenate([self._buf, np.zeros(self._taps + self._half // self.up + 1, dtype=np.float32)])
+        out = self._emit(total)
+        self.reset()
+        return out
+
+    def _emit(self, count: int) -> np.ndarray:
+        outputs = []
+        for start in range(self._emitted, count, _BLOCK):
+            n = np.arange(start, min(start + _BLOCK, count))
+            m = n * self.down + self._half
+            # Input indices feeding output n, newest first, matching the phase's tap order
+            idx = (m // self.up - self._buf_start)[:, None] - np.arange(self._taps)[None, :]
+            outputs.append(np.einsum("ij,ij->i", self._phases[m % self.up], self._buf[idx]))
+        self._emitted = max(self._emitted, count)
+        # Drop input no future output can reach
+        oldest = (self._emitted * self.down + self._half) // self.up - self._taps + 1
+        drop = max(0, oldest - self._buf_start)
+        if drop:
+            self._buf = self._buf[drop:]
+            self._buf_start += drop
+        return np.concatenate(outputs).astype(np.float32, copy=False) if outputs else np.zeros(0, dtype=np.float32)
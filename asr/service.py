@@ -1,26 +1,240 @@
 
 from __future__ import annotations
+import logging
+from collections import Counter
 import tempfile
+import wave
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 from .config import config
-from .ffmpeg_io import normalize_to_wav
-from .types import ASRResult
+from .decode import decode_audio_bytes
+from .exceptions import AudioPreprocessingError
+from .ffmpeg_io import FFmpegDecoderPool, normalize_to_wav
+from .gate import GateDecision, SpeechGate
+from .long_audio import transcribe_long
+from .streaming import StreamingTranscriber
+from .transcript_cache import TranscriptCache, transcript_key
+from .types import ASRResult, ASRSegment
 from .faster_whisper_backend import FasterWhisperBackend
 
+logger = logging.getLogger(__name__)
+
 class ASRService:
     def __init__(self, backend=None):
         self.backend = backend or FasterWhisperBackend()
         self.sample_rate = config.sample_rate
+        self.ffmpeg_pool = FFmpegDecoderPool(config.ffmpeg_workers, self.sample_rate) if config.ffmpeg_workers > 0 else None
+        self.transcript_cache = TranscriptCache(
+            config.transcript_cache_entries,
+            path=config.transcript_cache_path,
+            max_disk_bytes=int(config.transcript_cache_disk_mb * 1024 * 1024),
+        ) if config.transcript_cache_entries > 0 else None
+        self.gate = SpeechGate(
+            self.sample_rate, min_speech_s=config.gate_min_speech_s, max_clipped=config.gate_max_clipped
+        ) if config.speech_gate else None
+        self.gate_rejections: Counter[str] = Counter()
+
+    @property
+    def nbytes(self) -> int:
+        return int(getattr(self.backend, "nbytes", 0) or 0)
+
+    def warmup(self) -> None:
+        warmup = getattr(self.backend, "warmup", None)
+        if callable(warmup):
+            warmup()
+        else:
+            self.backend.transcribe_audio(np.zeros(self.sample_rate, dtype=np.float32), self.sample_rate)
+        if self.ffmpeg_pool is not None:
+            self.ffmpeg_pool.prewarm()
+
+    def close(self) -> None:
+        close = getattr(self.backend, "close", None)
+        if callable(close):
+            close()
+        if self.ffmpeg_pool is not None:
+            self.ffmpeg_pool.close()
+        if self.transcript_cache is not None:
+            self.transcript_cache.close()
+
+    def _cache_key(self, audio: bytes | np.ndarray, *, entry: str, language: Optional[str], prompt: Optional[str]) -> Optional[str]:
+        """Key for a transcript of `audio` from the `entry` method under the current settings; None when caching is off.
+
+        Entry points transcribe the same audio differently (only `transcribe_bytes` and
+        `iter_segments` run the speech gate, `transcribe_many` decodes in batches), so each
+        caches its own results.
+        """
+        if self.transcript_cache is None:
+            return None
+        backend = self.backend
+        gated = self.gate is not None and entry in ("transcribe_bytes", "iter_segments")
+        return transcript_key(
+            audio,
+            model_name=getattr(backend, "model_name", type(backend).__name__),
+            compute_type=getattr(backend, "compute_type", config.compute_type),
+            beam_size=config.beam_size,
+            vad_filter=config.vad_filter,
+            language=language or config.language,
+            prompt=prompt,
+            sample_rate=self.sample_rate,
+            entry=entry,
+            # The gate trims what Whisper hears and long audio is decoded in chunks
+            speech_gate=gated,
+            gate_min_speech_s=self.gate.min_speech_s if gated else None,
+            gate_max_clipped=self.gate.max_clipped if gated else None,
+            long_audio_s=config.long_audio_s,
+            long_chunk_s=config.long_chunk_s,
+        )
 
     def transcribe_file(self, input_path: str, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
         p = Path(input_path)
         if not p.exists():
             raise FileNotFoundError(f"Missing audio: {input_path}")
+        key = self._cache_key(p.read_bytes(), entry="transcribe_file", language=language, prompt=prompt)
+        if key is not None and (cached := self.transcript_cache.get(key)) is not None:
+            return cached
 
         with tempfile.TemporaryDirectory() as tmp:
             norm = Path(tmp) / "normalized.wav"
             wav = normalize_to_wav(str(p), str(norm), sample_rate=self.sample_rate)
-            result = self.backend.transcribe(wav, language=language, prompt=prompt)
+            with wave.open(wav, "rb") as w:
+                long = self._is_long(w.getnframes())
+            if long:
+                result = self.transcribe_long(self.decode(norm.read_bytes()), language=language, prompt=prompt)
+            else:
+                result = self.backend.transcribe(wav, language=language, prompt=prompt)
             result.text = " ".join(result.text.split())
-            return result
+        if key is not None:
+            self.transcript_cache.put(key, result)
+        return result
+
+    def decode(self, data: bytes) -> np.ndarray:
+        # In-process decode straight to float32 PCM: no temp files, no ffmpeg spawn for common formats
+        ffmpeg = self.ffmpeg_pool.decode if self.ffmpeg_pool else None
+        return decode_audio_bytes(data, sample_rate=self.sample_rate, ffmpeg=ffmpeg)
+
+    def screen(self, audio: np.ndarray) -> GateDecision:
+        """Run the speech gate on decoded PCM; with the gate off every clip passes untrimmed."""
+        if self.gate is None:
+            return GateDecision(audio, 0.0, len(audio) / self.sample_rate)
+        decision = self.gate.screen(audio)
+        if not decision.passed:
+            self.gate_rejections[decision.reason] += 1
+            logger.debug("Speech gate rejected %.2fs of audio: %s", len(audio) / self.sample_rate, decision.reason)
+        return decision
+
+    def transcribe_bytes(self, data: bytes, *, language: Optional[str] = None, prompt: Optional[str] = None) -> ASRResult:
+        key = self._cache_key(data, entry="transcribe_bytes", language=language, prompt=prompt)
+        if key is not None and (cached := self.transcript_cache.get(key)) is not None:
+            return cached
+        audio = self.decode(data)
+        gated = self.screen(audio)
+        if not gated.passed:
+            return ASRResult("", None, [], len(audio) / self.sample_rate)
+        if self._is_long(len(gated.audio)):
+            result = self.transcribe_long(gated.audio, language=language, prompt=prompt)
+        else:
+            result = self.backend.transcribe_audio(gated.audio, self.sample_rate, language=language, prompt=prompt)
+        result.text = " ".join(result.text.split())
+        # Timestamps and duration refer to the upload, not the trimmed clip
+        result.segments = [ASRSegment(s.start + gated.offset_s, s.end + gated.offset_s, s.text) for s in result.segments]
+        result.duration = len(audio) / self.sample_rate
+        if key is not None:
+            self.transcript_cache.put(key, result)
+        return result
+
+    def _is_long(self, samples: int) -> bool:
+        return config.long_audio_s > 0 and samples >= config.long_audio_s * self.sample_rate
+
+    def transcribe_long(self, audio: np.ndarray, *, language: Optional[str] = None, prompt: Optional[str] = None, workers: Optional[int] = None) -> ASRResult:
+        """Transcribe a long recording (meetings, lectures) as concurrently decoded chunks.
+
+        The audio is cut at pauses into chunks of about `long_chunk_s` (`asr/long_audio.py`);
+        `workers` chunks (default `long_workers`, else `replicas * num_workers`) are in flight
+        at once, and their segments are stitched back onto the recording's timeline.
+        `transcribe_bytes` and `transcribe_file` switch to this for clips of `long_audio_s` or more.
+        """
+        workers = workers or config.long_workers or max(1, config.replicas) * max(1, config.num_workers)
+        return transcribe_long(
+            self.backend, audio, self.sample_rate,
+            workers=workers, chunk_s=config.long_chunk_s, max_s=1.5 * config.long_chunk_s,
+            language=language, prompt=prompt,
+        )
+
+    def transcribe_many(self, paths: Iterable[str | Path], *, language: Optional[str] = None, prompt: Optional[str] = None, skip_errors: bool = False) -> Iterator[Tuple[Path, ASRResult]]:
+        """Transcribe many files with batched inference, yielding `(path, result)` in input order.
+
+        Files are decoded in memory and handed to `backend.transcribe_many` in groups of about
+        `batch_size` x 30 s of audio, so the decoder batches speech chunks across files while
+        memory stays bounded however many paths are given. With `skip_errors`, files that fail
+        to decode are logged and left out instead of aborting the run. Files already in the
+        transcript cache are not decoded again.
+        """
+        group: List[Tuple[Path, Optional[str], np.ndarray | ASRResult]] = []
+        group_samples = 0
+        max_samples = config.batch_size * 30 * self.sample_rate
+        for path in paths:
+            path = Path(path)
+            try:
+                data = path.read_bytes()
+                key = self._cache_key(data, entry="transcribe_many", language=language, prompt=prompt)
+                cached = self.transcript_cache.get(key) if key is not None else None
+                audio = cached if cached is not None else self.decode(data)
+            except (OSError, AudioPreprocessingError):
+                if not skip_errors:
+                    raise
+                logger.warning("Skipping undecodable audio: %s", path, exc_info=True)
+                continue
+            group.append((path, key, audio))
+            if cached is None:
+                group_samples += len(audio)
+            if group_samples >= max_samples:
+                yield from self._transcribe_group(group, language=language, prompt=prompt)
+                group, group_samples = [], 0
+        if group:
+            yield from self._transcribe_group(group, language=language, prompt=prompt)
+
+    def _transcribe_group(self, group: List[Tuple[Path, Optional[str], np.ndarray | ASRResult]], *, language: Optional[str], prompt: Optional[str]) -> Iterator[Tuple[Path, ASRResult]]:
+        audios = [audio for _, _, audio in group if not isinstance(audio, ASRResult)]
+        results = iter(self.backend.transcribe_many(audios, language=language, prompt=prompt) if audios else [])
+        for path, key, audio in group:
+            if isinstance(audio, ASRResult):
+                yield path, audio
+                continue
+            result = next(results)
+            result.text = " ".join(result.text.split())
+            if key is not None:
+                self.transcript_cache.put(key, result)
+            yield path, result
+
+    def iter_segments(self, audio: bytes | np.ndarray, *, language: Optional[str] = None, prompt: Optional[str] = None) -> Iterator[ASRSegment]:
+        """Yield transcript segments as soon as the backend decodes them.
+
+        `audio` is either an encoded upload (decoded like `transcribe_bytes`) or float32 PCM at
+        `sample_rate`. Nothing is decoded until the generator is first advanced. A cached
+        transcript is replayed at once; a fresh one is cached only if it is read to the end.
+        Audio the speech gate rejects yields nothing.
+        """
+        if isinstance(audio, bytearray):
+            audio = bytes(audio)
+        key = self._cache_key(audio, entry="iter_segments", language=language, prompt=prompt)
+        if key is not None and (cached := self.transcript_cache.get(key)) is not None:
+            yield from cached.segments
+            return
+        if isinstance(audio, bytes):
+            audio = self.decode(audio)
+        gated = self.screen(audio)
+        if not gated.passed:
+            return
+        segments: List[ASRSegment] = []
+        for seg in self.backend.iter_segments(gated.audio, self.sample_rate, language=language, prompt=prompt):
+            text = " ".join(seg.text.split())
+            if text:
+                segments.append(ASRSegment(seg.start + gated.offset_s, seg.end + gated.offset_s, text))
+                yield segments[-1]
+        if key is not None:
+            text = " ".join(s.text for s in segments)
+            self.transcript_cache.put(key, ASRResult(text, None, segments, len(audio) / self.sample_rate))
+
+    def stream_transcriber(self, *, input_rate: Optional[int] = None, language: Optional[str] = None, prompt: Optional[str] = None) -> StreamingTranscriber:
+        return StreamingTranscriber(self.backend, sample_rate=self.sample_rate, input_rate=input_rate, language=language, prompt=prompt)
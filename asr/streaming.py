@@ -0,0 +1,147 @@
+from __future__ import annotations
+import logging
+from dataclasses import dataclass, field, replace
+from typing import List, Optional
+import numpy as np
+from .config import config
+from .resample import StreamingResampler
+from .types import ASRSegment
+from .vad import EnergyVAD
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class StreamEvent:
+    type: str  # "partial" | "final" | "end_of_speech"
+    segment: Optional[ASRSegment] = None
+    text: str = ""
+
+@dataclass
+class StreamingTranscriber:
+    """Incremental transcription of live PCM chunks for one speaker.
+
+    Audio accumulates in a window that starts at the last committed segment. Every `step_s` of
+    new speech the window is re-decoded; leading segments that end at least `stable_margin_s`
+    before the window edge and read the same as in the previous pass are emitted as `final` and
+    cut from the window, the rest as `partial`. `end_silence_s` of silence after speech (per
+    `EnergyVAD`) ends the utterance: the remainder is decoded once more, emitted as `final`,
+    and an `end_of_speech` event carries the full transcript. Timestamps are stream-global.
+    """
+    backend: object
+    sample_rate: int = config.sample_rate
+    input_rate: Optional[int] = None  # rate of fed chunks if different from sample_rate
+    step_s: float = config.stream_step_s
+    end_silence_s: float = config.stream_end_silence_s
+    stable_margin_s: float = 1.0
+    max_window_s: float = 25.0
+    preroll_s: float = 0.5
+    language: Optional[str] = None
+    prompt: Optional[str] = None
+    vad: Optional[EnergyVAD] = None
+
+    _window: np.ndarray = field(init=False, repr=False)
+    _offset_s: float = field(init=False, default=0.0)
+    _undecoded: int = field(init=False, default=0)
+    _silence: int = field(init=False, default=0)
+    _heard_speech: bool = field(init=False, default=False)
+    _previous: List[ASRSegment] = field(init=False, default_factory=list)
+    committed: List[ASRSegment] = field(init=False, default_factory=list)
+    _resampler: Optional[StreamingResampler] = field(init=False, default=None, repr=False)
+
+    def __post_init__(self):
+        self._window = np.zeros(0, dtype=np.float32)
+        self.vad = self.vad or EnergyVAD(self.sample_rate)
+        if self.input_rate and self.input_rate != self.sample_rate:
+            # Stateful, so chunk boundaries do not click the way per-chunk resampling would
+            self._resampler = StreamingResampler(self.input_rate, self.sample_rate)
+
+    @property
+    def text(self) -> str:
+        return " ".join(s.text for s in self.committed).strip()
+
+    def feed(self, pcm: np.ndarray) -> List[StreamEvent]:
+        pcm = np.asarray(pcm, dtype=np.float32).reshape(-1)
+        if self._resampler is not None:
+            pcm = self._resampler.process(pcm)
+        if not len(pcm):
+            return []
+        self._window = np.concatenate([self._window, pcm])
+        self._undecoded += len(pcm)
+
+        speech = self.vad.speech_frames(pcm)
+        if speech.any():
+            self._heard_speech = True
+            trailing = len(speech) - 1 - int(np.flatnonzero(speech)[-1])
+            self._silence = trailing * self.vad.frame_len + len(pcm) % self.vad.frame_len
+        else:
+            self._silence += len(pcm)
+
+        if not self._heard_speech:
+            # Nothing said yet: keep a short pre-roll so the first word is not clipped
+            keep = int(self.preroll_s * self.sample_rate)
+            if len(self._window) > keep:
+                self._offset_s += (len(self._window) - keep) / self.sample_rate
+                self._window = self._window[-keep:]
+            self._undecoded = 0
+            return []
+        if self._silence >= self.end_silence_s * self.sample_rate:
+            return self.finish()
+        if self._undecoded >= self.step_s * self.sample_rate:
+            return self._decode(final=False)
+        return []
+
+    def finish(self) -> List[StreamEvent]:
+        """End the current utterance and reset for the next one."""
+        events = self._decode(final=True) if self._heard_speech and len(self._window) else []
+        events.append(StreamEvent("end_of_speech", text=self.text))
+        self._offset_s += len(self._window) / self.sample_rate
+        self._window = np.zeros(0, dtype=np.float32)
+        self._undecoded = self._silence = 0
+        self._heard_speech = False
+        self._previous = []
+        self.committed = []
+        return events
+
+    def _context_prompt(self) -> Optional[str]:
+        # Committed text conditions the next window, like Whisper's own previous-text context
+        tail = self.text[-200:]
+        parts = [p for p in (self.prompt, tail) if p]
+        return " ".join(parts) or None
+
+    def _decode(self, final: bool) -> List[StreamEvent]:
+        self._undecoded = 0
+        result = self.backend.transcribe_audio(self._window, self.sample_rate, language=self.language, prompt=self._context_prompt())
+        segments = [s for s in result.segments if s.text.strip()]
+        window_s = len(self._window) / self.sample_rate
+
+        if final:
+            stable = len(segments)
+        else:
+            horizon = window_s - self.stable_margin_s
+            stable = 0
+            for i, seg in enumerate(segments):
+                agreed = i < len(self._previous) and self._previous[i].text == seg.text
+                if seg.end > horizon or not agreed:
+                    break
+                stable = i + 1
+            if window_s > self.max_window_s and len(segments) > 1:
+                # Window too long for Whisper; commit everything but the last segment regardless
+                stable = max(stable, len(segments) - 1)
+
+        events = []
+        for seg in segments[:stable]:
+            glob = ASRSegment(self._offset_s + seg.start, self._offset_s + seg.end, seg.text.strip())
+            self.committed.append(glob)
+            events.append(StreamEvent("final", glob))
+        if stable and not final:
+            cut_s = segments[stable - 1].end
+            cut = min(len(self._window), int(round(cut_s * self.sample_rate)))
+            self._window = self._window[cut:]
+            self._offset_s += cut / self.sample_rate
+            segments = [replace(s, start=s.start - cut_s, end=s.end - cut_s) for s in segments[stable:]]
+        elif not final:
+            segments = segments[stable:]
+        self._previous = [] if final else segments
+        if not final:
+            events.extend(StreamEvent("partial", ASRSegment(self._offset_s + s.start, self._offset_s + s.end, s.text.strip())) for s in segments)
+        return events
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import hashlib, json, logging, sqlite3, threading, time
+from collections import OrderedDict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Optional
+import numpy as np
+from .types import ASRResult, ASRSegment
+
+logger = logging.getLogger(__name__)
+
+def transcript_key(audio: bytes | np.ndarray, **settings: Any) -> str:
+    """Hash of the audio content (encoded bytes or PCM samples) and the settings that shape the transcript."""
+    digest = hashlib.sha256(memoryview(np.ascontiguousarray(audio)) if isinstance(audio, np.ndarray) else audio)
+    blob = json.dumps(settings, sort_keys=True, default=str, ensure_ascii=False)
+    digest.update(blob.encode("utf-8"))
+    return digest.hexdigest()
+
+def _dump(result: ASRResult) -> str:
+    return json.dumps(asdict(result), ensure_ascii=False)
+
+def _load(blob: str) -> ASRResult:
+    # A fresh object per hit, so callers may edit what they get back
+    data = json.loads(blob)
+    data["segments"] = [ASRSegment(**s) for s in data["segments"]]
+    return ASRResult(**data)
+
+class TranscriptCache:
+    """Two-tier cache of `ASRResult`s for audio that is submitted again (client retries, batch reruns).
+
+    Same layout as `llm.response_cache.ResponseCache`: an in-memory LRU of `max_entries`
+    results, optionally backed by a SQLite file trimmed least-recently-used first to
+    `max_disk_bytes`. Disk hits are promoted to memory. The disk tier holds transcripts, so
+    only enable it where storing them is acceptable.
+    """
+
+    def __init__(self, max_entries: int = 128, *, path: Path | str | None = None, max_disk_bytes: int = 64 * 1024 * 1024) -> None:
+        self._max_entries = max(1, max_entries)
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts "
+                "(key TEXT PRIMARY KEY, result TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def stats(self) -> dict[str, float]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def get(self, key: str) -> Optional[ASRResult]:
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return _load(blob)
+            if self._db is not None:
+                row = self._db.execute("SELECT result FROM transcripts WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE transcripts SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return _load(row[0])
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: ASRResult) -> None:
+        blob = _dump(result)
+        with self._lock:
+            self._remember(key, blob)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO transcripts (key, result, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob.encode("utf-8")), time.time()),
+                )
+                self._trim_disk()
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM transcripts")
+                self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, blob: str) -> None:
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    def _trim_disk(self) -> None:
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()
+        while total > self._max_disk_bytes:
+            row = self._db.execute("SELECT key, size FROM transcripts ORDER BY last_used ASC LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM transcripts WHERE key = ?", (row[0],))
+            total -= row[1]
+            logger.debug("Evicted cached transcript from disk tier (%d bytes)", row[1])
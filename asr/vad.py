@@ -0,0 +1,25 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import numpy as np
+
+@dataclass
+class EnergyVAD:
+    """Frame-level voice activity by RMS level; cheap enough to run on every incoming chunk."""
+    sample_rate: int = 16000
+    frame_ms: float = 30.0
+    threshold_db: float = -45.0  # dBFS; frames louder than this count as speech
+
+    @property
+    def frame_len(self) -> int:
+        return max(1, int(self.sample_rate * self.frame_ms / 1000))
+
+    def frame_levels(self, audio: np.ndarray) -> np.ndarray:
+        n = len(audio) // self.frame_len
+        if n == 0:
+            return np.zeros(0, dtype=np.float32)
+        frames = audio[: n * self.frame_len].astype(np.float32, copy=False).reshape(n, self.frame_len)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        return 20 * np.log10(np.maximum(rms, 1e-10))
+
+    def speech_frames(self, audio: np.ndarray) -> np.ndarray:
+        return self.frame_levels(audio) > self.threshold_db
@@ -2,7 +2,16 @@
 
 from .config import LLMConfig, DEFAULT_LLM_CONFIG
 from .types import LLMRequest, LLMResponse
+from .base import LLMBackend
+from .ctranslate2_backend import CTranslate2Backend
 from .service import LLMService
+from .batching import LLMBatcher
+from .continuous import ContinuousBatcher
+from .sessions import ChatSession, SessionStore
+from .prefix_cache import PrefixCache
+from .response_cache import ResponseCache
+from .pipeline import IncrementalPrompt, prefill_pipelined, run_pipelined
+from .speculative import DraftModel, PromptLookup, SpeculativeStats
 
 __all__ = [
     "LLMConfig",
@@ -10,4 +19,18 @@ __all__ = [
     "LLMRequest",
     "LLMResponse",
     "LLMService",
+    "LLMBackend",
+    "CTranslate2Backend",
+    "LLMBatcher",
+    "ContinuousBatcher",
+    "ChatSession",
+    "SessionStore",
+    "PrefixCache",
+    "ResponseCache",
+    "IncrementalPrompt",
+    "prefill_pipelined",
+    "run_pipelined",
+    "PromptLookup",
+    "DraftModel",
+    "SpeculativeStats",
 ]
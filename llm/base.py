@@ -0,0 +1,19 @@
+from __future__ import annotations
+from typing import Iterable, Iterator, List, Protocol, Sequence
+
+class LLMBackend(Protocol):
+    """A decoding engine behind `LLMService`: prompt token ids in, generated token ids out.
+
+    Templates, tokenization, stop tokens and response caching stay in `LLMService`. The default
+    transformers model is used directly rather than through this protocol, because the KV-cache
+    features (prefix cache, session caches, pipelined prefill, continuous batching) need the
+    model itself; other engines serve `generate`, `generate_batch`, `stream` and `chat` only.
+    """
+
+    nbytes: int
+
+    def generate_ids(self, prompts: Sequence[Sequence[int]], *, max_new_tokens: int, temperature: float, top_p: float, repetition_penalty: float, eos_ids: Iterable[int]) -> List[List[int]]:
+        ...
+
+    def stream_ids(self, prompt: Sequence[int], *, max_new_tokens: int, temperature: float, top_p: float, repetition_penalty: float, eos_ids: Iterable[int]) -> Iterator[int]:
+        ...
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from .pipeline import IncrementalPrompt
+from .service import LLMService
+from .sessions import ChatSession
+from .types import LLMRequest, LLMResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Pending:
+    request: LLMRequest
+    future: Future = field(default_factory=Future)
+
+
+class LLMBatcher:
+    """Collects concurrent requests and runs them through `LLMService.generate_batch`.
+
+    Callers use it exactly like `LLMService.generate`: each call blocks until its own response
+    is ready. A single scheduler thread takes the first queued request, waits up to
+    `max_wait_ms` for more (stopping early at `max_batch_size`), groups them by sampling
+    parameters and runs one left-padded `generate` per group.
+
+    Batching only helps when several threads call `generate` at once, so pair it with an
+    API LLM pool of at least `max_batch_size` workers.
+    """
+
+    def __init__(self, service: LLMService, *, max_batch_size: int = 8, max_wait_ms: float = 10.0) -> None:
+        self._service = service
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self._queue: queue.Queue[_Pending | None] = queue.Queue()
+        self._batches = 0
+        self._batched_requests = 0
+        self._worker = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+        self._worker.start()
+
+    @property
+    def service(self) -> LLMService:
+        return self._service
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """Number of `generate` calls issued and the mean number of requests per call."""
+        mean = self._batched_requests / self._batches if self._batches else 0.0
+        return {"batches": self._batches, "requests": self._batched_requests, "mean_batch_size": mean}
+
+    @property
+    def nbytes(self) -> int:
+        return self._service.nbytes
+
+    def warmup(self) -> None:
+        self._service.warmup()
+
+    def generate(self, request: LLMRequest) -> LLMResponse:
+        """Queue a request for the next batch and wait for its response."""
+        if not request.text:
+            raise ValueError("LLMRequest.text must not be empty")
+        cached = self._service.cached_response(request)
+        if cached is not None:
+            return cached
+        pending = _Pending(request)
+        self._queue.put(pending)
+        response = pending.future.result()
+        self._service.cache_response(request, response)
+        return response
+
+    def stream(self, request: LLMRequest) -> Iterator[str]:
+        """Streaming bypasses batching; tokens go straight to the caller."""
+        return self._service.stream(request)
+
+    def incremental(self, request: LLMRequest | None = None) -> IncrementalPrompt:
+        """Pipelined prompts hold their own KV state and bypass batching."""
+        return self._service.incremental(request)
+
+    def chat(self, request: LLMRequest, session: ChatSession) -> LLMResponse:
+        """Session turns reuse their own KV cache and bypass batching."""
+        return self._service.chat(request, session)
+
+    def chat_stream(self, request: LLMRequest, session: ChatSession) -> Iterator[str]:
+        return self._service.chat_stream(request, session)
+
+    def close(self) -> None:
+        """Stop the scheduler thread once queued requests have been served."""
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first: _Pending) -> tuple[list[_Pending], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self._max_wait_s
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    @staticmethod
+    def _group_key(request: LLMRequest) -> tuple[Any, ...]:
+        # max_new_tokens is deliberately left out: generate_batch runs to the longest limit
+        return (request.temperature, request.top_p, request.repetition_penalty)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+
+            groups: dict[tuple[Any, ...], list[_Pending]] = {}
+            for pending in batch:
+                groups.setdefault(self._group_key(pending.request), []).append(pending)
+
+            for group in groups.values():
+                self._dispatch(group)
+
+    def _dispatch(self, group: list[_Pending]) -> None:
+        self._batches += 1
+        self._batched_requests += len(group)
+        logger.debug("Dispatching LLM batch of %d request(s)", len(group))
+        try:
+            if len(group) == 1:
+                # Keeps the prefix cache and speculative decoding; the cache was checked on entry
+                responses = [self._service._generate(group[0].request)]
+            else:
+                responses = self._service.generate_batch([p.request for p in group])
+        except Exception as exc:
+            for pending in group:
+                pending.future.set_exception(exc)
+            return
+        for pending, response in zip(group, responses):
+            pending.future.set_result(response)
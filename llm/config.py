@@ -15,6 +15,49 @@ class LLMConfig:
         temperature: Default sampling temperature for generation.
         top_p: Nucleus sampling probability mass to consider.
         repetition_penalty: Penalty applied to repeated tokens; 1.0 disables it.
+        max_batch_size: Upper bound on concurrent requests merged into one `generate` call
+            by `LLMBatcher`; 1 disables batching.
+        batch_wait_ms: How long the batcher waits for more requests after the first one
+            arrives. Higher values trade first-request latency for larger batches.
+        batching: "static" groups requests into one `generate` call (`LLMBatcher`);
+            "continuous" joins/retires requests between decode steps (`ContinuousBatcher`).
+        prefix_cache_mb: Memory budget for precomputed KV state of static template prefixes
+            (see `PrefixCache`); 0 disables prefix reuse.
+        session_max_tokens: Context budget for a multi-turn chat session (history plus the
+            new reply); older turns are dropped and re-prefilled once it is exceeded.
+        response_cache_entries: In-memory LRU size for responses to greedy (temperature 0)
+            requests; 0 (the default) disables response caching. Enable it only where
+            repeated identical requests should get the same reply back.
+        response_cache_path: Optional SQLite file backing the response cache on disk.
+        response_cache_disk_mb: Size limit for the on-disk tier.
+        load_cache_dir: Optional directory for dtype-converted safetensors copies of the
+            weights; later starts memory-map them instead of re-running `from_pretrained`.
+        cpu_quantization: "dynamic_int8" runs every Linear layer with int8 weights on CPU;
+            "none" keeps `cpu_dtype`. Ignored on CUDA. The int8 layers are private memory, so
+            with `load_cache_dir` they no longer share pages with other processes.
+        compile: Wrap the CPU forward pass in `torch.compile` (`compile_mode`); the first
+            requests pay the compilation time, so pair it with registry warmup.
+        parity_check: After applying CPU optimizations, compare logits and a greedy
+            continuation against outputs captured from the model before optimizing and log
+            the result.
+        engine: "transformers" runs the model in-process with all features; "ctranslate2"
+            decodes with CTranslate2 (int8 by default), without the KV-cache features
+            (prefix cache, session caches, pipelined prefill, continuous batching).
+        engine_dir: Converted model for non-transformers engines; created from `model_dir`
+            on first start when missing (default: next to `model_dir`).
+        engine_compute_type: Precision for the CTranslate2 engine ("int8", "float32", ...).
+        engine_threads: Intra-op threads for the CTranslate2 engine; 0 lets it decide.
+        speculative: Speculative decoding for `LLMService.generate` (transformers engine):
+            "prompt_lookup" guesses continuations from n-grams already in the context,
+            "draft" from the greedy output of `draft_model_dir`; "none" disables it.
+        speculative_tokens: Tokens guessed per verification step.
+        prompt_lookup_max_ngram: Longest context tail matched by prompt lookup.
+        draft_model_dir: Small model sharing the main model's tokenizer, for "draft".
+        speculative_prompt_keys: Templates speculative decoding is used for; empty means
+            all. Prompt lookup pays off where replies copy from the input.
+        stop_sequences: Text that ends a reply (in addition to the model's EOS tokens) and is
+            cut from it. Sequences that are a single token stop generation like EOS; longer
+            ones are checked against the decoded tail after every step.
     """
 
     model_dir: Path = Path("models") / "models--Qwen--Qwen2-0.5B-Instruct" / "snapshots" / "c540970f9e29518b1d8f06ab8b24cba66ad77b6d"
@@ -27,16 +70,46 @@ class LLMConfig:
     instruction_prompt: str = ""
     load_in_8bit: bool = False
     load_in_4bit: bool = True
-    cpu_dtype: str = "float32"  # used when running on CPU to avoid slow float16 emulation
+    cpu_dtype: str = "float32"  # used on CPU; "bfloat16" only where the CPU supports it natively
     cuda_dtype: str = "float16"  # used when running on CUDA
+    max_batch_size: int = 1
+    batch_wait_ms: float = 10.0
+    batching: str = "static"  # "static" | "continuous"
+    prefix_cache_mb: float = 64.0
+    session_max_tokens: int = 2048
+    response_cache_entries: int = 0
+    response_cache_path: Path | None = None
+    response_cache_disk_mb: float = 64.0
+    load_cache_dir: Path | None = None
+    cpu_quantization: str = "none"  # "none" | "dynamic_int8"
+    compile: bool = False
+    compile_mode: str = "default"
+    parity_check: bool = False
+    engine: str = "transformers"  # "transformers" | "ctranslate2"
+    engine_dir: Path | None = None
+    engine_compute_type: str = "int8"
+    engine_threads: int = 0
+    speculative: str = "none"  # "none" | "prompt_lookup" | "draft"
+    speculative_tokens: int = 8
+    prompt_lookup_max_ngram: int = 3
+    draft_model_dir: Path | None = None
+    speculative_prompt_keys: tuple[str, ...] = ("summarize", "translate")
+    stop_sequences: tuple[str, ...] = ("<|im_end|>",)
 
 
 DEFAULT_LLM_CONFIG = LLMConfig()
 
+# ChatML pieces for multi-turn sessions; "chat" below is one system block plus one user turn.
+# Single-turn "chat" prompts use the tokenizer's own chat template when it has one.
+CHAT_SYSTEM_PROMPT = "You are a concise, smart assistant. Provide clear, helpful answers and nothing else."
+CHAT_SYSTEM_TEMPLATE = f"<|im_start|>system\n{CHAT_SYSTEM_PROMPT}\n<|im_end|>\n"
+CHAT_TURN_TEMPLATE = "<|im_start|>user\n{user}\n<|im_end|>\n<|im_start|>assistant\n"
+CHAT_END_OF_TURN = "<|im_end|>"
+
 # Simple prompt templates that can be swapped/edited later.
 PROMPT_TEMPLATES = {
     "default": "You are a concise, smart assistant. Provide a clear, helpful answer.\n\nInput:\n{input}\n\nAnswer:",
-    "chat": "<|im_start|>system\nYou are a concise, smart assistant. Provide clear, helpful answers and nothing else.\n<|im_end|>\n<|im_start|>user\n{user}\n<|im_end|>\n<|im_start|>assistant\n",
+    "chat": CHAT_SYSTEM_TEMPLATE + CHAT_TURN_TEMPLATE,
     "summarize": "You are a concise assistant. Summarize the following text in 3 bullet points:\n\n{input}\n",
     "translate": "You are a concise assistant. Translate to French:\n\n{input}\n",
 }
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from . import kv_cache
+from .sampling import sample_token
+from .pipeline import IncrementalPrompt
+from .service import LLMService
+from .sessions import ChatSession
+from .types import LLMRequest, LLMResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Slot:
+    """One in-flight request: its sampling params, tokens so far and next token to feed."""
+
+    request: LLMRequest
+    future: Future
+    params: dict[str, Any]
+    seen_ids: list[int]
+    generated: list[int] = field(default_factory=list)
+    done: bool = False
+
+    @property
+    def next_token(self) -> int:
+        return self.generated[-1]
+
+
+class ContinuousBatcher:
+    """Iteration-level scheduler running a manual decode loop over a shared, growing batch.
+
+    Unlike `LLMBatcher`, requests do not wait for each other: between decode steps new requests
+    are prefilled and joined to the running batch, and sequences leave it as soon as they emit
+    EOS or a stop sequence, or reach their own `max_new_tokens`. Each row owns a slot in a left-padded KV cache;
+    an attention mask hides the padding and explicit `position_ids` keep every row's positions
+    contiguous, so results match running the request on its own.
+
+    Call `generate` from as many threads as you want concurrent requests (the API LLM pool
+    should have at least `max_batch_size` workers).
+    """
+
+    def __init__(self, service: LLMService, *, max_batch_size: int = 8) -> None:
+        if service.model is None:
+            raise ValueError("Continuous batching needs the transformers engine (LLMConfig.engine='transformers')")
+        self._service = service
+        self._model = service.model
+        self._tokenizer = service.tokenizer
+        self._max_batch_size = max(1, max_batch_size)
+        self._eos_ids = service.stop_token_ids
+        self._stop_strings = service.stop_strings
+        # Every token decodes to at least one character, so this many tokens cover any stop string
+        self._stop_window = max((len(s) for s in self._stop_strings), default=0)
+        self._queue: queue.Queue[tuple[LLMRequest, Future] | None] = queue.Queue()
+
+        self._slots: list[_Slot] = []
+        self._kv: kv_cache.KVLayers = []
+        self._mask: Any = None  # [batch, seq_len]; 0 marks left padding
+        self._steps = 0
+
+        self._worker = threading.Thread(target=self._run, name="llm-continuous", daemon=True)
+        self._worker.start()
+
+    @property
+    def service(self) -> LLMService:
+        return self._service
+
+    @property
+    def active(self) -> int:
+        return len(self._slots)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"steps": self._steps, "active": len(self._slots), "queued": self._queue.qsize()}
+
+    @property
+    def nbytes(self) -> int:
+        return self._service.nbytes
+
+    def warmup(self) -> None:
+        self._service.warmup()
+
+    def generate(self, request: LLMRequest) -> LLMResponse:
+        """Submit a request to the running batch and wait for its response."""
+        if not request.text:
+            raise ValueError("LLMRequest.text must not be empty")
+        cached = self._service.cached_response(request)
+        if cached is not None:
+            return cached
+        future: Future = Future()
+        self._queue.put((request, future))
+        response = future.result()
+        self._service.cache_response(request, response)
+        return response
+
+    def stream(self, request: LLMRequest) -> Iterator[str]:
+        """Streaming bypasses the scheduler; tokens go straight to the caller."""
+        return self._service.stream(request)
+
+    def incremental(self, request: LLMRequest | None = None) -> IncrementalPrompt:
+        """Pipelined prompts hold their own KV state and bypass the scheduler."""
+        return self._service.incremental(request)
+
+    def chat(self, request: LLMRequest, session: ChatSession) -> LLMResponse:
+        """Session turns reuse their own KV cache and bypass the scheduler."""
+        return self._service.chat(request, session)
+
+    def chat_stream(self, request: LLMRequest, session: ChatSession) -> Iterator[str]:
+        return self._service.chat_stream(request, session)
+
+    def close(self) -> None:
+        """Finish in-flight and queued requests, then stop the scheduler thread."""
+        self._queue.put(None)
+        self._worker.join()
+
+    # -- scheduler loop -------------------------------------------------------------------
+
+    def _run(self) -> None:
+        import torch
+
+        closing = False
+        with torch.inference_mode():
+            while not (closing and not self._slots):
+                # Block only when idle; otherwise admit whatever is waiting and keep decoding
+                while not closing and len(self._slots) < self._max_batch_size:
+                    try:
+                        item = self._queue.get(block=not self._slots)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        closing = True
+                        break
+                    self._admit(*item)
+                if self._slots:
+                    try:
+                        self._step()
+                    except Exception as exc:
+                        self._fail_all(exc)
+
+    def _fail_all(self, exc: Exception) -> None:
+        logger.exception("Continuous batch step failed; failing %d request(s)", len(self._slots))
+        for slot in self._slots:
+            if not slot.future.done():
+                slot.future.set_exception(exc)
+        self._slots, self._kv, self._mask = [], [], None
+
+    def _admit(self, request: LLMRequest, future: Future) -> None:
+        import torch
+
+        try:
+            prompt = self._service._build_prompt(request)
+            params = self._service._generation_kwargs(request)
+            input_ids = self._tokenizer(prompt, return_tensors="pt")["input_ids"].to(self._model.device)
+            # Start from the cached template prefix when possible; only the rest is prefilled here
+            past = self._service._prefix_past(request, input_ids)
+            start = past.get_seq_length() if past is not None else 0
+            out = self._model(input_ids=input_ids[:, start:], past_key_values=past, use_cache=True)
+            slot = _Slot(request, future, params, seen_ids=input_ids[0].tolist())
+            self._append_token(slot, out.logits[0, -1])
+        except Exception as exc:
+            logger.exception("Prefill failed; rejecting request")
+            future.set_exception(exc)
+            return
+
+        new_kv = kv_cache.cache_to_layers(out.past_key_values)
+        new_mask = torch.ones((1, input_ids.shape[1]), dtype=torch.long, device=input_ids.device)
+        if self._slots:
+            width = max(kv_cache.seq_len(self._kv), kv_cache.seq_len(new_kv))
+            batch_kv = kv_cache.left_pad(self._kv, width - kv_cache.seq_len(self._kv))
+            new_kv = kv_cache.left_pad(new_kv, width - kv_cache.seq_len(new_kv))
+            self._kv = kv_cache.concat_rows([batch_kv, new_kv])
+            self._mask = torch.cat([self._pad_mask(self._mask, width), self._pad_mask(new_mask, width)], dim=0)
+        else:
+            self._kv, self._mask = new_kv, new_mask
+        self._slots.append(slot)
+        logger.debug("Admitted request into continuous batch (active=%d)", len(self._slots))
+        self._retire()
+
+    def _step(self) -> None:
+        import torch
+
+        device = self._mask.device
+        input_ids = torch.tensor([[s.next_token] for s in self._slots], dtype=torch.long, device=device)
+        # Each row's next position is the number of real (unpadded) tokens it has so far
+        position_ids = self._mask.sum(dim=-1, keepdim=True)
+        mask = torch.cat([self._mask, torch.ones_like(position_ids)], dim=-1)
+
+        out = self._model(
+            input_ids=input_ids,
+            attention_mask=mask,
+            position_ids=position_ids,
+            past_key_values=kv_cache.layers_to_cache(self._kv),
+            use_cache=True,
+        )
+        self._kv = kv_cache.cache_to_layers(out.past_key_values)
+        self._mask = mask
+        self._steps += 1
+
+        for row, slot in enumerate(self._slots):
+            self._append_token(slot, out.logits[row, -1])
+        self._retire()
+
+    def _append_token(self, slot: _Slot, logits: Any) -> None:
+        params = slot.params
+        token = sample_token(
+            logits,
+            temperature=params["temperature"] if params["do_sample"] else 0.0,
+            top_p=params["top_p"],
+            repetition_penalty=params["repetition_penalty"],
+            seen_ids=slot.seen_ids,
+        )
+        slot.generated.append(token)
+        slot.seen_ids.append(token)
+        slot.done = token in self._eos_ids or len(slot.generated) >= params["max_new_tokens"]
+        if not slot.done and self._stop_strings:
+            tail = self._tokenizer.decode(slot.generated[-self._stop_window:], skip_special_tokens=False)
+            slot.done = any(s in tail for s in self._stop_strings)
+
+    def _retire(self) -> None:
+        if not any(s.done for s in self._slots):
+            return
+        keep = [i for i, s in enumerate(self._slots) if not s.done]
+        for slot in self._slots:
+            if slot.done:
+                ids = [t for t in slot.generated if t not in self._eos_ids]
+                text = self._service._cut_at_stop(self._tokenizer.decode(ids, skip_special_tokens=True)).strip()
+                slot.future.set_result(LLMResponse(text=text))
+
+        if not keep:
+            self._slots, self._kv, self._mask = [], [], None
+            return
+        self._slots = [self._slots[i] for i in keep]
+        self._kv = kv_cache.select_rows(self._kv, keep)
+        self._mask = self._mask[keep]
+        # Drop leading columns that are padding for every remaining row
+        start = int(self._mask.any(dim=0).nonzero()[0])
+        if start:
+            self._kv = kv_cache.slice_seq(self._kv, start)
+            self._mask = self._mask[:, start:]
+
+    @staticmethod
+    def _pad_mask(mask: Any, width: int) -> Any:
+        import torch.nn.functional as F
+
+        return F.pad(mask, (width - mask.shape[-1], 0))
@@ -0,0 +1,121 @@
+"""CPU inference speedups: dynamic int8 Linear layers, bf16 detection, `torch.compile`.
+
+All of these trade a little numerical fidelity for per-token latency, so `parity_check`
+compares an optimized model against outputs captured from the model before optimizing
+(`capture_reference`), without keeping a second copy of the weights around.
+"""
+
+from __future__ import annotations
+
+import warnings
+from dataclasses import dataclass
+from typing import Any
+
+CPU_QUANTIZATION_MODES = ("none", "dynamic_int8")
+
+
+@dataclass(frozen=True)
+class ParityReport:
+    """How closely a candidate model tracks its unoptimized reference.
+
+    Attributes:
+        max_abs_logit_diff: Largest absolute logit difference over the prompt positions.
+        top1_agreement: Fraction of prompt positions where both models predict the same token.
+        greedy_match: Whether greedy continuations of `max_new_tokens` tokens are identical.
+    """
+
+    max_abs_logit_diff: float
+    top1_agreement: float
+    greedy_match: bool
+
+
+@dataclass(frozen=True)
+class ReferenceOutputs:
+    """Outputs of the unoptimized model on the parity prompt.
+
+    Attributes:
+        input_ids: The prompt the outputs were computed on.
+        logits: fp32 logits over the prompt positions.
+        tokens: Greedy continuation of `max_new_tokens` tokens (prompt included).
+        max_new_tokens: Length of the greedy continuation.
+    """
+
+    input_ids: Any
+    logits: Any
+    tokens: Any
+    max_new_tokens: int
+
+
+def bf16_supported() -> bool:
+    """True when this CPU has native bf16 matmul support (AVX512-BF16 / AMX)."""
+    try:
+        import torch
+
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def quantize_dynamic_int8(model: Any) -> Any:
+    """Swap the `nn.Linear` layers of `model` in place for int8 weights with dynamic activation scales.
+
+    Uses torchao when installed, otherwise PyTorch's built-in `quantize_dynamic`. Quantizing in
+    place avoids holding a second full-precision copy at load time. The int8 weights are new
+    process-private tensors, so a model memory-mapped from the load cache loses the page-cache
+    sharing for those layers (embeddings and norms stay mapped).
+    """
+    import torch
+
+    try:
+        from torchao.quantization import Int8DynamicActivationInt8WeightConfig, quantize_  # type: ignore[import-not-found]
+    except ImportError:
+        from torch.ao.quantization import quantize_dynamic
+
+        # Deprecated in favour of torchao, but still the built-in path on a plain torch install
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            warnings.simplefilter("ignore", UserWarning)
+            return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    quantize_(model, Int8DynamicActivationInt8WeightConfig())
+    return model
+
+
+def compile_forward(model: Any, mode: str = "default") -> Any:
+    """Compile `model.forward` in place; the first calls pay the compilation cost."""
+    import torch
+
+    # dynamic=True: prompt and KV lengths change every call, avoid recompiling per shape
+    model.forward = torch.compile(model.forward, mode=mode, dynamic=True)
+    return model
+
+
+def capture_reference(model: Any, input_ids: Any, *, max_new_tokens: int = 16) -> ReferenceOutputs:
+    """Run `model` on one prompt (logits and a greedy continuation) before it gets optimized."""
+    import torch
+
+    with torch.no_grad():
+        logits = model(input_ids=input_ids).logits.float()
+        tokens = model.generate(input_ids=input_ids, **_greedy_kwargs(max_new_tokens))
+    return ReferenceOutputs(input_ids=input_ids, logits=logits, tokens=tokens, max_new_tokens=max_new_tokens)
+
+
+def parity_check(reference: ReferenceOutputs, candidate: Any) -> ParityReport:
+    """Compare `candidate` against outputs captured with `capture_reference` on the same prompt."""
+    import torch
+
+    with torch.no_grad():
+        cand_logits = candidate(input_ids=reference.input_ids).logits.float()
+        cand_tokens = candidate.generate(
+            input_ids=reference.input_ids, **_greedy_kwargs(reference.max_new_tokens)
+        )
+
+    return ParityReport(
+        max_abs_logit_diff=float((reference.logits - cand_logits).abs().max()),
+        top1_agreement=float((reference.logits.argmax(-1) == cand_logits.argmax(-1)).float().mean()),
+        greedy_match=bool(torch.equal(reference.tokens, cand_tokens)),
+    )
+
+
+def _greedy_kwargs(max_new_tokens: int) -> dict[str, Any]:
+    return {"max_new_tokens": max_new_tokens, "do_sample": False, "pad_token_id": 0}
@@ -0,0 +1,65 @@
+"""Helpers for moving `past_key_values` between transformers cache objects and plain tensors.
+
+Schedulers in this package keep KV state as a list of per-layer `(key, value)` tensors shaped
+`[batch, kv_heads, seq_len, head_dim]`, which is stable across transformers versions, and only
+wrap it in a `DynamicCache` right before calling the model.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+
+KVLayers = list[tuple[Any, Any]]
+
+
+def cache_to_layers(cache: Any) -> KVLayers:
+    """Extract per-layer `(key, value)` tensors from a model's `past_key_values`."""
+    if cache is None:
+        return []
+    if isinstance(cache, (tuple, list)):  # legacy tuple-of-tuples format
+        return [(k, v) for k, v in cache]
+    if hasattr(cache, "layers"):  # transformers >= 4.56
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+def layers_to_cache(layers: Sequence[tuple[Any, Any]]) -> Any:
+    """Wrap per-layer `(key, value)` tensors in a fresh `DynamicCache` the model can extend."""
+    from transformers import DynamicCache
+
+    cache = DynamicCache()
+    for idx, (k, v) in enumerate(layers):
+        cache.update(k, v, idx)
+    return cache
+
+
+def seq_len(layers: KVLayers) -> int:
+    return int(layers[0][0].shape[-2]) if layers else 0
+
+
+def left_pad(layers: KVLayers, n: int) -> KVLayers:
+    """Prepend `n` zero positions along the sequence axis (to be masked out by the caller)."""
+    if n <= 0:
+        return list(layers)
+    import torch.nn.functional as F
+
+    return [(F.pad(k, (0, 0, n, 0)), F.pad(v, (0, 0, n, 0))) for k, v in layers]
+
+
+def slice_seq(layers: KVLayers, start: int = 0, end: int | None = None) -> KVLayers:
+    return [(k[..., start:end, :], v[..., start:end, :]) for k, v in layers]
+
+
+def select_rows(layers: KVLayers, rows: Any) -> KVLayers:
+    return [(k[rows], v[rows]) for k, v in layers]
+
+
+def concat_rows(parts: Sequence[KVLayers]) -> KVLayers:
+    """Stack several caches of equal sequence length along the batch axis."""
+    import torch
+
+    return [
+        (torch.cat([p[i][0] for p in parts], dim=0), torch.cat([p[i][1] for p in parts], dim=0))
+        for i in range(len(parts[0]))
+    ]
@@ -0,0 +1,155 @@
+"""On-disk cache of resolved model weights for fast, copy-free cold starts.
+
+The first load goes through `from_pretrained`, dtype conversion and device placement as usual,
+then writes the resulting state dict to one safetensors file. Later loads build the model
+skeleton with parameters on the meta device and assign tensors that are views straight into a
+memory-mapped copy of that file, so no weight bytes are read or copied up front. The mapping
+is private copy-on-write: every process on the host shares the same page-cache pages until
+(never, for inference) a weight is written.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+logger = logging.getLogger(__name__)
+
+WEIGHTS_FILE = "model.safetensors"
+
+# `params_on_meta` patches `torch.nn.Module.register_parameter` for the whole process; model
+# loads hold this lock so two overlapping loads never save and restore each other's patch
+BUILD_LOCK = threading.RLock()
+
+_DTYPES = {
+    "F64": "float64",
+    "F32": "float32",
+    "F16": "float16",
+    "BF16": "bfloat16",
+    "I64": "int64",
+    "I32": "int32",
+    "I16": "int16",
+    "I8": "int8",
+    "U8": "uint8",
+    "BOOL": "bool",
+}
+
+
+def cache_dir_for(root: Path, model_dir: Path, *, dtype: str, device: str) -> Path:
+    """Cache directory for one (model snapshot, dtype, device, library versions) combination.
+
+    The key includes the size and mtime of every file in `model_dir`, so replacing a snapshot's
+    weights invalidates its cache entry.
+    """
+    import torch
+    import transformers
+
+    files = sorted(
+        (str(p.relative_to(model_dir)), p.stat().st_size, int(p.stat().st_mtime))
+        for p in Path(model_dir).rglob("*")
+        if p.is_file()
+    )
+    blob = json.dumps(
+        {
+            "model_dir": str(Path(model_dir).resolve()),
+            "files": files,
+            "dtype": dtype,
+            "device": device,
+            "torch": torch.__version__,
+            "transformers": transformers.__version__,
+        },
+        sort_keys=True,
+    )
+    return Path(root) / hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def save_weights(model: Any, cache_dir: Path) -> Path:
+    """Write `model`'s parameters and persistent buffers to `cache_dir` (atomically)."""
+    from safetensors.torch import save_file
+
+    tensors: dict[str, Any] = {}
+    seen: set[int] = set()
+    for name, tensor in model.state_dict().items():
+        # Tied weights share storage; keep the first name, tie_weights() restores the rest on load
+        if tensor.numel() and tensor.data_ptr() in seen:
+            continue
+        seen.add(tensor.data_ptr())
+        tensors[name] = tensor.detach().to("cpu").contiguous()
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    target = cache_dir / WEIGHTS_FILE
+    tmp = target.with_suffix(f".tmp{os.getpid()}")
+    save_file(tensors, str(tmp))
+    os.replace(tmp, target)
+    return target
+
+
+def mmap_weights(path: Path) -> dict[str, Any]:
+    """Tensors from a safetensors file as zero-copy views into a private memory map."""
+    import torch
+
+    with open(path, "rb") as fh:
+        (header_len,) = struct.unpack("<Q", fh.read(8))
+        header = json.loads(fh.read(header_len))
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    start = 8 + header_len
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = getattr(torch, _DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        if count:
+            flat = torch.frombuffer(mapped, dtype=dtype, count=count, offset=start + begin)
+        else:
+            flat = torch.empty(0, dtype=dtype)
+        tensors[name] = flat.view(info["shape"])
+    return tensors
+
+
+@contextmanager
+def params_on_meta() -> Iterator[None]:
+    """Build modules with parameters on the meta device (buffers stay real, e.g. RoPE tables).
+
+    Only modules built on the calling thread are affected; other threads keep real parameters.
+    """
+    import torch
+
+    with BUILD_LOCK:
+        register = torch.nn.Module.register_parameter
+        owner = threading.get_ident()
+
+        def register_on_meta(module: Any, name: str, param: Any) -> None:
+            register(module, name, param)
+            if param is not None and threading.get_ident() == owner:
+                module._parameters[name] = type(param)(param.to("meta"), requires_grad=param.requires_grad)
+
+        torch.nn.Module.register_parameter = register_on_meta
+        try:
+            yield
+        finally:
+            torch.nn.Module.register_parameter = register
+
+
+def load_from_cache(model_cls: Any, config: Any, cache_dir: Path, **from_config_kwargs: Any) -> Any:
+    """Instantiate `model_cls` from `config` with weights memory-mapped from `cache_dir`."""
+    with params_on_meta():
+        model = model_cls.from_config(config, **from_config_kwargs)
+    state = mmap_weights(cache_dir / WEIGHTS_FILE)
+    model.load_state_dict(state, strict=False, assign=True)
+    model.tie_weights()
+    missing = [name for name, p in model.named_parameters() if p.is_meta]
+    if missing:
+        raise RuntimeError(f"Load cache {cache_dir} is missing weights: {missing[:5]}")
+    return model.eval()
+
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import logging
+import time
 from pathlib import Path
 from typing import Any, Tuple
 
+from . import cpu_optim, load_cache
+
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +17,18 @@ class QwenModelLoader:
     This loader expects the model to be available in a directory that is compatible
     with `transformers.AutoTokenizer.from_pretrained` and
     `transformers.AutoModelForCausalLM.from_pretrained`.
+
+    With `load_cache_dir` set, the resolved (dtype-converted) weights are written there as
+    safetensors on first load and memory-mapped without copying on later loads (see
+    `llm.load_cache`). Quantized loads bypass the cache. Per-phase durations of the last load
+    are kept in `timings`.
+
+    On CPU, `cpu_quantization="dynamic_int8"` swaps every `nn.Linear` for an int8 version,
+    `cpu_dtype="bfloat16"` is honoured only where the CPU has native bf16 support, and
+    `compile=True` wraps the forward pass in `torch.compile`. With `parity_check` the optimized
+    model is compared against outputs captured before optimizing and the result is kept in
+    `parity`. Quantization happens in place; on a memory-mapped cached load the int8 layers
+    become private memory, so only the remaining weights stay shared through the page cache.
     """
 
     def __init__(
@@ -25,13 +40,37 @@ class QwenModelLoader:
         load_in_4bit: bool = False,
         cpu_dtype: str = "float32",
         cuda_dtype: str = "float16",
+        load_cache_dir: Path | None = None,
+        cpu_quantization: str = "none",
+        compile: bool = False,
+        compile_mode: str = "default",
+        parity_check: bool = False,
     ) -> None:
+        if cpu_quantization not in cpu_optim.CPU_QUANTIZATION_MODES:
+            raise ValueError(
+                f"cpu_quantization must be one of {cpu_optim.CPU_QUANTIZATION_MODES}, got {cpu_quantization!r}"
+            )
         self._model_dir = Path(model_dir)
         self._device = device
         self._load_in_8bit = load_in_8bit
         self._load_in_4bit = load_in_4bit
         self._cpu_dtype = cpu_dtype
         self._cuda_dtype = cuda_dtype
+        self._load_cache_dir = Path(load_cache_dir) if load_cache_dir is not None else None
+        self._cpu_quantization = cpu_quantization
+        self._compile = compile
+        self._compile_mode = compile_mode
+        self._parity_check = parity_check
+        self.timings: dict[str, float] = {}
+        self.parity: cpu_optim.ParityReport | None = None
+
+    def load_tokenizer(self) -> Any:
+        """Load only the tokenizer (for engines that bring their own model runtime)."""
+        if not self._model_dir.exists():
+            raise FileNotFoundError(f"Model directory does not exist: {self._model_dir}")
+        from transformers import AutoTokenizer  # type: ignore[attr-defined]
+
+        return AutoTokenizer.from_pretrained(self._model_dir, trust_remote_code=True)
 
     def load(self) -> Tuple[Any, Any]:
         """Load the tokenizer and model.
@@ -43,11 +82,16 @@ class QwenModelLoader:
             RuntimeError: If the `transformers` library is not installed.
             FileNotFoundError: If the model directory does not exist.
         """
+        # Serialized with other loads: the load cache patches torch.nn.Module process-wide
+        with load_cache.BUILD_LOCK:
+            return self._load()
+
+    def _load(self) -> Tuple[Any, Any]:
         if not self._model_dir.exists():
             raise FileNotFoundError(f"Model directory does not exist: {self._model_dir}")
 
         try:
-            from transformers import AutoModelForCausalLM, AutoTokenizer  # type: ignore[attr-defined]
+            from transformers import AutoModelForCausalLM  # type: ignore[attr-defined]
         except ImportError as exc:  # pragma: no cover - exercised only in real runtime
             raise RuntimeError(
                 "The 'transformers' package is required to load the Qwen model. "
@@ -71,6 +115,9 @@ class QwenModelLoader:
                 torch_dtype = getattr(torch, self._cuda_dtype, torch.float16)
             else:
                 torch_dtype = getattr(torch, self._cpu_dtype, torch.float32)
+                if torch_dtype == torch.bfloat16 and not cpu_optim.bf16_supported():
+                    logger.warning("CPU has no native bf16 support; using float32 instead.")
+                    torch_dtype = torch.float32
         except ImportError:
             torch = None  # type: ignore
 
@@ -101,16 +148,103 @@ class QwenModelLoader:
             model_kwargs["torch_dtype"] = torch_dtype
 
         logger.info("Loading Qwen model from %s", self._model_dir)
-        tokenizer = AutoTokenizer.from_pretrained(self._model_dir, trust_remote_code=True)
+        self.timings = {}
+        started = time.perf_counter()
+        tokenizer = self.load_tokenizer()
+        self._mark("tokenizer_s", started)
+
+        cache_dir = None
+        if self._load_cache_dir is not None and not (use_4bit or use_8bit):
+            cache_dir = load_cache.cache_dir_for(
+                self._load_cache_dir, self._model_dir, dtype=str(torch_dtype), device=resolved_device
+            )
+            if (cache_dir / load_cache.WEIGHTS_FILE).exists():
+                model = self._load_cached(cache_dir, resolved_device, started)
+                return tokenizer, self._optimize_cpu(model, tokenizer, resolved_device, started)
+
+        phase = time.perf_counter()
         model = AutoModelForCausalLM.from_pretrained(self._model_dir, **model_kwargs)
+        self._mark("from_pretrained_s", phase)
 
         if not (use_4bit or use_8bit) and hasattr(model, "to") and resolved_device:
             logger.info("Moving model to device: %s", resolved_device)
+            phase = time.perf_counter()
             model = model.to(resolved_device)
+            self._mark("to_device_s", phase)
 
+        if cache_dir is not None:
+            phase = time.perf_counter()
+            load_cache.save_weights(model, cache_dir)
+            self._mark("cache_write_s", phase)
+            logger.info("Wrote load cache %s", cache_dir)
+
+        self._mark("total_s", started)
         logger.info(
-            "Qwen model loaded successfully on %s%s",
+            "Qwen model loaded successfully on %s%s (%s)",
             resolved_device,
             " with quantization" if (use_4bit or use_8bit) else "",
+            self._format_timings(),
+        )
+        return tokenizer, self._optimize_cpu(model, tokenizer, resolved_device, started)
+
+    def _load_cached(self, cache_dir: Path, device: str, started: float) -> Any:
+        from transformers import AutoConfig, AutoModelForCausalLM  # type: ignore[attr-defined]
+
+        phase = time.perf_counter()
+        config = AutoConfig.from_pretrained(self._model_dir, trust_remote_code=True)
+        self._mark("config_s", phase)
+
+        phase = time.perf_counter()
+        model = load_cache.load_from_cache(AutoModelForCausalLM, config, cache_dir, trust_remote_code=True)
+        self._mark("mmap_s", phase)
+
+        if device and device != "cpu":
+            phase = time.perf_counter()
+            model = model.to(device)
+            self._mark("to_device_s", phase)
+
+        self._mark("total_s", started)
+        logger.info("Qwen model memory-mapped from load cache %s on %s (%s)", cache_dir, device, self._format_timings())
+        return model
+
+    def _optimize_cpu(self, model: Any, tokenizer: Any, device: str, started: float) -> Any:
+        if device != "cpu" or not (self._cpu_quantization != "none" or self._compile):
+            return model
+
+        reference = None
+        if self._parity_check:
+            # Capture the reference outputs now rather than deep-copying the model: a copy would
+            # materialise memory-mapped weights and double peak RSS during load
+            phase = time.perf_counter()
+            prompt = tokenizer("The quick brown fox jumps over the lazy dog.", return_tensors="pt")
+            reference = cpu_optim.capture_reference(model, prompt["input_ids"])
+            self._mark("parity_ref_s", phase)
+
+        if self._cpu_quantization == "dynamic_int8":
+            phase = time.perf_counter()
+            model = cpu_optim.quantize_dynamic_int8(model)
+            self._mark("quantize_s", phase)
+        if self._compile:
+            model = cpu_optim.compile_forward(model, self._compile_mode)
+
+        if reference is not None:
+            phase = time.perf_counter()
+            self.parity = cpu_optim.parity_check(reference, model)
+            self._mark("parity_s", phase)
+            log = logger.info if self.parity.greedy_match else logger.warning
+            log("CPU optimization parity vs unoptimized model: %s", self.parity)
+
+        self._mark("total_s", started)
+        logger.info(
+            "Applied CPU optimizations (quantization=%s, compile=%s) (%s)",
+            self._cpu_quantization,
+            self._compile,
+            self._format_timings(),
         )
-        return tokenizer, model
+        return model
+
+    def _mark(self, name: str, since: float) -> None:
+        self.timings[name] = round(time.perf_counter() - since, 4)
+
+    def _format_timings(self) -> str:
+        return ", ".join(f"{k}={v:.3f}" for k, v in self.timings.items())
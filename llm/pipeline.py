@@ -0,0 +1,208 @@
+"""Overlap transcription with LLM prefill.
+
+ASR yields a transcript segment by segment; waiting for the last one before the LLM sees any
+text serializes the two slowest stages. `prefill_pipelined` consumes segments as they arrive and
+keeps an `IncrementalPrompt` prefilled with the prompt so far, so once transcription ends only
+the final segment, the template suffix and the reply itself are left to compute.
+"""
+
+from __future__ import annotations
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+
+from . import kv_cache
+from .types import LLMRequest, LLMResponse
+
+if TYPE_CHECKING:
+    from .service import LLMService
+
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalPrompt:
+    """KV state for a prompt whose user text arrives in pieces (e.g. ASR segments).
+
+    `extend` prefills the template prefix plus the text received so far; `finish` completes
+    the prompt and generates the reply. Every call re-tokenizes the whole prompt and keeps only
+    the longest token prefix shared with what is already cached, so a boundary that tokenizes
+    differently once more text arrives is cropped and prefilled again. The last token of a
+    partial prompt is held back for the same reason.
+
+    Args:
+        service: The service whose model, tokenizer, templates and caches are used.
+        request: Generation overrides and `prompt_key`; its `text` is ignored.
+    """
+
+    def __init__(self, service: LLMService, request: LLMRequest | None = None) -> None:
+        self._service = service
+        self._request = request or LLMRequest(text="")
+        self._token_ids: list[int] = []
+        self._kv: kv_cache.KVLayers = []
+        self.prefilled_tokens = 0
+
+    @property
+    def cached_tokens(self) -> int:
+        return len(self._token_ids)
+
+    def extend(self, text: str) -> None:
+        """Prefill the prompt for the user text received so far."""
+        text = text.strip()
+        # Engines other than transformers expose no KV cache to prefill into
+        if not text or self._service.model is None:
+            return
+        ids = self._service._token_ids(self._service._prompt_prefix(self._request) + text)
+        self._advance(ids[:-1])
+
+    def finish(self, text: str) -> LLMResponse:
+        """Complete the prompt with the full user text and generate the reply."""
+        import torch
+
+        service = self._service
+        request = replace(self._request, text=text.strip())
+        if service.model is None:
+            return service.generate(request)
+        cached = service.cached_response(request)
+        if cached is not None:
+            return cached
+
+        ids = service._token_ids(service._build_prompt(request))
+        # generate() needs at least one uncached position to produce the first logits
+        self._advance(ids[:-1])
+
+        device = getattr(service.model, "device", None)
+        input_ids = torch.tensor([ids], dtype=torch.long, device=device)
+        past = kv_cache.layers_to_cache(self._kv) if self._kv else None
+        outputs = service.model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=past,
+            **service._generation_kwargs(request),
+            **service._stop_kwargs(len(ids)),
+        )
+        text = service.tokenizer.decode(outputs[0][len(ids):], skip_special_tokens=True)
+        response = LLMResponse(text=service._cut_at_stop(text).strip())
+        logger.debug(
+            "Pipelined generation: %d prompt tokens, %d prefilled ahead", len(ids), self.prefilled_tokens
+        )
+        service.cache_response(request, response)
+        return response
+
+    def _advance(self, ids: list[int]) -> None:
+        import torch
+
+        if not self._kv:
+            self._seed_from_prefix_cache(ids)
+
+        common = 0
+        for cached, new in zip(self._token_ids, ids):
+            if cached != new:
+                break
+            common += 1
+        if common < len(self._token_ids):
+            self._kv = kv_cache.slice_seq(self._kv, 0, common) if common else []
+            self._token_ids = self._token_ids[:common]
+
+        new_ids = ids[common:]
+        if not new_ids:
+            return
+        device = getattr(self._service.model, "device", None)
+        past = kv_cache.layers_to_cache(self._kv) if self._kv else None
+        with torch.no_grad():
+            out = self._service.model(
+                input_ids=torch.tensor([new_ids], dtype=torch.long, device=device),
+                past_key_values=past,
+                use_cache=True,
+            )
+        self._kv = kv_cache.cache_to_layers(out.past_key_values)
+        self._token_ids = list(ids)
+        self.prefilled_tokens += len(new_ids)
+
+    def _seed_from_prefix_cache(self, ids: list[int]) -> None:
+        prefix_cache = self._service.prefix_cache
+        if prefix_cache is None:
+            return
+        entry = prefix_cache.get(self._service._prompt_prefix(self._request))
+        n = len(entry.token_ids)
+        if n and len(ids) > n and tuple(ids[:n]) == entry.token_ids:
+            self._token_ids, self._kv = list(entry.token_ids), entry.layers
+
+
+def prefill_pipelined(
+    segments: Iterable[Any],
+    llm: Any,
+    request: LLMRequest | None = None,
+    *,
+    submit: Callable[[Callable[[], None]], Future] | None = None,
+) -> tuple[list[Any], IncrementalPrompt]:
+    """Consume a transcript as it is produced, prefilling the LLM prompt in the background.
+
+    `segments` is iterated on the calling thread, so run this where ASR work belongs (e.g. the
+    ASR executor). Each prefill is handed to `submit` (e.g. the LLM executor's `submit`; by
+    default a private single-thread pool) and takes an LLM worker only for as long as the
+    prefill itself. At most one prefill is in flight; segments that arrive meanwhile are
+    covered by the next one. A prefill that cannot be submitted or fails is skipped, since
+    `finish` prefills whatever is missing anyway. Segment text is read from `text`.
+
+    Returns:
+        The collected segments, and the prompt to `finish` with the joined transcript once no
+        prefill is running any more.
+    """
+    own_pool = None
+    if submit is None:
+        own_pool = ThreadPoolExecutor(1, thread_name_prefix="llm-prefill")
+        submit = own_pool.submit
+
+    prompt = llm.incremental(request)
+    collected: list[Any] = []
+    pending: Future | None = None
+    try:
+        for segment in segments:
+            collected.append(segment)
+            if pending is not None and not pending.done():
+                continue
+            text = _transcript(collected)
+            try:
+                pending = submit(lambda text=text: prompt.extend(text))
+            except Exception:
+                logger.debug("Skipping pipelined prefill; LLM executor unavailable", exc_info=True)
+                pending = None
+    finally:
+        if pending is not None:
+            # The prompt is not safe to finish while a prefill is still writing its KV state
+            try:
+                pending.result()
+            except Exception:
+                logger.warning("Pipelined prefill failed; the reply will prefill in full", exc_info=True)
+        if own_pool is not None:
+            own_pool.shutdown(wait=False)
+    return collected, prompt
+
+
+def run_pipelined(
+    segments: Iterable[Any],
+    llm: Any,
+    request: LLMRequest | None = None,
+    *,
+    submit: Callable[[Callable[[], None]], Future] | None = None,
+) -> tuple[list[Any], LLMResponse | None]:
+    """Generate a reply to a transcript while it is still being produced.
+
+    `prefill_pipelined` followed by `finish` on the calling thread. Servers that keep ASR and
+    LLM work on separate executors should call the two halves on the matching executor instead.
+
+    Returns:
+        The collected segments, and the reply or None when the transcript is empty.
+    """
+    collected, prompt = prefill_pipelined(segments, llm, request, submit=submit)
+    transcript = _transcript(collected)
+    if not transcript:
+        return collected, None
+    return collected, prompt.finish(transcript)
+
+
+def _transcript(segments: list[Any]) -> str:
+    return " ".join(t for t in (s.text.strip() for s in segments) if t)
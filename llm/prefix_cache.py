@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from . import kv_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PrefixEntry:
+    """Precomputed KV state for one static prompt prefix."""
+
+    token_ids: tuple[int, ...]
+    layers: kv_cache.KVLayers
+    nbytes: int
+
+
+class PrefixCache:
+    """LRU cache of `past_key_values` for static prompt prefixes (template preambles).
+
+    Entries are keyed on the prefix text and bounded by total tensor size. Stored tensors are
+    never modified: `DynamicCache.update` concatenates into new tensors, so every lookup can
+    hand out a fresh cache built on the same underlying prefix state.
+    """
+
+    def __init__(self, model: Any, tokenizer: Any, *, max_bytes: int) -> None:
+        self._model = model
+        self._tokenizer = tokenizer
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[str, PrefixEntry] = OrderedDict()
+        self._token_ids: dict[str, tuple[int, ...]] = {}  # tokenized prefixes; tiny, never evicted
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, prefix: str) -> PrefixEntry:
+        """Return the KV state for `prefix`, running (and caching) its prefill on a miss."""
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is not None:
+                self._entries.move_to_end(prefix)
+                self.hits += 1
+                return entry
+
+        entry = self._prefill(prefix)
+        with self._lock:
+            self.misses += 1
+            if prefix not in self._entries and entry.nbytes <= self._max_bytes:
+                self._entries[prefix] = entry
+                self._bytes += entry.nbytes
+                while self._bytes > self._max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+                    logger.debug("Evicted prompt prefix from KV cache (%d bytes)", evicted.nbytes)
+        return entry
+
+    def match(self, prefix: str, input_ids: Any) -> Any | None:
+        """Return a `past_key_values` covering the leading `prefix` tokens of `input_ids`.
+
+        Returns None when the prompt's tokenization does not start with the prefix's own
+        tokenization (a merge across the boundary) or when nothing would be left to prefill.
+        """
+        prefix_ids = self._token_ids.get(prefix)
+        if prefix_ids is None:
+            prefix_ids = tuple(int(t) for t in self._tokenizer(prefix, return_tensors="pt")["input_ids"][0])
+            self._token_ids[prefix] = prefix_ids
+        n = len(prefix_ids)
+        row = input_ids[0]
+        if n == 0 or len(row) <= n or tuple(int(t) for t in row[:n]) != prefix_ids:
+            return None
+        return kv_cache.layers_to_cache(self.get(prefix).layers)
+
+    def _prefill(self, prefix: str) -> PrefixEntry:
+        import torch
+
+        ids = self._tokenizer(prefix, return_tensors="pt")["input_ids"]
+        device = getattr(self._model, "device", None)
+        if device:
+            ids = ids.to(device)
+        with torch.no_grad():
+            out = self._model(input_ids=ids, use_cache=True)
+        layers = kv_cache.cache_to_layers(out.past_key_values)
+        nbytes = sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in layers)
+        logger.debug("Prefilled prompt prefix: %d tokens, %d bytes", ids.shape[-1], nbytes)
+        return PrefixEntry(tuple(int(t) for t in ids[0]), layers, nbytes)
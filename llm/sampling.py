@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+
+def sample_token(
+    logits: Any,
+    *,
+    temperature: float,
+    top_p: float = 1.0,
+    repetition_penalty: float = 1.0,
+    seen_ids: Iterable[int] = (),
+) -> int:
+    """Pick the next token from a 1-D logits vector.
+
+    Mirrors the subset of `model.generate` behaviour LLMService uses: repetition penalty over
+    `seen_ids`, then greedy decoding when `temperature <= 0`, otherwise temperature scaling
+    followed by nucleus (top-p) sampling.
+    """
+    import torch
+
+    logits = logits.float()
+    if repetition_penalty != 1.0:
+        ids = torch.tensor(sorted(set(seen_ids)), dtype=torch.long, device=logits.device)
+        if ids.numel():
+            picked = logits[ids]
+            logits = logits.clone()
+            logits[ids] = torch.where(picked > 0, picked / repetition_penalty, picked * repetition_penalty)
+
+    if temperature <= 0:
+        return int(torch.argmax(logits))
+
+    probs = torch.softmax(logits / temperature, dim=-1)
+    if top_p < 1.0:
+        sorted_probs, sorted_idx = torch.sort(probs, descending=True)
+        cumulative = torch.cumsum(sorted_probs, dim=-1)
+        # Keep the smallest prefix whose mass reaches top_p (always at least one token)
+        drop = cumulative - sorted_probs > top_p
+        sorted_probs[drop] = 0.0
+        probs = torch.zeros_like(probs).scatter(0, sorted_idx, sorted_probs)
+    return int(torch.multinomial(probs / probs.sum(), 1))
+
+
+def eos_token_ids(model: Any, tokenizer: Any) -> set[int]:
+    """All token ids that end a reply for this model/tokenizer pair."""
+    ids: set[int] = set()
+    candidates = [getattr(tokenizer, "eos_token_id", None)]
+    gen_config = getattr(model, "generation_config", None)
+    if gen_config is not None:
+        candidates.append(getattr(gen_config, "eos_token_id", None))
+    for cand in candidates:
+        if isinstance(cand, int):
+            ids.add(cand)
+        elif cand:
+            ids.update(int(c) for c in cand)
+    return ids
@@ -1,21 +1,54 @@
 from __future__ import annotations
 
+import dataclasses
 import logging
-from typing import Any
+import threading
+from typing import Any, Iterator
 
-from .config import LLMConfig, DEFAULT_LLM_CONFIG, PROMPT_TEMPLATES, DEFAULT_PROMPT_KEY
+from . import kv_cache
+from .base import LLMBackend
+from .config import (
+    CHAT_END_OF_TURN,
+    CHAT_SYSTEM_PROMPT,
+    CHAT_SYSTEM_TEMPLATE,
+    CHAT_TURN_TEMPLATE,
+    DEFAULT_LLM_CONFIG,
+    DEFAULT_PROMPT_KEY,
+    PROMPT_TEMPLATES,
+    LLMConfig,
+)
+from .ctranslate2_backend import CTranslate2Backend
 from .model_loader import QwenModelLoader
+from .pipeline import IncrementalPrompt
+from .prefix_cache import PrefixCache
+from .response_cache import ResponseCache, response_key
+from .sampling import eos_token_ids, sample_token
+from .sessions import ChatSession
+from .speculative import SPECULATIVE_MODES, DraftModel, PromptLookup, Proposer, SpeculativeStats, speculative_generate
 from .types import LLMRequest, LLMResponse
 
 
 logger = logging.getLogger(__name__)
 
+ENGINES = ("transformers", "ctranslate2")
+
+# LLMConfig fields that never change a greedy reply; every other field is part of the response key
+_RESPONSE_KEY_IGNORED = frozenset({
+    "temperature", "top_p", "max_batch_size", "batch_wait_ms", "batching", "prefix_cache_mb",
+    "session_max_tokens", "response_cache_entries", "response_cache_path", "response_cache_disk_mb",
+    "load_cache_dir", "parity_check", "engine_threads",
+})
+
 
 class LLMService:
     """High-level service to generate responses from a local Qwen model.
 
     This service is intentionally minimal: it accepts plain text input (e.g. ASR output)
     and returns a plain text response suitable for feeding back into a UI layer.
+
+    `LLMConfig.engine` picks what runs the model: the transformers model loaded by
+    `QwenModelLoader` (default), or an `LLMBackend` such as `CTranslate2Backend`, which
+    serves `generate`, `generate_batch`, `stream` and `chat` but not the KV-cache features.
     """
 
     def __init__(
@@ -24,10 +57,28 @@ class LLMService:
         *,
         model: Any | None = None,
         tokenizer: Any | None = None,
+        backend: LLMBackend | None = None,
+        draft_model: Any | None = None,
     ) -> None:
         self._config = config or DEFAULT_LLM_CONFIG
+        if self._config.engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}, got {self._config.engine!r}")
+        if self._config.speculative not in SPECULATIVE_MODES:
+            raise ValueError(f"speculative must be one of {SPECULATIVE_MODES}, got {self._config.speculative!r}")
 
-        if model is None or tokenizer is None:
+        if model is None and (backend is not None or self._config.engine != "transformers"):
+            if tokenizer is None:
+                tokenizer = QwenModelLoader(self._config.model_dir).load_tokenizer()
+            if backend is None:
+                backend = CTranslate2Backend(
+                    self._config.model_dir,
+                    tokenizer,
+                    engine_dir=self._config.engine_dir,
+                    device=self._config.device,
+                    compute_type=self._config.engine_compute_type,
+                    cpu_threads=self._config.engine_threads,
+                )
+        elif model is None or tokenizer is None:
             loader = QwenModelLoader(
                 self._config.model_dir,
                 device=self._config.device,
@@ -35,40 +86,267 @@ class LLMService:
                 load_in_4bit=self._config.load_in_4bit,
                 cpu_dtype=self._config.cpu_dtype,
                 cuda_dtype=self._config.cuda_dtype,
+                load_cache_dir=self._config.load_cache_dir,
+                cpu_quantization=self._config.cpu_quantization,
+                compile=self._config.compile,
+                compile_mode=self._config.compile_mode,
+                parity_check=self._config.parity_check,
             )
             tokenizer, model = loader.load()
 
+        if self._config.speculative == "draft" and draft_model is None and backend is None:
+            if self._config.draft_model_dir is None:
+                raise ValueError("speculative='draft' needs LLMConfig.draft_model_dir")
+            _, draft_model = QwenModelLoader(
+                self._config.draft_model_dir,
+                device=self._config.device,
+                cpu_dtype=self._config.cpu_dtype,
+                cuda_dtype=self._config.cuda_dtype,
+            ).load()
+
         self._model = model
         self._tokenizer = tokenizer
+        if tokenizer is not None:
+            # Batches are left-padded so every row ends at the generation boundary. transformers
+            # 4.37 has no per-call padding_side, so the tokenizer is configured once here and
+            # callers sharing it with this service get left padding too.
+            tokenizer.padding_side = "left"
+            if getattr(tokenizer, "pad_token", None) is None and getattr(tokenizer, "eos_token", None) is not None:
+                tokenizer.pad_token = tokenizer.eos_token
+        self._backend = backend
+        self._draft_model = draft_model
+        self._speculative_stats = SpeculativeStats()
+        self._stop_ids, self._stop_strings = self._resolve_stops()
+        self._prefix_cache = (
+            PrefixCache(model, tokenizer, max_bytes=int(self._config.prefix_cache_mb * 1024 * 1024))
+            if self._config.prefix_cache_mb > 0 and backend is None
+            else None
+        )
+        self._response_cache = (
+            ResponseCache(
+                self._config.response_cache_entries,
+                path=self._config.response_cache_path,
+                max_disk_bytes=int(self._config.response_cache_disk_mb * 1024 * 1024),
+            )
+            if self._config.response_cache_entries > 0
+            else None
+        )
 
         logger.info(
-            "LLMService initialized with model_dir=%s, device=%s",
+            "LLMService initialized with model_dir=%s, device=%s, engine=%s",
             self._config.model_dir,
             self._config.device,
+            type(backend).__name__ if backend is not None else "transformers",
         )
 
-    def generate(self, request: LLMRequest) -> LLMResponse:
-        """Generate a response for the given request.
+    @property
+    def model(self) -> Any:
+        return self._model
 
-        Args:
-            request: Request object containing the input text and optional parameters.
+    @property
+    def tokenizer(self) -> Any:
+        return self._tokenizer
 
-        Returns:
-            LLMResponse with the generated text.
-        """
-        base_text = request.text
-        if not base_text:
-            raise ValueError("LLMRequest.text must not be empty")
+    @property
+    def backend(self) -> LLMBackend | None:
+        """The non-transformers engine, if one is in use (`model` is None then)."""
+        return self._backend
+
+    @property
+    def config(self) -> LLMConfig:
+        return self._config
+
+    @property
+    def stop_token_ids(self) -> frozenset[int]:
+        """Token ids that end a reply: the model's EOS ids plus single-token stop sequences."""
+        return self._stop_ids
+
+    @property
+    def stop_strings(self) -> tuple[str, ...]:
+        """Stop sequences longer than one token, checked against the decoded tail while generating."""
+        return self._stop_strings
+
+    @property
+    def speculative_stats(self) -> dict[str, float]:
+        """Totals for speculative generations, including the acceptance rate of guesses."""
+        return self._speculative_stats.as_dict()
+
+    @property
+    def prefix_cache(self) -> PrefixCache | None:
+        return self._prefix_cache
+
+    @property
+    def response_cache(self) -> ResponseCache | None:
+        return self._response_cache
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by model weights and buffers."""
+        if self._backend is not None:
+            return self._backend.nbytes
+        return self._module_bytes(self._model) + (self._module_bytes(self._draft_model) if self._draft_model is not None else 0)
+
+    @staticmethod
+    def _module_bytes(module: Any) -> int:
+        tensors = list(getattr(module, "parameters", list)()) + list(getattr(module, "buffers", list)())
+        state = getattr(module, "state_dict", dict)()
+        # Dynamically quantized Linear layers keep their int8 weights in packed (tensor, bias) tuples
+        tensors += [t for v in state.values() if isinstance(v, tuple) for t in v if hasattr(t, "element_size")]
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    def warmup(self) -> None:
+        """Run one tiny greedy generation and prefill the default template prefix."""
+        import torch
+
+        request = LLMRequest(text="Hello", max_new_tokens=1, temperature=0.0)
+        if self._backend is not None:
+            self._generate(request)
+            return
+        with torch.no_grad():
+            self._model.generate(**self._encode(self._build_prompt(request)), **self._generation_kwargs(request))
+        if self._prefix_cache is not None:
+            self._prefix_cache.get(self._prompt_prefix(request))
+
+    def _response_key(self, request: LLMRequest) -> str | None:
+        """Cache key for greedy requests; None when the response is sampled or caching is off."""
+        if self._response_cache is None or not request.text:
+            return None
+        params = self._generation_kwargs(request)
+        if params["do_sample"]:
+            return None
+        engine = self._backend if self._backend is not None else self._model
+        settings = {
+            f.name: getattr(self._config, f.name)
+            for f in dataclasses.fields(self._config)
+            if f.name not in _RESPONSE_KEY_IGNORED
+        }
+        return response_key(
+            config=settings,
+            model=getattr(getattr(engine, "config", None), "_name_or_path", type(engine).__name__),
+            dtype=getattr(engine, "dtype", getattr(engine, "compute_type", None)),
+            prompt=self._build_prompt(request),
+            max_new_tokens=params["max_new_tokens"],
+            repetition_penalty=params["repetition_penalty"],
+        )
+
+    def cached_response(self, request: LLMRequest) -> LLMResponse | None:
+        """Return a previously generated response for an identical greedy request, if any."""
+        key = self._response_key(request)
+        if key is None:
+            return None
+        text = self._response_cache.get(key)
+        return LLMResponse(text=text) if text is not None else None
+
+    def cache_response(self, request: LLMRequest, response: LLMResponse) -> None:
+        key = self._response_key(request)
+        if key is not None:
+            self._response_cache.put(key, response.text)
+
+    def _resolve_stops(self) -> tuple[frozenset[int], tuple[str, ...]]:
+        engine = self._backend if self._backend is not None else self._model
+        ids = set(eos_token_ids(engine, self._tokenizer))
+        strings = []
+        convert = getattr(self._tokenizer, "convert_tokens_to_ids", None)
+        unk_id = getattr(self._tokenizer, "unk_token_id", None)
+        for stop in self._config.stop_sequences:
+            token_id = convert(stop) if convert is not None else None
+            if isinstance(token_id, int) and token_id != unk_id:
+                ids.add(token_id)
+            else:
+                strings.append(stop)
+        return frozenset(ids), tuple(strings)
+
+    def _stop_criteria(self, prompt_len: int) -> list[Any]:
+        """`generate` stopping criteria for the multi-token stop sequences (empty if none)."""
+        if not self._stop_strings:
+            return []
+        from transformers import StoppingCriteria
+
+        tokenizer, stops = self._tokenizer, self._stop_strings
+        # Every token decodes to at least one character, so this many tokens cover any stop string
+        window = max(len(s) for s in stops)
+
+        class _StopStrings(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                import torch
+
+                start = max(prompt_len, input_ids.shape[-1] - window)
+                tails = [tokenizer.decode(row[start:], skip_special_tokens=False) for row in input_ids]
+                return torch.tensor([any(s in t for s in stops) for t in tails], dtype=torch.bool, device=input_ids.device)
 
+        return [_StopStrings()]
+
+    def _stop_kwargs(self, prompt_len: int) -> dict[str, Any]:
+        criteria = self._stop_criteria(prompt_len)
+        if not criteria:
+            return {}
+        from transformers import StoppingCriteriaList
+
+        return {"stopping_criteria": StoppingCriteriaList(criteria)}
+
+    def _cut_at_stop(self, text: str) -> str:
+        """`text` up to the first multi-token stop sequence."""
+        cut = min((i for i in (text.find(s) for s in self._stop_strings) if i >= 0), default=len(text))
+        return text[:cut]
+
+    def _until_stop(self, pieces: Iterator[str]) -> Iterator[str]:
+        """Pass streamed text through, holding back just enough to never emit a stop sequence."""
+        if not self._stop_strings:
+            yield from pieces
+            return
+        hold = max(len(s) for s in self._stop_strings) - 1
+        buffer = ""
+        for piece in pieces:
+            buffer += piece
+            cut = self._cut_at_stop(buffer)
+            if len(cut) < len(buffer):
+                if cut:
+                    yield cut
+                return
+            if len(buffer) > hold:
+                yield buffer[:len(buffer) - hold]
+                buffer = buffer[len(buffer) - hold:]
+        if buffer:
+            yield buffer
+
+    def _format_template(self, request: LLMRequest, user_text: str) -> str:
         prompt_key = request.prompt_key or DEFAULT_PROMPT_KEY
+        if prompt_key == "chat" and getattr(self._tokenizer, "chat_template", None):
+            messages = [{"role": "system", "content": CHAT_SYSTEM_PROMPT}, {"role": "user", "content": user_text}]
+            return self._tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
         template = PROMPT_TEMPLATES.get(prompt_key, PROMPT_TEMPLATES[DEFAULT_PROMPT_KEY])
-        prompt = template.format(
+        return template.format(
             instruction=self._config.instruction_prompt,
-            input=base_text,
+            input=user_text,
             system=self._config.system_prompt,
-            user=base_text,
+            user=user_text,
         )
 
+    def _build_prompt(self, request: LLMRequest) -> str:
+        base_text = request.text
+        if not base_text:
+            raise ValueError("LLMRequest.text must not be empty")
+        return self._format_template(request, base_text)
+
+    def _prompt_prefix(self, request: LLMRequest) -> str:
+        """The part of the request's template that precedes the user text (identical across calls)."""
+        marker = "\x00"
+        return self._format_template(request, marker).split(marker, 1)[0]
+
+    def _prefix_past(self, request: LLMRequest, input_ids: Any) -> Any | None:
+        """A fresh `past_key_values` for the template prefix of `input_ids`, if it can be reused."""
+        if self._prefix_cache is None or not hasattr(input_ids, "shape"):
+            return None
+        return self._prefix_cache.match(self._prompt_prefix(request), input_ids)
+
+    def _with_prefix_cache(self, request: LLMRequest, inputs: dict[str, Any]) -> dict[str, Any]:
+        past = self._prefix_past(request, inputs.get("input_ids"))
+        if past is None:
+            return inputs
+        # generate() only prefills the positions the cache does not cover yet
+        return {**inputs, "past_key_values": past}
+
+    def _generation_kwargs(self, request: LLMRequest) -> dict[str, Any]:
         max_new_tokens = request.max_new_tokens or self._config.max_new_tokens
         temperature = request.temperature if request.temperature is not None else self._config.temperature
         top_p = request.top_p if request.top_p is not None else self._config.top_p
@@ -80,42 +358,380 @@ class LLMService:
 
         logger.debug(
             "Generating response (prompt_key=%s, max_new_tokens=%s, temperature=%s, top_p=%s, repetition_penalty=%s)",
-            prompt_key,
+            request.prompt_key or DEFAULT_PROMPT_KEY,
             max_new_tokens,
             temperature,
             top_p,
             repetition_penalty,
         )
 
-        # Tokenize input
-        inputs = self._tokenizer(prompt, return_tensors="pt")
+        kwargs = {
+            "max_new_tokens": max_new_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "repetition_penalty": repetition_penalty,
+            "do_sample": temperature > 0,
+            "pad_token_id": getattr(self._tokenizer, "eos_token_id", None),
+        }
+        if self._stop_ids:
+            kwargs["eos_token_id"] = sorted(self._stop_ids)
+        return kwargs
+
+    def _backend_kwargs(self, params: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "max_new_tokens": params["max_new_tokens"],
+            "temperature": params["temperature"] if params["do_sample"] else 0.0,
+            "top_p": params["top_p"],
+            "repetition_penalty": params["repetition_penalty"],
+            "eos_ids": self._stop_ids,
+        }
+
+    def _decode_stream(self, token_ids: Iterator[int]) -> Iterator[str]:
+        """Turn a token id stream into text pieces; closing this closes `token_ids`."""
+        generated: list[int] = []
+        emitted = ""
+        try:
+            for token in token_ids:
+                generated.append(token)
+                text = self._tokenizer.decode(generated, skip_special_tokens=True)
+                # Hold back incomplete multi-byte characters until the next token completes them
+                if len(text) > len(emitted) and not text.endswith("\ufffd"):
+                    yield text[len(emitted):]
+                    emitted = text
+        finally:
+            close = getattr(token_ids, "close", None)
+            if close is not None:
+                close()
+
+    def _encode(self, prompt: str | list[str]) -> dict[str, Any]:
+        # Tokenize input; batches are padded on the side set in __init__
+        if isinstance(prompt, list):
+            inputs = self._tokenizer(prompt, return_tensors="pt", padding=True)
+        else:
+            inputs = self._tokenizer(prompt, return_tensors="pt")
 
         # Move inputs to model device if applicable
         model_device = getattr(self._model, "device", None)
         if model_device:
             inputs = {k: v.to(model_device) for k, v in inputs.items()}
+        return inputs
 
-        # Generate output token ids
+    def generate(self, request: LLMRequest) -> LLMResponse:
+        """Generate a response for the given request.
+
+        Args:
+            request: Request object containing the input text and optional parameters.
+
+        Returns:
+            LLMResponse with the generated text.
+        """
+        cached = self.cached_response(request)
+        if cached is not None:
+            return cached
+        response = self._generate(request)
+        self.cache_response(request, response)
+        return response
+
+    def _generate(self, request: LLMRequest) -> LLMResponse:
+        prompt = self._build_prompt(request)
+        gen_kwargs = self._generation_kwargs(request)
+        if self._backend is not None:
+            ids = self._backend.generate_ids([self._token_ids(prompt)], **self._backend_kwargs(gen_kwargs))[0]
+            return LLMResponse(text=self._cut_at_stop(self._tokenizer.decode(ids, skip_special_tokens=True)).strip())
+        inputs = self._encode(prompt)
+        proposer = self._proposer(request)
+        if proposer is not None:
+            return self._generate_speculative(request, inputs, gen_kwargs, proposer)
+
+        # Generate output token ids, starting from the cached template prefix when possible
+        input_len = self._input_len(inputs)
         outputs = self._model.generate(
-            **inputs,
-            max_new_tokens=max_new_tokens,
-            temperature=temperature,
-            top_p=top_p,
-            repetition_penalty=repetition_penalty,
-            do_sample=temperature > 0,
-            pad_token_id=getattr(self._tokenizer, "eos_token_id", None),
+            **self._with_prefix_cache(request, inputs), **gen_kwargs, **self._stop_kwargs(input_len)
         )
 
-        # Decode the full sequence
-        full_text = self._tokenizer.decode(outputs[0], skip_special_tokens=True)
-
-        # Strip the original prompt if the model echoes it back
-        if full_text.startswith(prompt):
-            generated_text = full_text[len(prompt):].strip()
-        else:
-            generated_text = full_text
+        # Decode only the new tokens; the output row starts with the prompt ids
+        generated_text = self._cut_at_stop(self._tokenizer.decode(outputs[0][input_len:], skip_special_tokens=True)).strip()
 
         logger.debug("Generated response length=%d characters", len(generated_text))
 
         return LLMResponse(text=generated_text)
 
+    @staticmethod
+    def _input_len(inputs: dict[str, Any]) -> int:
+        input_ids = inputs["input_ids"]
+        return int(input_ids.shape[-1]) if hasattr(input_ids, "shape") else len(input_ids)
+
+    def _proposer(self, request: LLMRequest) -> Proposer | None:
+        mode = self._config.speculative
+        keys = self._config.speculative_prompt_keys
+        if mode == "none" or self._model is None or (keys and (request.prompt_key or DEFAULT_PROMPT_KEY) not in keys):
+            return None
+        if mode == "draft":
+            return DraftModel(self._draft_model, num_tokens=self._config.speculative_tokens)
+        return PromptLookup(num_tokens=self._config.speculative_tokens, max_ngram=self._config.prompt_lookup_max_ngram)
+
+    def _generate_speculative(
+        self, request: LLMRequest, inputs: dict[str, Any], params: dict[str, Any], proposer: Proposer
+    ) -> LLMResponse:
+        input_ids = inputs["input_ids"]
+        tokens, stats = speculative_generate(
+            self._model,
+            [int(t) for t in input_ids[0]],
+            proposer,
+            max_new_tokens=params["max_new_tokens"],
+            temperature=params["temperature"] if params["do_sample"] else 0.0,
+            top_p=params["top_p"],
+            repetition_penalty=params["repetition_penalty"],
+            eos_ids=self._stop_ids,
+            past=self._prefix_past(request, input_ids),
+        )
+        self._speculative_stats.add(stats)
+        logger.debug(
+            "Speculative generation: %d tokens in %d steps, %d/%d guesses accepted",
+            stats.generated,
+            stats.steps,
+            stats.accepted,
+            stats.proposed,
+        )
+        return LLMResponse(text=self._cut_at_stop(self._tokenizer.decode(tokens, skip_special_tokens=True)).strip())
+
+    def generate_batch(self, requests: list[LLMRequest]) -> list[LLMResponse]:
+        """Generate responses for several requests with a single batched `generate` call.
+
+        All requests must share sampling parameters (temperature, top_p, repetition_penalty);
+        `max_new_tokens` may differ, in which case the batch runs to the largest value and each
+        response is cut back to its own limit.
+
+        Args:
+            requests: Requests to run together.
+
+        Returns:
+            One LLMResponse per request, in the same order.
+        """
+        if not requests:
+            return []
+
+        prompts = [self._build_prompt(r) for r in requests]
+        limits = [r.max_new_tokens or self._config.max_new_tokens for r in requests]
+        gen_kwargs = self._generation_kwargs(requests[0])
+        gen_kwargs["max_new_tokens"] = max(limits)
+        if self._backend is not None:
+            rows = self._backend.generate_ids([self._token_ids(p) for p in prompts], **self._backend_kwargs(gen_kwargs))
+            return [
+                LLMResponse(text=self._cut_at_stop(self._tokenizer.decode(row[:limit], skip_special_tokens=True)).strip())
+                for row, limit in zip(rows, limits)
+            ]
+        inputs = self._encode(prompts)
+
+        # Rows are left-padded to a common length, so new tokens start at the same offset
+        input_len = self._input_len(inputs)
+        outputs = self._model.generate(**inputs, **gen_kwargs, **self._stop_kwargs(input_len))
+
+        responses = []
+        for row, limit in zip(outputs, limits):
+            text = self._tokenizer.decode(row[input_len:input_len + limit], skip_special_tokens=True)
+            responses.append(LLMResponse(text=self._cut_at_stop(text).strip()))
+
+        logger.debug("Generated batch of %d responses", len(responses))
+        return responses
+
+    def stream(self, request: LLMRequest) -> Iterator[str]:
+        """Generate a response for the given request, yielding text as it is produced.
+
+        `model.generate` runs on a helper thread and feeds a `TextIteratorStreamer`; the
+        prompt is never echoed. Closing the iterator early stops generation at the next token.
+
+        Args:
+            request: Request object containing the input text and optional parameters.
+
+        Yields:
+            Decoded text pieces, in order. Joining them gives the full response.
+
+        Raises:
+            RuntimeError: If the `transformers` library is not installed.
+        """
+        cached = self.cached_response(request)
+        if cached is not None:
+            yield cached.text
+            return
+
+        if self._backend is not None:
+            params = self._generation_kwargs(request)
+            ids = self._token_ids(self._build_prompt(request))
+            pieces = []
+            token_ids = self._backend.stream_ids(ids, **self._backend_kwargs(params))
+            for piece in self._until_stop(self._decode_stream(token_ids)):
+                pieces.append(piece)
+                yield piece
+            self.cache_response(request, LLMResponse(text="".join(pieces).strip()))
+            return
+
+        try:
+            from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+        except ImportError as exc:  # pragma: no cover - exercised only in real runtime
+            raise RuntimeError("Streaming generation requires the 'transformers' package.") from exc
+
+        prompt = self._build_prompt(request)
+        gen_kwargs = self._generation_kwargs(request)
+        inputs = self._encode(prompt)
+        stop_criteria = self._stop_criteria(self._input_len(inputs))
+        inputs = self._with_prefix_cache(request, inputs)
+
+        cancelled = threading.Event()
+
+        class _Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                import torch
+
+                return torch.full((input_ids.shape[0],), cancelled.is_set(), dtype=torch.bool, device=input_ids.device)
+
+        streamer = TextIteratorStreamer(self._tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors: list[BaseException] = []
+
+        def _run() -> None:
+            try:
+                self._model.generate(
+                    **inputs,
+                    **gen_kwargs,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([_Cancelled(), *stop_criteria]),
+                )
+            except BaseException as exc:  # surfaced to the consumer below
+                errors.append(exc)
+                streamer.end()
+
+        worker = threading.Thread(target=_run, name="llm-stream", daemon=True)
+        worker.start()
+        pieces: list[str] = []
+        try:
+            for piece in self._until_stop(streamer):
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+        finally:
+            cancelled.set()
+            worker.join()
+
+        if errors:
+            raise errors[0]
+        self.cache_response(request, LLMResponse(text="".join(pieces).strip()))
+
+    def incremental(self, request: LLMRequest | None = None) -> IncrementalPrompt:
+        """Start a prompt that is prefilled while its user text is still arriving.
+
+        See `llm.pipeline.run_pipelined` for feeding it from ASR segments.
+        """
+        return IncrementalPrompt(self, request)
+
+    def chat(self, request: LLMRequest, session: ChatSession) -> LLMResponse:
+        """Generate the next reply in a multi-turn session (see `chat_stream`)."""
+        return LLMResponse(text="".join(self.chat_stream(request, session)).strip())
+
+    def chat_stream(self, request: LLMRequest, session: ChatSession) -> Iterator[str]:
+        """Continue a conversation, yielding reply text as it is produced.
+
+        The session keeps the KV cache of everything said so far, so each turn only prefills
+        the new user message. If history plus the new turn would exceed
+        `LLMConfig.session_max_tokens`, the cache is dropped and the most recent turns that fit
+        are re-prefilled. `request.prompt_key` is ignored; sessions always use the ChatML chat
+        format.
+
+        Args:
+            request: The new user turn and optional generation overrides.
+            session: Conversation state from a `SessionStore`; updated in place.
+
+        Yields:
+            Decoded text pieces of the assistant reply, in order.
+        """
+        import torch
+
+        if not request.text:
+            raise ValueError("LLMRequest.text must not be empty")
+
+        params = self._generation_kwargs(request)
+        budget = self._config.session_max_tokens - params["max_new_tokens"]
+        if self._backend is not None:
+            yield from self._chat_stream_backend(request, session, params, budget)
+            return
+        eos_ids = self._stop_ids
+
+        with session.lock:
+            new_ids: list[int] = []
+            if session.kv:
+                closing = "" if session.pending_token in eos_ids else CHAT_END_OF_TURN
+                new_ids = [session.pending_token] if session.pending_token is not None else []
+                new_ids += self._token_ids(closing + "\n" + CHAT_TURN_TEMPLATE.format(user=request.text))
+                if len(session.token_ids) + len(new_ids) > budget:
+                    logger.debug("Session %s exceeded its context budget; re-prefilling", session.session_id)
+                    session.reset_cache()
+            if not session.kv:
+                new_ids = self._session_prompt_ids(session.turns, request.text, budget)
+
+            past = kv_cache.layers_to_cache(session.kv) if session.kv else None
+            fed_ids = list(session.token_ids)
+            generated: list[int] = []
+            emitted = ""
+            device = getattr(self._model, "device", None)
+            try:
+                step_ids = new_ids
+                while True:
+                    input_ids = torch.tensor([step_ids], dtype=torch.long, device=device)
+                    with torch.no_grad():
+                        out = self._model(input_ids=input_ids, past_key_values=past, use_cache=True)
+                    past = out.past_key_values
+                    fed_ids += step_ids
+
+                    token = sample_token(
+                        out.logits[0, -1],
+                        temperature=params["temperature"] if params["do_sample"] else 0.0,
+                        top_p=params["top_p"],
+                        repetition_penalty=params["repetition_penalty"],
+                        seen_ids=fed_ids,
+                    )
+                    generated.append(token)
+
+                    text = self._tokenizer.decode(generated, skip_special_tokens=True)
+                    # Hold back incomplete multi-byte characters until the next token completes them
+                    if len(text) > len(emitted) and not text.endswith("\ufffd"):
+                        yield text[len(emitted):]
+                        emitted = text
+
+                    if token in eos_ids or len(generated) >= params["max_new_tokens"]:
+                        break
+                    step_ids = [token]
+            finally:
+                # Commit whatever was fed, even if the consumer stopped early
+                session.kv = kv_cache.cache_to_layers(past)
+                session.token_ids = fed_ids
+                session.pending_token = generated[-1] if generated else None
+                reply = self._tokenizer.decode(generated, skip_special_tokens=True).strip()
+                session.turns.append((request.text, reply))
+
+    def _chat_stream_backend(
+        self, request: LLMRequest, session: ChatSession, params: dict[str, Any], budget: int
+    ) -> Iterator[str]:
+        """Sessions without a KV cache: every turn re-sends the recent history that fits."""
+        with session.lock:
+            ids = self._session_prompt_ids(session.turns, request.text, budget)
+            pieces: list[str] = []
+            try:
+                for piece in self._decode_stream(self._backend.stream_ids(ids, **self._backend_kwargs(params))):
+                    pieces.append(piece)
+                    yield piece
+            finally:
+                session.turns.append((request.text, "".join(pieces).strip()))
+
+    def _token_ids(self, text: str) -> list[int]:
+        ids = self._tokenizer(text, return_tensors="pt")["input_ids"]
+        return [int(t) for t in ids[0]]
+
+    def _session_prompt_ids(self, turns: list[tuple[str, str]], user_text: str, budget: int) -> list[int]:
+        """Token ids for the system block, as many recent turns as fit, and the new user turn."""
+        tail = CHAT_TURN_TEMPLATE.format(user=user_text)
+        history = ""
+        for user, assistant in reversed(turns):
+            candidate = CHAT_TURN_TEMPLATE.format(user=user) + assistant + CHAT_END_OF_TURN + "\n" + history
+            if len(self._token_ids(CHAT_SYSTEM_TEMPLATE + candidate + tail)) > budget:
+                break
+            history = candidate
+        return self._token_ids(CHAT_SYSTEM_TEMPLATE + history + tail)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from . import kv_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChatSession:
+    """Server-side state for one multi-turn conversation.
+
+    Attributes:
+        session_id: Client-visible identifier.
+        model_key: Model the KV cache was built with; the same `session_id` on another model
+            is a separate session.
+        turns: Completed `(user, assistant)` exchanges, used to rebuild the context if the
+            KV cache has to be dropped.
+        token_ids: Tokens whose keys/values are held in `kv`.
+        kv: Per-layer KV state covering `token_ids`.
+        pending_token: Last sampled token of the previous reply; not yet fed to the model.
+        last_used: `time.monotonic()` of the last turn, for TTL eviction.
+    """
+
+    session_id: str
+    model_key: str | None = None
+    turns: list[tuple[str, str]] = field(default_factory=list)
+    token_ids: list[int] = field(default_factory=list)
+    kv: kv_cache.KVLayers = field(default_factory=list)
+    pending_token: int | None = None
+    last_used: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def reset_cache(self) -> None:
+        self.token_ids, self.kv, self.pending_token = [], [], None
+
+
+class SessionStore:
+    """In-memory conversation store with idle-TTL expiry and an LRU cap on session count.
+
+    Nothing is written to disk; a session disappears after `ttl_s` seconds without a turn, or
+    earlier if `max_sessions` newer sessions push it out. Sessions are keyed by
+    `(model_key, session_id)`: KV state built by one model is never fed to another.
+    """
+
+    def __init__(self, *, max_sessions: int = 16, ttl_s: float = 900.0) -> None:
+        self._max_sessions = max(1, max_sessions)
+        self._ttl_s = ttl_s
+        self._sessions: OrderedDict[tuple[str | None, str], ChatSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return any(sid == session_id for _, sid in list(self._sessions))
+
+    def get(self, session_id: str | None = None, *, model_key: str | None = None) -> ChatSession:
+        """Return the live session for `session_id` on `model_key`, creating it (or a new random id) if needed."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            key = (model_key, session_id)
+            if session_id and key in self._sessions:
+                session = self._sessions[key]
+                self._sessions.move_to_end(key)
+            else:
+                session = ChatSession(session_id or uuid.uuid4().hex, model_key)
+                self._sessions[(model_key, session.session_id)] = session
+                while len(self._sessions) > self._max_sessions:
+                    (_, evicted), _ = self._sessions.popitem(last=False)
+                    logger.debug("Evicted chat session %s (LRU)", evicted)
+            session.last_used = now
+            return session
+
+    def drop(self, session_id: str) -> None:
+        """Forget `session_id` on every model."""
+        with self._lock:
+            for key in [k for k in self._sessions if k[1] == session_id]:
+                del self._sessions[key]
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, s in self._sessions.items() if now - s.last_used > self._ttl_s]
+        for key in expired:
+            del self._sessions[key]
+            logger.debug("Expired chat session %s", key[1])
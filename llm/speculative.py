@@ -0,0 +1,218 @@
+"""Speculative decoding: propose several tokens cheaply, verify them in one forward pass.
+
+A proposer guesses the next few tokens, either by copying what followed the latest n-gram
+earlier in the context (`PromptLookup`, free and very effective when the reply quotes the
+input as in summaries and translations) or by running a small draft model (`DraftModel`).
+The target model scores all guesses at once; tokens are then picked from its logits exactly as
+in ordinary decoding, and guesses are accepted for as long as they agree. The output therefore
+follows the target model's own distribution (identical tokens under greedy decoding), and
+every accepted guess saves one forward pass of the target.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Protocol, Sequence
+
+from . import kv_cache
+from .sampling import sample_token
+
+SPECULATIVE_MODES = ("none", "prompt_lookup", "draft")
+
+
+class Proposer(Protocol):
+    def propose(self, context: Sequence[int]) -> list[int]:
+        ...
+
+
+@dataclass
+class SpeculativeStats:
+    """Counters for speculative decoding; `acceptance_rate` is accepted / proposed guesses.
+
+    Attributes:
+        requests: Generations that used speculative decoding.
+        steps: Target model forward passes.
+        proposed: Guessed tokens sent to the target for verification.
+        accepted: Guessed tokens the target agreed with.
+        generated: Tokens produced (accepted guesses plus one token from each step).
+    """
+
+    requests: int = 0
+    steps: int = 0
+    proposed: int = 0
+    accepted: int = 0
+    generated: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.proposed if self.proposed else 0.0
+
+    @property
+    def tokens_per_step(self) -> float:
+        return self.generated / self.steps if self.steps else 0.0
+
+    def add(self, other: SpeculativeStats) -> None:
+        with self._lock:
+            self.requests += other.requests
+            self.steps += other.steps
+            self.proposed += other.proposed
+            self.accepted += other.accepted
+            self.generated += other.generated
+
+    def as_dict(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "steps": self.steps,
+                "proposed": self.proposed,
+                "accepted": self.accepted,
+                "generated": self.generated,
+                "acceptance_rate": self.acceptance_rate,
+                "tokens_per_step": self.tokens_per_step,
+            }
+
+
+class PromptLookup:
+    """Propose the tokens that followed the most recent earlier occurrence of the context's tail.
+
+    Tries the longest tail n-gram first (`max_ngram` tokens) down to a single token.
+    """
+
+    def __init__(self, num_tokens: int = 8, max_ngram: int = 3) -> None:
+        self.num_tokens = num_tokens
+        self.max_ngram = max_ngram
+
+    def propose(self, context: Sequence[int]) -> list[int]:
+        context = list(context)
+        for n in range(min(self.max_ngram, len(context) - 1), 0, -1):
+            tail = context[-n:]
+            for start in range(len(context) - n - 1, -1, -1):
+                if context[start:start + n] == tail:
+                    return context[start + n:start + n + self.num_tokens]
+        return []
+
+
+class DraftModel:
+    """Propose a small model's greedy continuation; one instance per generation.
+
+    The draft keeps its own KV cache and, on each call, crops it back to the part of the
+    context that is unchanged, so only the tokens accepted since the last call are prefilled.
+    The draft must share the target's tokenizer.
+    """
+
+    def __init__(self, model: Any, num_tokens: int = 8) -> None:
+        self._model = model
+        self.num_tokens = num_tokens
+        self._ids: list[int] = []
+        self._kv: kv_cache.KVLayers = []
+
+    def propose(self, context: Sequence[int]) -> list[int]:
+        import torch
+
+        context = list(context)
+        common = 0
+        for cached, new in zip(self._ids, context):
+            if cached != new:
+                break
+            common += 1
+        # Feed at least one token so there are logits to continue from
+        common = min(common, len(context) - 1)
+        layers = kv_cache.slice_seq(self._kv, 0, common) if common else []
+
+        device = getattr(self._model, "device", None)
+        step = context[common:]
+        proposed: list[int] = []
+        with torch.no_grad():
+            for _ in range(self.num_tokens):
+                out = self._model(
+                    input_ids=torch.tensor([step], dtype=torch.long, device=device),
+                    past_key_values=kv_cache.layers_to_cache(layers) if layers else None,
+                    use_cache=True,
+                )
+                layers = kv_cache.cache_to_layers(out.past_key_values)
+                token = int(torch.argmax(out.logits[0, -1]))
+                proposed.append(token)
+                step = [token]
+
+        # The last proposal was never fed, so the cache covers context + proposed[:-1]
+        self._ids, self._kv = context + proposed[:-1], layers
+        return proposed
+
+
+def speculative_generate(
+    model: Any,
+    input_ids: Sequence[int],
+    proposer: Proposer,
+    *,
+    max_new_tokens: int,
+    temperature: float,
+    top_p: float = 1.0,
+    repetition_penalty: float = 1.0,
+    eos_ids: Iterable[int] = (),
+    past: Any = None,
+) -> tuple[list[int], SpeculativeStats]:
+    """Generate up to `max_new_tokens` after `input_ids`, verifying proposals in batches.
+
+    Args:
+        model: The target causal LM.
+        input_ids: Prompt token ids.
+        proposer: Source of guessed continuations.
+        past: Optional `past_key_values` already covering a prefix of `input_ids`.
+
+    Returns:
+        The generated token ids (ending with the EOS token if one was produced) and the
+        counters for this call.
+    """
+    import torch
+
+    eos = set(eos_ids)
+    stats = SpeculativeStats(requests=1)
+    device = getattr(model, "device", None)
+    layers = kv_cache.cache_to_layers(past)
+    context = list(input_ids)
+    fed = kv_cache.seq_len(layers)
+    generated: list[int] = []
+
+    with torch.no_grad():
+        while len(generated) < max_new_tokens:
+            room = max_new_tokens - len(generated) - 1
+            guesses = proposer.propose(context)[:room] if room > 0 else []
+            step = context[fed:] + guesses
+            out = model(
+                input_ids=torch.tensor([step], dtype=torch.long, device=device),
+                past_key_values=kv_cache.layers_to_cache(layers) if layers else None,
+                use_cache=True,
+            )
+            layers = kv_cache.cache_to_layers(out.past_key_values)
+            logits = out.logits[0, -(len(guesses) + 1):]
+            stats.steps += 1
+            stats.proposed += len(guesses)
+
+            finished = False
+            for i in range(len(guesses) + 1):
+                token = sample_token(
+                    logits[i],
+                    temperature=temperature,
+                    top_p=top_p,
+                    repetition_penalty=repetition_penalty,
+                    seen_ids=context,
+                )
+                context.append(token)
+                generated.append(token)
+                agreed = i < len(guesses) and token == guesses[i]
+                stats.accepted += agreed
+                if token in eos or len(generated) >= max_new_tokens:
+                    finished = True
+                    break
+                if not agreed:
+                    break
+            if finished:
+                break
+            # Drop the KV of rejected guesses; the newest token is fed on the next step
+            fed = len(context) - 1
+            layers = kv_cache.slice_seq(layers, 0, fed)
+
+    stats.generated = len(generated)
+    return generated, stats
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import argparse
+import json
+import logging
+import time
+from dataclasses import asdict
+from typing import Iterator, List
+
+from asr.service import ASRService
+
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3", ".m4a", ".webm", ".opus")
+
+
+def find_audio_files(root: Path, extensions: List[str]) -> Iterator[Path]:
+    """Yield audio files under `root` (recursively), in sorted order."""
+    wanted = {e.lower() if e.startswith(".") else f".{e.lower()}" for e in extensions}
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and path.suffix.lower() in wanted:
+            yield path
+
+
+def transcribe_folder(
+    root: Path,
+    output: Path,
+    asr_service: ASRService,
+    extensions: List[str],
+    language: str | None = None,
+) -> int:
+    """
+    Transcribe every audio file under `root` and write one JSON object per file to `output`.
+
+    Files are fed to `ASRService.transcribe_many`, which batches speech chunks across
+    files. Undecodable files are logged and skipped.
+
+    Returns
+    -------
+    Number of files written.
+    """
+    written = 0
+    started = time.perf_counter()
+    with output.open("w", encoding="utf-8") as out:
+        results = asr_service.transcribe_many(
+            find_audio_files(root, extensions), language=language, skip_errors=True
+        )
+        for path, result in results:
+            record = {"path": str(path.relative_to(root)), **asdict(result)}
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            written += 1
+            logger.info("Transcribed %s (%.1fs audio)", path, result.duration or 0.0)
+
+    logger.info("Wrote %d transcript(s) to %s in %.1fs", written, output, time.perf_counter() - started)
+    return written
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Batch-transcribe a folder of recordings into a JSONL file."
+    )
+    parser.add_argument("folder", type=Path, help="Folder to scan recursively for audio files.")
+    parser.add_argument("output", type=Path, help="JSONL file to write (one line per file).")
+    parser.add_argument(
+        "--ext",
+        nargs="+",
+        default=list(AUDIO_EXTENSIONS),
+        help="Audio file extensions to include.",
+    )
+    parser.add_argument(
+        "--language",
+        default=None,
+        help="Language code; detected once per batch if omitted, so set it for mixed folders.",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="Increase log verbosity (-v for INFO, -vv for DEBUG).",
+    )
+    return parser
+
+
+def main() -> None:
+    args = build_arg_parser().parse_args()
+    level = logging.WARNING if args.verbose <= 0 else logging.INFO if args.verbose == 1 else logging.DEBUG
+    logging.basicConfig(level=level, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    if not args.folder.is_dir():
+        print(f"Folder does not exist: {args.folder}")
+        sys.exit(1)
+
+    count = transcribe_folder(args.folder, args.output, ASRService(), args.ext, language=args.language)
+    print(f"Wrote {count} transcript(s) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, List
+
+import numpy as np
+
+from asr.resample import StreamingResampler, resample
+
+
+TARGET_RATE = 16000
+
+
+def fft_resample(audio: np.ndarray, rate: int) -> np.ndarray:
+    """The previous `FasterWhisperBackend` path: one FFT over the whole clip."""
+    import scipy.signal
+
+    return scipy.signal.resample(audio, int(len(audio) * TARGET_RATE / rate)).astype(np.float32)
+
+
+def streaming_resample(audio: np.ndarray, rate: int, chunk_ms: float = 20.0) -> np.ndarray:
+    """Feed the clip in live-capture-sized chunks."""
+    resampler = StreamingResampler(rate, TARGET_RATE)
+    step = max(1, int(rate * chunk_ms / 1000))
+    parts = [resampler.process(audio[i:i + step]) for i in range(0, len(audio), step)]
+    parts.append(resampler.flush())
+    return np.concatenate(parts)
+
+
+METHODS: dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    "scipy.signal.resample (fft)": fft_resample,
+    "asr.resample.resample": lambda audio, rate: resample(audio, rate, TARGET_RATE),
+    "StreamingResampler (20 ms chunks)": streaming_resample,
+}
+
+
+def measure(method: Callable[[np.ndarray, int], np.ndarray], audio: np.ndarray, rate: int, repeats: int) -> tuple[float, float]:
+    """Best wall time in seconds and peak traced allocation in MB for one call."""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        method(audio, rate)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    method(audio, rate)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare resampling paths to 16 kHz.")
+    parser.add_argument("--durations", type=float, nargs="+", default=[1.0, 30.0, 600.0], help="Clip lengths in seconds.")
+    parser.add_argument("--rates", type=int, nargs="+", default=[44100, 48000], help="Source sample rates.")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per case (best is reported).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    rows: List[str] = []
+    for rate in args.rates:
+        resample(np.zeros(rate, dtype=np.float32), rate, TARGET_RATE)  # build the cached filter
+        for duration in args.durations:
+            audio = rng.standard_normal(int(rate * duration)).astype(np.float32) * 0.1
+            for name, method in METHODS.items():
+                seconds, peak_mb = measure(method, audio, rate, args.repeats)
+                rows.append(f"{rate:>6} Hz {duration:>6.0f} s  {name:<34} {seconds * 1000:>10.1f} ms {peak_mb:>9.1f} MB")
+
+    print(f"{'rate':>9} {'clip':>8}  {'method':<34} {'time':>13} {'peak':>12}")
+    print("\n".join(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,75 @@
-import sys
+import json, sys, threading
 from pathlib import Path
 
 # Add project root so imports work when running test manually
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
+import numpy as np
+import pytest
 from fastapi.testclient import TestClient
+from fastapi import WebSocketDisconnect
 from api.main import create_app
+from api.executor import InferenceExecutor, ExecutorSaturated
 import api.deps as deps
 
 class DummyASR:
+    sample_rate = 16000
+
+    def decode(self, data):
+        return np.zeros(16000, dtype=np.float32)
+
+    def iter_segments(self, audio, **kw):
+        from asr.types import ASRSegment
+
+        yield ASRSegment(0.0, 0.5, "dummy")
+        yield ASRSegment(0.5, 1.0, "transcript")
+
     def transcribe_file(self, p, **kw):
-        return type("R", (), {"text": "dummy transcript"})
+        return type("R", (), {"text": "dummy transcript", "duration": 1.0})
+
+    def transcribe_bytes(self, data, **kw):
+        return self.transcribe_file(None, **kw)
+
+    def stream_transcriber(self, **kw):
+        from asr.streaming import StreamEvent
+        from asr.types import ASRSegment
+
+        class Transcriber:
+            def feed(self, pcm):
+                return [StreamEvent("partial", ASRSegment(0.0, len(pcm) / 16000, "dummy"))]
+
+            def finish(self):
+                return [StreamEvent("final", ASRSegment(0.0, 1.0, "dummy transcript")),
+                        StreamEvent("end_of_speech", text="dummy transcript")]
+        return Transcriber()
 
 class DummyLLM:
     def generate(self, req):
         return type("R", (), {"text": f"LLM({req.text})"})
 
+    def stream(self, req):
+        yield "LLM("
+        yield req.text
+        yield ")"
+
+    def chat(self, req, session):
+        session.turns.append((req.text, "ok"))
+        return type("R", (), {"text": f"LLM#{len(session.turns)}({req.text})"})
+
+    def incremental(self, req=None):
+        llm = self
+
+        class Prompt:
+            prefixes = []
+
+            def extend(self, text):
+                self.prefixes.append(text)
+
+            def finish(self, text):
+                return llm.generate(type("Q", (), {"text": text}))
+        return Prompt()
+
 def test_routes():
     app = create_app()
     app.dependency_overrides[deps.get_asr_service] = lambda: DummyASR()
@@ -31,3 +84,196 @@ def test_routes():
     assert r.status_code == 200
     assert r.json()["transcript"] == "dummy transcript"
     assert r.json()["text"] == "LLM(dummy transcript)"
+
+def test_session_id_routes_to_chat_and_keeps_history():
+    from llm.sessions import SessionStore
+
+    store = SessionStore()
+    app = create_app()
+    app.dependency_overrides[deps.get_asr_service] = lambda: DummyASR()
+    app.dependency_overrides[deps.get_llm_service] = lambda: DummyLLM()
+    app.dependency_overrides[deps.get_session_store] = lambda: store
+    c = TestClient(app)
+
+    r = c.post("/api/llm", json={"message": "hello", "session_id": "s1"})
+    assert r.json() == {**r.json(), "text": "LLM#1(hello)", "session_id": "s1"}
+    r = c.post("/api/asr-llm", files={"audio": ("x.webm", b"123", "audio/webm")}, data={"session_id": "s1"})
+    assert r.json()["text"] == "LLM#2(dummy transcript)"
+
+    # Same session id on another model: its own history and KV cache, not model A's
+    r = c.post("/api/llm?llm_model=other", json={"message": "hello", "session_id": "s1"})
+    assert r.json()["text"] == "LLM#1(hello)"
+    assert store.get("s1", model_key="llm:default").model_key == "llm:default"
+    assert len(store.get("s1", model_key="llm:other").turns) == 1
+
+    assert c.delete("/api/sessions/s1").status_code == 204
+    assert "s1" not in store
+
+def test_asr_stream_websocket_relays_segments_and_reply():
+    app = create_app()
+    app.dependency_overrides[deps.get_asr_service] = lambda: DummyASR()
+    app.dependency_overrides[deps.get_llm_service] = lambda: DummyLLM()
+    c = TestClient(app)
+
+    with c.websocket_connect("/api/asr/stream?sample_rate=16000") as ws:
+        ws.send_bytes(bytes(3200))
+        assert ws.receive_json() == {"type": "partial", "start": 0.0, "end": 0.1, "text": "dummy"}
+        ws.send_text(json.dumps({"type": "end"}))
+        assert ws.receive_json()["type"] == "final"
+        assert ws.receive_json() == {"type": "transcript", "text": "dummy transcript"}
+        reply = ws.receive_json()
+        assert reply["type"] == "reply" and reply["text"] == "LLM(dummy transcript)"
+
+    for bad in ("abc", "0"):
+        with c.websocket_connect(f"/api/asr/stream?sample_rate={bad}") as ws:
+            assert ws.receive_json()["type"] == "error"
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+            assert closed.value.code == 1008
+
+def test_llm_stream_emits_tokens_then_done():
+    released = threading.Event()
+
+    class HeldLLM(DummyLLM):
+        def stream(self, req):
+            for piece in super().stream(req):
+                assert not released.is_set()  # still leased while generating
+                yield piece
+
+    app = create_app()
+    app.dependency_overrides[deps.get_llm_lease] = lambda: (HeldLLM(), released.set)
+    c = TestClient(app)
+
+    r = c.post("/api/llm/stream", json={"message": "hello"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in r.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    tokens = [json.loads(lines[1].removeprefix("data: "))["text"] for lines in events if lines[0] == "event: token"]
+    assert names[-1] == "done"
+    assert "".join(tokens) == "LLM(hello)"
+    assert released.is_set()
+
+def test_executor_rejects_when_saturated():
+    pool = InferenceExecutor("test", max_workers=1, queue_depth=1, retry_after_s=7)
+    gate = threading.Event()
+    try:
+        running = pool.submit(gate.wait)
+        queued = pool.submit(lambda: "queued")
+        with pytest.raises(ExecutorSaturated) as exc:
+            pool.submit(lambda: "rejected")
+        assert exc.value.retry_after_s == 7
+        gate.set()
+        assert queued.result(timeout=5) == "queued"
+        running.result(timeout=5)
+        assert pool.submit(lambda: "again").result(timeout=5) == "again"
+    finally:
+        gate.set()
+        pool.shutdown()
+
+def test_saturated_pool_returns_503():
+    pool = InferenceExecutor("llm", max_workers=1, queue_depth=0, retry_after_s=3)
+    gate = threading.Event()
+    app = create_app()
+    app.dependency_overrides[deps.get_llm_service] = lambda: DummyLLM()
+    app.dependency_overrides[deps.get_llm_executor] = lambda: pool
+    try:
+        pool.submit(gate.wait)
+        r = TestClient(app).post("/api/llm", json={"message": "hello"})
+        assert r.status_code == 503
+        assert r.headers["retry-after"] == "3"
+    finally:
+        gate.set()
+        pool.shutdown()
+
+def test_pipelined_asr_llm_does_not_hold_an_llm_worker_during_asr():
+    pool = InferenceExecutor("llm", max_workers=1, queue_depth=0, retry_after_s=3)
+    busy_during_asr = []
+
+    class ObservedASR(DummyASR):
+        def iter_segments(self, audio, **kw):
+            for seg in super().iter_segments(audio, **kw):
+                busy_during_asr.append(pool.in_flight)
+                yield seg
+
+    app = create_app()
+    app.dependency_overrides[deps.get_asr_service] = lambda: ObservedASR()
+    app.dependency_overrides[deps.get_llm_service] = lambda: DummyLLM()
+    app.dependency_overrides[deps.get_llm_executor] = lambda: pool
+    try:
+        r = TestClient(app).post("/api/asr-llm", files={"audio": ("x.webm", b"123", "audio/webm")})
+        assert r.json()["text"] == "LLM(dummy transcript)"
+        # Whisper's first segment is decoded before any LLM work has been submitted
+        assert busy_during_asr[0] == 0
+    finally:
+        pool.shutdown()
+
+def test_model_registry_loads_lazily_warms_up_and_evicts_lru():
+    from api.registry import ModelRegistry, ModelSpec
+
+    events = []
+
+    class Model:
+        nbytes = 60
+
+        def __init__(self, name):
+            self.name = name
+            events.append(("load", name))
+
+        def warmup(self):
+            events.append(("warmup", self.name))
+
+        def close(self):
+            events.append(("close", self.name))
+
+    registry = ModelRegistry(budget_bytes=100)
+    for name in ("a", "b"):
+        registry.register(ModelSpec(name, lambda name=name: Model(name), Model.warmup, nbytes=60))
+    assert events == []
+
+    assert registry.get("a").name == "a"
+    assert registry.get("a").name == "a"
+    assert events == [("load", "a"), ("warmup", "a")]
+    assert registry.status()["a"]["state"] == "ready"
+
+    with registry.lease("b"):
+        # a is closed before b starts loading, so the two are never resident together
+        assert events[2:] == [("close", "a"), ("load", "b"), ("warmup", "b")]
+        with registry.lease("a"):  # reloads a; b is leased, so both stay despite the budget
+            assert registry.status()["b"]["state"] == "ready"
+    assert events.count(("load", "a")) == 2
+
+def test_unknown_model_is_404():
+    app = create_app()
+    r = TestClient(app).post("/api/llm?llm_model=nope", json={"message": "hello"})
+    assert r.status_code == 404
+
+def test_readyz_reports_background_loading_and_requests_fail_fast(monkeypatch):
+    from api.config import settings
+    from api.registry import ModelRegistry, ModelSpec
+
+    gate = threading.Event()
+    registry = ModelRegistry()
+    registry.register(ModelSpec(deps.asr_key(), DummyASR))
+    registry.register(ModelSpec(deps.llm_key(), lambda: gate.wait(5) and DummyLLM()))
+    monkeypatch.setattr(settings, "model_wait_s", 0.0)
+    app = create_app()
+    app.dependency_overrides[deps.get_model_registry] = lambda: registry
+    monkeypatch.setattr(deps, "get_model_registry", lambda: registry)
+    c = TestClient(app)
+
+    registry.load_async(deps.asr_key())
+    registry.load_async(deps.llm_key())
+    assert c.get("/healthz").json() == {"status": "ok"}
+    r = c.post("/api/llm", json={"message": "hello"})
+    assert r.status_code == 503 and "retry-after" in r.headers
+    r = c.get("/readyz")
+    assert r.status_code == 503
+    assert r.json()["models"][deps.llm_key()]["state"] == "loading"
+
+    gate.set()
+    registry.get(deps.llm_key(), timeout=5)
+    r = c.get("/readyz")
+    assert r.status_code == 200
+    assert r.json()["models"][deps.asr_key()]["load_s"] is not None
+    assert c.post("/api/llm", json={"message": "hello"}).json()["text"] == "LLM(hello)"
@@ -5,7 +5,20 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
+import asyncio, io, os, stat, threading
+import numpy as np
+import pytest
+from asr.batching import ASRBatcher
+from asr.decode import decode_audio_bytes
+from asr.exceptions import ASRModelError, AudioPreprocessingError
+from asr.ffmpeg_io import FFmpegDecoderPool
+from asr.long_audio import split_at_silences, transcribe_long
+from asr.resample import StreamingResampler, resample
 from asr.service import ASRService
+from asr.streaming import StreamingTranscriber
+from asr.transcript_cache import TranscriptCache
+from asr.types import ASRResult, ASRSegment
+from asr.vad import EnergyVAD
 
 AUDIO_SAMPLE_DIR = PROJECT_ROOT / "audiosample"
 
@@ -30,4 +43,377 @@ def test_asr():
     print(f"[TEST] Language: {r.language}")
     print(f"[TEST] Duration: {r.duration}s")
 
-# test_asr()
\ No newline at end of file
+# test_asr()
+
+class RecordingBackend:
+    def __init__(self):
+        self.audio = None
+
+    def transcribe_audio(self, audio, sample_rate=16000, **kw):
+        self.audio = (audio, sample_rate)
+        return ASRResult(text="  hello   world ", language="en", segments=[], duration=len(audio) / sample_rate)
+
+def _webm_opus(seconds=1.0, rate=48000):
+    av = pytest.importorskip("av")
+    buf = io.BytesIO()
+    t = np.arange(int(seconds * rate)) / rate
+    tone = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    with av.open(buf, "w", format="webm") as container:
+        stream = container.add_stream("libopus", rate=rate)
+        stream.layout = "mono"
+        for i in range(0, len(tone), 960):
+            frame = av.AudioFrame.from_ndarray(tone[None, i:i + 960], format="flt", layout="mono")
+            frame.sample_rate = rate
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buf.getvalue()
+
+def test_decode_audio_bytes_wav_and_webm():
+    wav = decode_audio_bytes((AUDIO_SAMPLE_DIR / "recording.wav").read_bytes(), 16000)
+    assert wav.dtype == np.float32 and wav.ndim == 1 and len(wav) > 16000
+
+    webm = decode_audio_bytes(_webm_opus(1.0), 16000)
+    assert webm.dtype == np.float32
+    assert abs(len(webm) - 16000) < 800
+
+    with pytest.raises(AudioPreprocessingError):
+        decode_audio_bytes(b"")
+
+def test_transcribe_bytes_feeds_pcm_to_backend():
+    backend = RecordingBackend()
+    s = ASRService(backend=backend)
+    r = s.transcribe_bytes((AUDIO_SAMPLE_DIR / "recording.wav").read_bytes())
+    audio, rate = backend.audio
+    assert rate == 16000 and audio.dtype == np.float32
+    assert r.text == "hello world"
+
+def test_repeated_upload_is_served_from_transcript_cache(tmp_path):
+    backend = RecordingBackend()
+    s = ASRService(backend=backend)
+    s.transcript_cache = TranscriptCache(4, path=tmp_path / "t.sqlite", max_disk_bytes=10_000)
+    data = (AUDIO_SAMPLE_DIR / "recording.wav").read_bytes()
+
+    first = s.transcribe_bytes(data)
+    backend.audio = None
+    first.text = "edited by caller"
+    again = s.transcribe_bytes(data)
+    assert backend.audio is None and again.text == "hello world"
+    s.transcribe_bytes(data, prompt="names: Ada")  # a different prompt is a different transcript
+    assert backend.audio is not None
+    assert s.transcript_cache.stats["hit_rate"] == 1 / 3
+    key = s._cache_key(data, entry="transcribe_bytes", language=None, prompt=None)
+    # transcribe_file skips the gate, so the same bytes must not share its cached transcript
+    assert s._cache_key(data, entry="transcribe_file", language=None, prompt=None) != key
+    gate, s.gate = s.gate, None  # nor may ungated audio
+    assert s._cache_key(data, entry="transcribe_bytes", language=None, prompt=None) != key
+    s.gate = gate
+
+    # disk tier survives a restart and is trimmed to its size budget
+    reopened = TranscriptCache(1, path=tmp_path / "t.sqlite", max_disk_bytes=10_000)
+    assert reopened.get(key).text == "hello world"
+    for i in range(100):
+        reopened.put(f"k{i}", ASRResult("x" * 500, "en", [], 1.0))
+    assert reopened.get(key) is None
+    assert reopened._db.execute("SELECT SUM(size) FROM transcripts").fetchone()[0] <= 10_000
+
+def _wav(audio, rate=16000):
+    import soundfile as sf
+    buf = io.BytesIO()
+    sf.write(buf, audio, rate, format="WAV", subtype="FLOAT")
+    return buf.getvalue()
+
+def test_speech_gate_rejects_silence_and_trims_before_backend():
+    class SegmentBackend(RecordingBackend):
+        def transcribe_audio(self, audio, sample_rate=16000, **kw):
+            self.audio = (audio, sample_rate)
+            return ASRResult("hi", "en", [ASRSegment(0.2, 0.6, "hi")], len(audio) / sample_rate)
+
+    backend = SegmentBackend()
+    s = ASRService(backend=backend)
+    s.transcript_cache = None
+    r = s.transcribe_bytes(_wav(np.zeros(16000, dtype=np.float32)))
+    assert r.text == "" and backend.audio is None
+    clipped = np.sign(np.random.default_rng(0).standard_normal(16000)).astype(np.float32)
+    assert list(s.iter_segments(clipped)) == [] and backend.audio is None
+    assert s.gate_rejections == {"no_speech": 1, "clipped": 1}
+
+    r = s.transcribe_bytes(_wav(np.concatenate([_tone(1.0, 0), _tone(0.5, 0.3), _tone(1.0, 0)])))
+    audio, _ = backend.audio
+    assert len(audio) < 16000  # ~0.5 s of tone plus padding, not 2.5 s
+    # segment times are mapped back onto the upload; duration is the upload's
+    assert abs(r.segments[0].start - 1.0) < 0.05 and r.duration == 2.5
+
+def test_iter_segments_yields_lazily_from_decoded_audio():
+    pulled = []
+
+    class LazyBackend:
+        def iter_segments(self, audio, sample_rate=16000, **kw):
+            for i, text in enumerate(["  first  part", "", "second"]):
+                pulled.append(i)
+                yield ASRSegment(float(i), float(i + 1), text)
+
+    s = ASRService(backend=LazyBackend())
+    segments = s.iter_segments((AUDIO_SAMPLE_DIR / "recording.wav").read_bytes())
+    assert pulled == []
+    assert next(segments).text == "first part"
+    assert pulled == [0]
+    assert [seg.text for seg in segments] == ["second"]
+
+def test_transcribe_many_batches_files_and_skips_undecodable(tmp_path):
+    calls = []
+
+    class BatchBackend:
+        def transcribe_many(self, audios, **kw):
+            calls.append(len(audios))
+            return [ASRResult(text=f" clip  {len(a)} ", language="en", segments=[], duration=len(a) / 16000) for a in audios]
+
+    wav = (AUDIO_SAMPLE_DIR / "recording.wav").read_bytes()
+    paths = []
+    for name in ("a.wav", "b.wav", "broken.wav", "c.wav"):
+        (tmp_path / name).write_bytes(b"not audio" if name == "broken.wav" else wav)
+        paths.append(tmp_path / name)
+
+    s = ASRService(backend=BatchBackend())
+    results = list(s.transcribe_many(paths, skip_errors=True))
+    assert [p.name for p, _ in results] == ["a.wav", "b.wav", "c.wav"]
+    assert calls == [3]
+    assert results[0][1].text.startswith("clip ")
+
+    with pytest.raises(AudioPreprocessingError):
+        list(s.transcribe_many(paths))
+
+class PidBackend:
+    """Replica stand-in: reports which process served the call."""
+
+    def transcribe_audio(self, audio, sample_rate=16000, **kw):
+        return ASRResult(text=str(os.getpid()), language="en", segments=[], duration=len(audio) / sample_rate)
+
+    def iter_segments(self, audio, sample_rate=16000, **kw):
+        for i in range(3):
+            yield ASRSegment(float(i), float(i + 1), f"seg{i}")
+
+    def transcribe_many(self, audios, **kw):
+        return [self.transcribe_audio(a) for a in audios]
+
+    def transcribe(self, path, **kw):
+        import time
+        time.sleep(60)  # a call still in flight when the replica dies
+
+def test_replica_pool_spreads_calls_across_processes():
+    from concurrent.futures import ThreadPoolExecutor
+    from asr.replicas import ASRReplicaPool
+
+    pool = ASRReplicaPool(2, dispatch="round_robin", backend_factory=PidBackend, start_timeout_s=120)
+    try:
+        s = ASRService(backend=pool)
+        audio = _tone(0.5, 0.3)  # audible, so the service's speech gate lets it through
+        with ThreadPoolExecutor(4) as threads:
+            pids = {r.text for r in threads.map(lambda _: pool.transcribe_audio(audio), range(8))}
+        assert len(pids) == 2 and str(os.getpid()) not in pids
+        assert [seg.text for seg in s.iter_segments(audio)] == ["seg0", "seg1", "seg2"]
+        assert len(pool.transcribe_many([audio] * 5)) == 5
+        assert sum(r["served"] for r in pool.stats) == 8 + 1 + 2
+
+        # A replica that dies gets no more work; with none left, calls fail instead of hanging
+        dead, alive = pool._replicas
+        dead.process.kill()
+        dead.process.join()
+        assert {pool.transcribe_audio(audio).text for _ in range(4)} == {str(alive.process.pid)}
+        with ThreadPoolExecutor(1) as threads:
+            in_flight = threads.submit(pool.transcribe, "x.wav")
+            while not alive.in_flight:
+                pass
+            alive.process.kill()
+            with pytest.raises(ASRModelError):
+                in_flight.result(timeout=10)
+        with pytest.raises(ASRModelError):
+            pool.transcribe_audio(audio)
+    finally:
+        pool.close()
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    # Stand-in for ffmpeg: swallow stdin, emit 160 float32 samples, fail on input "bad"
+    script = tmp_path / "ffmpeg"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "data = sys.stdin.buffer.read()\n"
+        "sys.exit(1) if data == b'bad' else sys.stdout.buffer.write(bytes(640))\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+def test_ffmpeg_pool_decodes_with_warm_processes(fake_ffmpeg):
+    pool = FFmpegDecoderPool(size=2, sample_rate=16000)
+    try:
+        pool.prewarm()
+        audio, timing = pool.decode_timed(b"encoded")
+        assert audio.dtype == np.float32 and len(audio) == 160
+        assert timing.samples == 160 and timing.decode_s > 0
+
+        async def burst():
+            return await asyncio.gather(*(pool.decode_async(b"x") for _ in range(5)))
+        assert all(len(a) == 160 for a, _ in asyncio.run(burst()))
+        assert len(pool.timings) == 6
+        assert pool._idle.qsize() <= pool.size
+
+        with pytest.raises(AudioPreprocessingError):
+            pool.decode(b"bad")
+
+        # Other rates spawn a fresh ffmpeg, but still wait for a slot
+        for _ in range(pool.size):
+            pool._slots.acquire()
+        started = threading.Event()
+        other = threading.Thread(target=lambda: (started.set(), pool.decode(b"x", sample_rate=8000)))
+        other.start()
+        started.wait()
+        other.join(0.3)
+        assert other.is_alive()
+        for _ in range(pool.size):
+            pool._slots.release()
+        other.join()
+    finally:
+        pool.close()
+
+    # Without prewarm, decodes spawn on demand and leave nothing idle behind
+    cold = FFmpegDecoderPool(size=2, sample_rate=16000)
+    try:
+        cold.decode(b"encoded")
+        assert cold._idle.qsize() == 0
+    finally:
+        cold.close()
+
+class ToneBackend:
+    """Fake Whisper: one segment per loud run, named after its amplitude (0.3 -> "w3")."""
+    def transcribe_audio(self, audio, sample_rate=16000, **kw):
+        vad = EnergyVAD(sample_rate)
+        speech = np.append(vad.speech_frames(audio), False)
+        segments, start = [], None
+        for i, on in enumerate(speech):
+            if on and start is None:
+                start = i
+            elif not on and start is not None:
+                a, b = start * vad.frame_len, i * vad.frame_len
+                amp = int(round(np.abs(audio[a:b]).max() * 10))
+                segments.append(ASRSegment(a / sample_rate, b / sample_rate, f"w{amp}"))
+                start = None
+        return ASRResult(" ".join(s.text for s in segments), None, segments, len(audio) / sample_rate)
+
+def _tone(seconds, amp, rate=16000):
+    return (amp * np.sin(2 * np.pi * 220 * np.arange(int(seconds * rate)) / rate)).astype(np.float32)
+
+def test_streaming_transcriber_emits_partials_then_finals():
+    audio = np.concatenate([_tone(0.5, 0), _tone(1.0, 0.3), _tone(0.4, 0), _tone(1.5, 0.5), _tone(1.0, 0)])
+    t = StreamingTranscriber(ToneBackend(), step_s=0.5, end_silence_s=0.7, stable_margin_s=0.3)
+    events = []
+    for i in range(0, len(audio), 4000):
+        events += t.feed(audio[i:i + 4000])
+
+    kinds = [e.type for e in events]
+    assert "partial" in kinds
+    assert kinds[-1] == "end_of_speech"
+    finals = [e.segment for e in events if e.type == "final"]
+    assert [f.text for f in finals] == ["w3", "w5"]
+    # stream-global timestamps, despite the window being trimmed as segments commit
+    assert abs(finals[0].start - 0.5) < 0.05 and abs(finals[1].start - 1.9) < 0.05
+    assert events[-1].text == "w3 w5"
+
+def test_streaming_resampler_matches_one_shot_polyphase():
+    from scipy.signal import resample_poly
+    rng = np.random.default_rng(0)
+    audio = rng.standard_normal(44100).astype(np.float32) * 0.1
+    whole = resample(audio, 44100, 16000)
+    assert len(whole) == 16000
+    assert np.allclose(whole, resample_poly(audio, 160, 441), atol=1e-5)
+
+    r = StreamingResampler(44100, 16000)
+    parts, i = [], 0
+    while i < len(audio):
+        n = int(rng.integers(1, 2000))
+        parts.append(r.process(audio[i:i + n]))
+        i += n
+    parts.append(r.flush())
+    assert np.allclose(np.concatenate(parts), whole, atol=1e-5)
+
+def test_long_audio_is_split_at_pauses_and_stitched_in_order():
+    import threading, time
+
+    class SlowToneBackend(ToneBackend):
+        threads = set()
+
+        def transcribe_audio(self, audio, sample_rate=16000, **kw):
+            self.threads.add(threading.current_thread().name)
+            time.sleep(0.05)
+            return super().transcribe_audio(audio, sample_rate, **kw)
+
+    parts = []
+    for i in range(8):
+        parts += [_tone(1.5, 0.1 * (i % 5 + 1)), _tone(0.6, 0)]
+    audio = np.concatenate(parts)
+    expected = ToneBackend().transcribe_audio(audio).segments
+
+    backend = SlowToneBackend()
+    r = transcribe_long(backend, audio, workers=4, chunk_s=3.0, max_s=4.5)
+    assert len(split_at_silences(audio, chunk_s=3.0, max_s=4.5)) > 3
+    assert len(backend.threads) > 1
+    assert [s.text for s in r.segments] == [s.text for s in expected]
+    assert all(abs(a.start - b.start) < 0.05 for a, b in zip(r.segments, expected))
+    assert r.duration == len(audio) / 16000
+
+    # no pause to cut at: chunks overlap and the repeated words are kept once
+    chunks = split_at_silences(_tone(10.0, 0.3), chunk_s=3.0, max_s=4.5)
+    assert all(a.end > b.start for a, b in zip(chunks, chunks[1:]))
+    r = transcribe_long(ToneBackend(), _tone(10.0, 0.3), workers=4, chunk_s=3.0, max_s=4.5)
+    assert [s.text for s in r.segments] == ["w3"]
+
+def test_asr_batcher_groups_concurrent_clips_by_language():
+    from concurrent.futures import ThreadPoolExecutor
+
+    class BatchBackend:
+        calls = []
+        detections = []
+
+        def detect_languages(self, audios):
+            self.detections.append(len(audios))
+            return ["fr" if a[0] < 0 else "en" for a in audios]
+
+        def transcribe_many(self, audios, *, language=None, prompt=None):
+            self.calls.append((language, len(audios)))
+            return [ASRResult(f"{language}:{len(a)}", language, [ASRSegment(0.0, 0.1, f"{language}:{len(a)}")], len(a) / 16000) for a in audios]
+
+    backend = BatchBackend()
+    batcher = ASRBatcher(backend, max_batch_size=8, max_wait_ms=200)
+    try:
+        clips = [np.full(1600 * (i + 1), -0.1 if i % 2 else 0.1, dtype=np.float32) for i in range(6)]
+        with ThreadPoolExecutor(6) as threads:
+            results = list(threads.map(batcher.transcribe_audio, clips))
+        # every caller gets its own result, in one pass per language
+        assert [r.text for r in results] == [f"{'fr' if i % 2 else 'en'}:{1600 * (i + 1)}" for i in range(6)]
+        assert sorted(backend.calls) == [("en", 3), ("fr", 3)]
+        assert backend.detections == [6]  # languages detected as one batch, not per clip
+        assert batcher.stats["mean_batch_size"] == 3
+        assert [s.text for s in batcher.iter_segments(clips[0])] == ["en:1600"]
+    finally:
+        batcher.close()
+
+def test_transcribe_many_decodes_each_detected_language_separately(monkeypatch):
+    from asr.config import config
+    from asr.faster_whisper_backend import FasterWhisperBackend
+
+    monkeypatch.setattr(config, "language", None)
+    backend = object.__new__(FasterWhisperBackend)  # no model: detection and decoding are stubbed
+    passes = []
+    backend.detect_languages = lambda audios: ["fr" if a[0] < 0 else "en" for a in audios]
+
+    def transcribe_batch(audios, language, prompt, batch_size):
+        passes.append((language, len(audios)))
+        return [ASRResult(f"{language}:{len(a)}", language, [], len(a) / 16000) for a in audios]
+    backend._transcribe_batch = transcribe_batch
+
+    clips = [np.full(160 * (i + 1), -0.1 if i % 2 else 0.1, dtype=np.float32) for i in range(4)] + [np.zeros(0, dtype=np.float32)]
+    results = backend.transcribe_many(clips)
+    assert [r.text for r in results] == ["en:160", "fr:320", "en:480", "fr:640", "None:0"]
+    assert sorted(passes, key=str) == [("en", 2), ("fr", 2), (None, 1)]
@@ -7,10 +7,12 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 import builtins
 
+from llm.batching import LLMBatcher
+from llm.continuous import ContinuousBatcher
 from llm.config import LLMConfig
 from llm.service import LLMService
 from llm.types import LLMRequest, LLMResponse
@@ -47,6 +49,44 @@ class DummyModel:
         return [[1, 2, 3, 4]]
 
 
+class CharTokenizer:
+    """Reversible one-token-per-character tokenizer for running tiny real models."""
+
+    eos_token_id = 0
+    eos_token = "\x00"
+    pad_token = "\x00"
+
+    def __call__(self, text, return_tensors: str | None = None, **kwargs) -> dict:
+        import torch
+
+        ids = torch.tensor([[ord(c) % 128 for c in text]])
+        return {"input_ids": ids, "attention_mask": torch.ones_like(ids)}
+
+    def decode(self, token_ids, skip_special_tokens: bool = True, **kwargs) -> str:
+        return "".join(chr(int(t)) for t in token_ids if not (skip_special_tokens and int(t) == 0))
+
+
+def tiny_qwen():
+    """A randomly initialised two-layer Qwen2 model; skips the test without torch/transformers."""
+    import pytest
+
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+
+    torch.manual_seed(0)
+    cfg = transformers.Qwen2Config(
+        vocab_size=128,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        eos_token_id=0,
+        pad_token_id=0,
+    )
+    return CharTokenizer(), transformers.Qwen2ForCausalLM(cfg).eval()
+
+
 def test_generate_returns_llmresponse_with_text() -> None:
     config = LLMConfig()
     tokenizer = DummyTokenizer()
@@ -75,6 +115,503 @@ def test_generate_uses_overrides_for_parameters() -> None:
     assert model.generate_called_with["temperature"] == 0.5
 
 
+def test_generate_slices_new_token_ids_and_uses_chat_template() -> None:
+    import pytest
+
+    torch = pytest.importorskip("torch")
+
+    class TemplateTokenizer(DummyTokenizer):
+        chat_template = "{{ messages }}"
+
+        def __call__(self, text: str, return_tensors: str | None = None) -> dict:
+            self.last_input = text
+            return {"input_ids": torch.tensor([[1, 2, 3]])}
+
+        def convert_tokens_to_ids(self, token: str):
+            return {"<|im_end|>": 5}.get(token)
+
+        def apply_chat_template(self, messages, tokenize=False, add_generation_prompt=False):
+            assert add_generation_prompt and not tokenize
+            return "|".join(f"{m['role']}:{m['content']}" for m in messages) + "|assistant:"
+
+        def decode(self, token_ids, skip_special_tokens: bool = True, **kwargs) -> str:
+            # Does not round-trip the prompt, so only slicing by ids keeps it out of the reply
+            return "".join(f"w{int(t)} " for t in token_ids)
+
+    class TemplateModel(DummyModel):
+        def generate(self, **kwargs):
+            self.generate_called_with = kwargs
+            return torch.tensor([[1, 2, 3, 7, 8]])
+
+    tokenizer, model = TemplateTokenizer(), TemplateModel()
+    service = LLMService(config=LLMConfig(prefix_cache_mb=0), model=model, tokenizer=tokenizer)
+
+    assert service.generate(LLMRequest(text="hi", prompt_key="chat")).text == "w7 w8"
+    assert tokenizer.last_input.startswith("system:") and tokenizer.last_input.endswith("user:hi|assistant:")
+    assert 5 in model.generate_called_with["eos_token_id"]
+
+
+def test_multi_token_stop_sequence_ends_generation_and_is_cut() -> None:
+    tokenizer, model = tiny_qwen()
+    config = LLMConfig(response_cache_entries=0, prefix_cache_mb=0, max_new_tokens=16, temperature=0, stop_sequences=())
+    request = LLMRequest(text="the cat sat")
+    full = LLMService(config=config, model=model, tokenizer=tokenizer).generate(request).text
+    stop = full[3:5]
+
+    service = LLMService(config=replace(config, stop_sequences=(stop,)), model=model, tokenizer=tokenizer)
+    expected = full[:full.index(stop)].strip()
+    assert service.generate(request).text == expected
+    assert "".join(service.stream(request)).strip() == expected
+
+    # The continuous batcher frees the row at the stop sequence instead of decoding on
+    steps = []
+    for svc in (LLMService(config=config, model=model, tokenizer=tokenizer), service):
+        batcher = ContinuousBatcher(svc, max_batch_size=2)
+        try:
+            text = batcher.generate(request).text
+            steps.append(batcher.stats["steps"])
+        finally:
+            batcher.close()
+    assert text == expected
+    assert steps[1] < steps[0]
+
+
+def test_stream_yields_only_generated_text() -> None:
+    import pytest
+
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+
+    class StreamTokenizer(DummyTokenizer):
+        def __call__(self, text: str, return_tensors: str | None = None) -> dict:
+            self.last_input = text
+            return {"input_ids": torch.tensor([[1, 2, 3]])}
+
+        def decode(self, token_ids, skip_special_tokens: bool = True, **kwargs) -> str:
+            return "".join(f"w{int(t)} " for t in token_ids)
+
+    class StreamModel(DummyModel):
+        def generate(self, **kwargs):
+            self.generate_called_with = kwargs
+            streamer = kwargs["streamer"]
+            streamer.put(kwargs["input_ids"])
+            for token in (7, 8, 9):
+                streamer.put(torch.tensor([token]))
+            streamer.end()
+
+    model = StreamModel()
+    service = LLMService(config=LLMConfig(), model=model, tokenizer=StreamTokenizer())
+
+    pieces = list(service.stream(LLMRequest(text="Hello", max_new_tokens=3)))
+
+    assert "".join(pieces) == "w7 w8 w9 "
+    assert model.generate_called_with["max_new_tokens"] == 3
+
+
+def test_generate_batch_slices_new_tokens_per_request() -> None:
+    import pytest
+
+    torch = pytest.importorskip("torch")
+
+    class BatchTokenizer(DummyTokenizer):
+        pad_token = "<pad>"
+
+        def __call__(self, text, return_tensors=None, padding=False) -> dict:
+            self.last_input = text
+            rows = len(text) if isinstance(text, list) else 1
+            return {"input_ids": torch.zeros((rows, 3), dtype=torch.long)}
+
+        def decode(self, token_ids, skip_special_tokens: bool = True) -> str:
+            return " ".join(str(int(t)) for t in token_ids)
+
+    class BatchModel(DummyModel):
+        def generate(self, **kwargs):
+            self.generate_called_with = kwargs
+            rows = kwargs["input_ids"].shape[0]
+            new = torch.arange(1, kwargs["max_new_tokens"] + 1).repeat(rows, 1)
+            return torch.cat([kwargs["input_ids"], new], dim=1)
+
+    tokenizer = BatchTokenizer()
+    model = BatchModel()
+    service = LLMService(config=LLMConfig(), model=model, tokenizer=tokenizer)
+    assert tokenizer.padding_side == "left"  # set once at construction, not per batch
+
+    responses = service.generate_batch([LLMRequest(text="a", max_new_tokens=2), LLMRequest(text="b", max_new_tokens=4)])
+
+    assert [r.text for r in responses] == ["1 2", "1 2 3 4"]
+    assert model.generate_called_with["max_new_tokens"] == 4
+    assert tokenizer.padding_side == "left"
+    assert len(tokenizer.last_input) == 2
+
+
+def test_batcher_merges_concurrent_requests() -> None:
+    import threading
+
+    class RecordingService:
+        def __init__(self) -> None:
+            self.batches: list[list[str]] = []
+
+        def cached_response(self, request):
+            return None
+
+        def cache_response(self, request, response):
+            pass
+
+        def generate_batch(self, requests):
+            self.batches.append([r.text for r in requests])
+            return [LLMResponse(text=r.text.upper()) for r in requests]
+
+        def _generate(self, request):
+            self.singles.append(request.text)
+            return LLMResponse(text=request.text.upper())
+
+    service = RecordingService()
+    service.singles = []
+    batcher = LLMBatcher(service, max_batch_size=4, max_wait_ms=200)
+    results: dict[str, str] = {}
+
+    def call(text: str, temperature: float | None) -> None:
+        results[text] = batcher.generate(LLMRequest(text=text, temperature=temperature)).text
+
+    threads = [threading.Thread(target=call, args=(t, temp)) for t, temp in [("a", None), ("b", None), ("c", 0.9)]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert results == {"a": "A", "b": "B", "c": "C"}
+    # a and b share sampling params and run together; c is sampled differently and runs alone
+    assert [sorted(b) for b in service.batches] == [["a", "b"]]
+    assert service.singles == ["c"]
+    assert batcher.stats["requests"] == 3
+
+
+def test_continuous_batcher_matches_single_request_greedy_output() -> None:
+    import threading
+
+    tokenizer, model = tiny_qwen()
+    service = LLMService(config=LLMConfig(response_cache_entries=0), model=model, tokenizer=tokenizer)
+    requests = [
+        LLMRequest(text="hi", max_new_tokens=4, temperature=0),
+        LLMRequest(text="a noticeably longer prompt", max_new_tokens=12, temperature=0),
+        LLMRequest(text="mid length", max_new_tokens=7, temperature=0),
+    ]
+    expected = [service.generate(r).text for r in requests]
+
+    batcher = ContinuousBatcher(service, max_batch_size=2)
+    results: dict[int, str] = {}
+
+    def call(i: int) -> None:
+        results[i] = batcher.generate(requests[i]).text
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(requests))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert [results[i] for i in range(len(requests))] == expected
+    assert batcher.active == 0
+    assert batcher.stats["steps"] > 0
+
+
+def test_prefix_cache_reuses_template_prefill_without_changing_output() -> None:
+    tokenizer, model = tiny_qwen()
+    cached = LLMService(config=LLMConfig(), model=model, tokenizer=tokenizer)
+    uncached = LLMService(config=LLMConfig(prefix_cache_mb=0), model=model, tokenizer=tokenizer)
+    requests = [
+        LLMRequest(text=text, max_new_tokens=8, temperature=0, prompt_key=key)
+        for text in ("hello", "what time is it")
+        for key in (None, "summarize")
+    ]
+
+    assert [cached.generate(r).text for r in requests] == [uncached.generate(r).text for r in requests]
+    assert cached.prefix_cache.misses == 2
+    assert cached.prefix_cache.hits == 2
+    assert uncached.prefix_cache is None
+
+
+def test_pipelined_generation_prefills_ahead_and_matches_generate() -> None:
+    from llm.pipeline import run_pipelined
+
+    tokenizer, model = tiny_qwen()
+    service = LLMService(config=LLMConfig(response_cache_entries=0), model=model, tokenizer=tokenizer)
+    request = LLMRequest(text="", max_new_tokens=8, temperature=0)
+    segments = [type("S", (), {"text": t}) for t in ("turn on", " the lights ", "in the kitchen")]
+
+    collected, response = run_pipelined(iter(segments), service, request)
+
+    expected = service.generate(LLMRequest(text="turn on the lights in the kitchen", max_new_tokens=8, temperature=0))
+    assert collected == segments
+    assert response == expected
+
+    prompt = service.incremental(request)
+    prompt.extend("turn on")
+    first = prompt.prefilled_tokens
+    prompt.extend("turn on the lights")
+    assert prompt.prefilled_tokens - first == len(" the lights")
+    assert run_pipelined(iter([]), service) == ([], None)
+
+
+def test_speculative_decoding_matches_plain_greedy_output() -> None:
+    tokenizer, model = tiny_qwen()
+    config = LLMConfig(response_cache_entries=0, max_new_tokens=24, temperature=0)
+    plain = LLMService(config=config, model=model, tokenizer=tokenizer)
+    lookup = LLMService(config=replace(config, speculative="prompt_lookup"), model=model, tokenizer=tokenizer)
+    # The target doubling as its own draft should agree with nearly every guess
+    draft = LLMService(
+        config=replace(config, speculative="draft", speculative_prompt_keys=()),
+        model=model,
+        tokenizer=tokenizer,
+        draft_model=model,
+    )
+    request = LLMRequest(text="the cat sat on the mat, the cat sat", prompt_key="summarize")
+
+    expected = plain.generate(request).text
+    assert lookup.generate(request).text == expected
+    assert draft.generate(request).text == expected
+    assert draft.generate(replace(request, prompt_key=None)).text == plain.generate(replace(request, prompt_key=None)).text
+
+    assert lookup.speculative_stats["requests"] == 1 and lookup.speculative_stats["proposed"] > 0
+    assert draft.speculative_stats["acceptance_rate"] > 0.9
+    # Templates outside speculative_prompt_keys decode normally
+    lookup.generate(replace(request, prompt_key="default"))
+    assert lookup.speculative_stats["requests"] == 1
+
+
+def test_speculative_verification_accepts_correct_guesses_in_one_pass() -> None:
+    from llm.speculative import PromptLookup, speculative_generate
+
+    assert PromptLookup(num_tokens=3).propose([1, 2, 3, 9, 1, 2]) == [3, 9, 1]
+    assert PromptLookup().propose([1, 2, 3]) == []
+
+    tokenizer, model = tiny_qwen()
+    prompt = [int(t) for t in tokenizer("the cat sat")["input_ids"][0]]
+    expected, _ = speculative_generate(model, prompt, PromptLookup(num_tokens=0), max_new_tokens=8, temperature=0)
+
+    class Oracle:
+        def propose(self, context):
+            return expected[len(context) - len(prompt):]
+
+    tokens, stats = speculative_generate(model, prompt, Oracle(), max_new_tokens=8, temperature=0)
+    assert tokens == expected
+    assert stats.steps == 1 and stats.accepted == len(expected) - 1
+
+
+def test_prefix_cache_evicts_least_recently_used_within_budget() -> None:
+    from llm.prefix_cache import PrefixCache
+
+    tokenizer, model = tiny_qwen()
+    one = PrefixCache(model, tokenizer, max_bytes=1 << 30).get("You are a concise assistant.").nbytes
+    cache = PrefixCache(model, tokenizer, max_bytes=2 * one)
+
+    for prefix in ("You are a concise assistant.", "You are a helpful assistant.", "You are a concise assistant."):
+        cache.get(prefix)
+    cache.get("You are a careful assistant.")
+
+    assert len(cache) == 2
+    assert cache.nbytes <= 2 * one
+    cache.get("You are a concise assistant.")
+    assert cache.hits == 2
+
+
+def test_greedy_responses_are_cached_and_sampled_ones_are_not(tmp_path) -> None:
+    tokenizer = DummyTokenizer()
+    model = DummyModel()
+    config = LLMConfig(response_cache_entries=1, response_cache_path=tmp_path / "responses.sqlite")
+    service = LLMService(config=config, model=model, tokenizer=tokenizer)
+
+    greedy = LLMRequest(text="Hello", temperature=0)
+    assert service.generate(greedy).text == "dummy_response"
+    model.generate_called_with = None
+    assert service.generate(greedy).text == "dummy_response"
+    assert model.generate_called_with is None
+
+    # A different request pushes "Hello" out of memory; the disk tier still has it
+    service.generate(LLMRequest(text="Other", temperature=0))
+    model.generate_called_with = None
+    service.generate(greedy)
+    assert model.generate_called_with is None
+    assert service.response_cache.stats["disk_hits"] == 1
+
+    service.generate(LLMRequest(text="Hello", temperature=0.7))
+    assert model.generate_called_with is not None
+    assert service.response_cache.stats["memory_hits"] == 1
+
+
+def test_response_cache_is_off_by_default_and_keyed_on_output_settings() -> None:
+    tokenizer = DummyTokenizer()
+    assert LLMService(model=DummyModel(), tokenizer=tokenizer).response_cache is None
+
+    request = LLMRequest(text="Hello", temperature=0)
+    keys = {
+        LLMService(config=LLMConfig(response_cache_entries=1, **overrides), model=DummyModel(), tokenizer=tokenizer)._response_key(request)
+        for overrides in ({}, {"cpu_quantization": "dynamic_int8"}, {"compile": True}, {"stop_sequences": ()})
+    }
+    assert len(keys) == 4
+    same = LLMService(config=LLMConfig(response_cache_entries=1, max_batch_size=4), model=DummyModel(), tokenizer=tokenizer)
+    assert same._response_key(request) in keys
+
+
+def test_chat_session_prefills_only_the_new_turn() -> None:
+    from llm.sessions import SessionStore
+
+    tokenizer, model = tiny_qwen()
+    prefilled: list[int] = []
+    forward = model.forward
+
+    def counting_forward(*args, **kwargs):
+        prefilled.append(kwargs["input_ids"].shape[-1])
+        return forward(*args, **kwargs)
+
+    model.forward = counting_forward
+    service = LLMService(config=LLMConfig(), model=model, tokenizer=tokenizer)
+    session = SessionStore().get("s")
+
+    service.chat(LLMRequest(text="first question", max_new_tokens=3, temperature=0), session)
+    first_prefill = prefilled[0]
+    cached = len(session.token_ids)
+    prefilled.clear()
+    service.chat(LLMRequest(text="and a follow-up", max_new_tokens=3, temperature=0), session)
+
+    # pending token + end-of-turn + new user block, not the whole history again
+    assert prefilled[0] < first_prefill
+    assert len(session.token_ids) == cached + sum(prefilled)
+    assert [u for u, _ in session.turns] == ["first question", "and a follow-up"]
+
+
+def test_session_store_expires_and_evicts(monkeypatch) -> None:
+    import llm.sessions as sessions
+
+    now = [100.0]
+    monkeypatch.setattr(sessions.time, "monotonic", lambda: now[0])
+    store = sessions.SessionStore(max_sessions=2, ttl_s=10)
+
+    a = store.get("a")
+    assert store.get("a") is a
+    store.get("b")
+    store.get("c")  # evicts "a", the least recently used
+    assert "a" not in store and len(store) == 2
+
+    now[0] += 11
+    fresh = store.get()
+    assert len(store) == 1 and fresh.session_id in store
+
+
+def _save_tiny_model(tmp_path):
+    """Write `tiny_qwen()` and a char-level fast tokenizer to a directory the loader accepts."""
+    import pytest
+
+    _, model = tiny_qwen()
+    tokenizers = pytest.importorskip("tokenizers")
+    from transformers import PreTrainedTokenizerFast
+
+    # Qwen2Tokenizer (which converters load the directory as) appends <|endoftext|> if missing
+    vocab = {chr(i): i for i in range(127)}
+    vocab["<|endoftext|>"] = 127
+    backend = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="\x00"))
+    backend.pre_tokenizer = tokenizers.pre_tokenizers.Split("", "isolated")
+    model_dir = tmp_path / "model"
+    model.save_pretrained(model_dir)
+    PreTrainedTokenizerFast(tokenizer_object=backend, eos_token="\x00").save_pretrained(model_dir)
+    return model_dir
+
+
+def test_load_cache_memory_maps_converted_weights(tmp_path) -> None:
+    import torch
+    from llm.model_loader import QwenModelLoader
+
+    model_dir = _save_tiny_model(tmp_path)
+    ids = torch.tensor([[72, 105, 33]])
+    loads = []
+    for _ in range(2):
+        loader = QwenModelLoader(model_dir, device="cpu", load_in_4bit=False, load_cache_dir=tmp_path / "cache")
+        _, loaded = loader.load()
+        loads.append((loader.timings, loaded(ids).logits.detach()))
+
+    (first, first_logits), (second, second_logits) = loads
+    assert "from_pretrained_s" in first and "cache_write_s" in first
+    assert "mmap_s" in second and "from_pretrained_s" not in second
+    assert torch.allclose(first_logits, second_logits)
+
+
+def test_params_on_meta_leaves_other_threads_and_torch_untouched() -> None:
+    import threading
+    import torch
+    from llm.load_cache import params_on_meta
+
+    original = torch.nn.Module.register_parameter
+    built = {}
+    with params_on_meta():
+        built["here"] = torch.nn.Linear(2, 2)
+        worker = threading.Thread(target=lambda: built.setdefault("other", torch.nn.Linear(2, 2)))
+        worker.start()
+        worker.join()
+    assert built["here"].weight.is_meta
+    assert not built["other"].weight.is_meta
+    assert torch.nn.Module.register_parameter is original
+
+
+def test_cpu_int8_quantization_reports_parity_with_unoptimized_model(tmp_path) -> None:
+    import torch
+    from llm.model_loader import QwenModelLoader
+
+    model_dir = _save_tiny_model(tmp_path)
+    loader = QwenModelLoader(
+        model_dir, device="cpu", load_in_4bit=False, cpu_quantization="dynamic_int8", parity_check=True
+    )
+    tokenizer, model = loader.load()
+
+    assert not any(isinstance(m, torch.nn.Linear) for m in model.modules())
+    assert "quantize_s" in loader.timings
+    assert loader.parity is not None
+    # Random tiny weights give near-tied logits, so bound the drift rather than exact agreement
+    assert loader.parity.max_abs_logit_diff < 0.1
+    assert loader.parity.top1_agreement >= 0.75
+
+    service = LLMService(config=LLMConfig(max_new_tokens=4, temperature=0.0), model=model, tokenizer=tokenizer)
+    assert isinstance(service.generate(LLMRequest(text="hi", max_new_tokens=4, temperature=0.0)), LLMResponse)
+    assert service.nbytes > 0
+
+
+def test_ctranslate2_engine_matches_transformers_greedy_output(tmp_path) -> None:
+    import pytest
+    import torch
+    from llm.model_loader import QwenModelLoader
+    from llm.sessions import ChatSession
+
+    pytest.importorskip("ctranslate2")
+    model_dir = _save_tiny_model(tmp_path)
+    config = LLMConfig(
+        model_dir=model_dir,
+        device="cpu",
+        max_new_tokens=6,
+        temperature=0.0,
+        response_cache_entries=0,
+        engine="ctranslate2",
+        engine_compute_type="float32",
+    )
+    tokenizer, model = QwenModelLoader(model_dir, device="cpu", load_in_4bit=False).load()
+    engine = LLMService(config=config)
+
+    assert engine.model is None and engine.backend is not None
+    assert (tmp_path / "model-ctranslate2-float32" / "model.bin").exists()
+    request = LLMRequest(text="Hi", prompt_key="summarize")
+    ids = engine._token_ids(engine._build_prompt(request))
+    out = model.generate(torch.tensor([ids]), max_new_tokens=6, do_sample=False, pad_token_id=0)
+    expected = tokenizer.decode(out[0, len(ids):], skip_special_tokens=True).strip()
+    assert engine.generate(request).text == expected
+    assert "".join(engine.stream(request)) == expected
+    assert [r.text for r in engine.generate_batch([request, request])] == [expected, expected]
+
+    session = ChatSession("s")
+    engine.chat(LLMRequest(text="one"), session)
+    engine.chat(LLMRequest(text="two"), session)
+    assert [user for user, _ in session.turns] == ["one", "two"] and not session.kv
+
+
 def test_llm_runtime_with_real_model() -> None:
     """Runtime test that loads the actual model and generates a response.
     
@@ -11,15 +11,16 @@ sys.path.insert(0, str(PROJECT_ROOT))
 import argparse
 import logging
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
 
 from asr.config import ASRConfig
 from asr.service import ASRService
 from asr.types import ASRResult
 
 from llm.config import LLMConfig
+from llm.pipeline import run_pipelined
 from llm.service import LLMService
-from llm.types import LLMRequest  
+from llm.types import LLMRequest, LLMResponse
 
 
 logger = logging.getLogger(__name__)
@@ -47,7 +48,8 @@ def run_pipeline(
     asr_service: ASRService,
     llm_service: LLMService,
     max_duration_s: float = 30.0,
-) -> Tuple[ASRResult, str]:
+    pipelined: bool = True,
+) -> Tuple[ASRResult, Optional[LLMResponse]]:
     """
     Run the end-to-end pipeline:
     audio file -> ASR transcription -> LLM response.
@@ -62,11 +64,17 @@ def run_pipeline(
         An initialized LLMService instance.
     max_duration_s:
         Expected maximum audio duration in seconds. Used for logging only.
+    pipelined:
+        Start LLM prefill on the first transcript segments while the rest are
+        still being decoded, instead of waiting for the full transcript.
 
     Returns
     -------
-    (asr_result, llm_output)
+    (asr_result, llm_output); llm_output is None when no speech was transcribed.
     """
+    if pipelined:
+        return _run_pipelined(audio_path, asr_service, llm_service, max_duration_s)
+
     logger.info("Starting ASR transcription for %s", audio_path)
     asr_result = asr_service.transcribe_file(audio_path)
 
@@ -80,6 +88,8 @@ def run_pipeline(
         )
 
     logger.debug("Transcribed text: %s", asr_result.text)
+    if not asr_result.text.strip():
+        return asr_result, None
 
     logger.info("Sending transcription to LLM.")
     llm_output = llm_service.generate(LLMRequest(text=asr_result.text))
@@ -88,6 +98,34 @@ def run_pipeline(
     return asr_result, llm_output
 
 
+def _run_pipelined(
+    audio_path: Path,
+    asr_service: ASRService,
+    llm_service: LLMService,
+    max_duration_s: float,
+) -> Tuple[ASRResult, Optional[LLMResponse]]:
+    logger.info("Starting pipelined ASR + LLM for %s", audio_path)
+    audio = asr_service.decode(Path(audio_path).read_bytes())
+    duration = len(audio) / asr_service.sample_rate
+    if duration > max_duration_s:
+        logger.warning(
+            "Audio duration (%.2fs) exceeds recommended max_duration_s=%.2fs.",
+            duration,
+            max_duration_s,
+        )
+
+    segments, llm_output = run_pipelined(asr_service.iter_segments(audio), llm_service)
+    asr_result = ASRResult(
+        text=" ".join(s.text for s in segments),
+        language=None,
+        segments=segments,
+        duration=duration,
+    )
+    logger.debug("Transcribed text: %s", asr_result.text)
+    logger.info("LLM generation completed.")
+    return asr_result, llm_output
+
+
 def build_arg_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description=(
@@ -99,7 +137,9 @@ def build_arg_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "audio_file",
         type=Path,
-        help="Path to an audio file (recommended <= 30 seconds).",
+        nargs="?",
+        default=Path("audiosample/recording.wav"),
+        help="Path to an audio file (recommended <= 30 seconds; default: audiosample/recording.wav).",
     )
     parser.add_argument(
         "--max-duration",
@@ -107,23 +147,28 @@ def build_arg_parser() -> argparse.ArgumentParser:
         default=30.0,
         help="Maximum expected audio duration in seconds (for logging only).",
     )
+    parser.add_argument(
+        "--no-pipeline",
+        dest="pipelined",
+        action="store_false",
+        help="Wait for the full transcript before starting the LLM.",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
         action="count",
-        default=0,
-        help="Increase log verbosity (-v for INFO, -vv for DEBUG).",
+        default=1,
+        help="Increase log verbosity (INFO by default, -vv for DEBUG).",
     )
 
     return parser
 
 
 def main() -> None:
-    audio_path = Path("audiosample/recording.wav")
-    max_duration = 30.0
-    verbosity = 1  # INFO level logging
+    args = build_arg_parser().parse_args()
+    audio_path = args.audio_file
 
-    setup_logging(verbosity)
+    setup_logging(args.verbose)
 
     if not audio_path.is_file():
         print(f"Audio file does not exist: {audio_path}")
@@ -140,13 +185,14 @@ def main() -> None:
         audio_path=audio_path,
         asr_service=asr_service,
         llm_service=llm_service,
-        max_duration_s=max_duration,
+        max_duration_s=args.max_duration,
+        pipelined=args.pipelined,
     )
 
     print("=== Transcription ===")
     print(asr_result.text)
     print("\n=== LLM Response ===")
-    print(llm_output)
+    print(llm_output.text if llm_output is not None else "No speech detected; nothing was sent to the LLM.")
 
 
 if __name__ == "__main__":
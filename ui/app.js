@@ -3,6 +3,15 @@
 // ===========================
 const TEXT_ENDPOINT = "http://localhost:8000/api/llm";       // POST JSON { message: string }
 const AUDIO_ENDPOINT = "http://localhost:8000/api/asr-llm";  // POST FormData { audio: file }
+const STREAM_ENDPOINT = "http://localhost:8000/api/llm/stream"; // POST JSON { message: string } -> text/event-stream
+const ASR_STREAM_ENDPOINT = "ws://localhost:8000/api/asr/stream"; // WebSocket: int16 PCM frames in, transcript events out
+const USE_STREAMING_ASR = true; // false -> record the whole clip and upload to AUDIO_ENDPOINT
+const STREAM_SAMPLE_RATE = 16000;
+
+// One conversation per page load; the server keeps its context in memory until it expires.
+const SESSION_ID =
+  (window.crypto && window.crypto.randomUUID && window.crypto.randomUUID()) ||
+  `s-${Date.now()}-${Math.random().toString(16).slice(2)}`;
 
 // Expect responses roughly like:
 //   { text: "LLM reply", timestamp: "2025-12-05T..." }
@@ -36,10 +45,47 @@ function extractTextAndTimestamp(responseJson) {
   return { text, timestamp: ts };
 }
 
+// Split buffered server-sent-event text into complete events.
+// Returns { events: [{ event, data }], rest } where `rest` is an incomplete trailing chunk.
+function parseSSE(buffer) {
+  const events = [];
+  const blocks = buffer.split("\n\n");
+  const rest = blocks.pop();
+  for (const block of blocks) {
+    let event = "message";
+    const dataLines = [];
+    for (const line of block.split("\n")) {
+      if (line.startsWith("event:")) event = line.slice(6).trim();
+      else if (line.startsWith("data:")) dataLines.push(line.slice(5).trim());
+    }
+    if (!dataLines.length) continue;
+    let data;
+    try {
+      data = JSON.parse(dataLines.join("\n"));
+    } catch (e) {
+      data = { text: dataLines.join("\n") };
+    }
+    events.push({ event, data });
+  }
+  return { events, rest };
+}
+
+// Convert Web Audio float samples [-1, 1] to little-endian 16-bit PCM for the streaming ASR socket.
+function floatTo16BitPCM(samples) {
+  const out = new Int16Array(samples.length);
+  for (let i = 0; i < samples.length; i++) {
+    const s = Math.max(-1, Math.min(1, samples[i]));
+    out[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+  }
+  return out;
+}
+
 // Make helpers accessible to tests (without bundler)
 window.__LLM_UI__ = {
   formatTimestamp,
   extractTextAndTimestamp,
+  parseSSE,
+  floatTo16BitPCM,
 };
 
 // ===========================
@@ -56,6 +102,7 @@ const errorBox = document.getElementById("error-box");
 let mediaRecorder = null;
 let audioChunks = [];
 let isRecording = false;
+let liveStream = null; // { ws, ctx, source, processor, mic } while streaming ASR is active
 
 // Append a message bubble to the chat
 function appendMessage(role, text, ts) {
@@ -114,29 +161,48 @@ async function handleTextSubmit(event) {
   textInput.disabled = true;
 
   try {
-    const res = await fetch(TEXT_ENDPOINT, {
+    const res = await fetch(STREAM_ENDPOINT, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify({ message }),
+      body: JSON.stringify({ message, session_id: SESSION_ID }),
     });
 
-    if (!res.ok) {
+    if (!res.ok || !res.body) {
       throw new Error(`Text API error: ${res.status} ${res.statusText}`);
     }
 
-    const data = await res.json();
-    const { text, timestamp } = extractTextAndTimestamp(data);
-    if (placeholder) {
-      const body = placeholder.querySelector(".message-text");
-      if (body) body.textContent = text || "[empty response]";
-      const timeSpan = placeholder.querySelector(".message-timestamp");
-      if (timeSpan) timeSpan.textContent = formatTimestamp(timestamp || new Date());
-      placeholder = null;
-    } else {
-      appendMessage("assistant", text || "[empty response]", timestamp);
+    // Render tokens into the placeholder as they arrive
+    const body = placeholder.querySelector(".message-text");
+    const timeSpan = placeholder.querySelector(".message-timestamp");
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let text = "";
+    let done = false;
+
+    while (!done) {
+      const chunk = await reader.read();
+      done = chunk.done;
+      buffer += decoder.decode(chunk.value || new Uint8Array(), { stream: !done });
+      const parsed = parseSSE(done ? buffer + "\n\n" : buffer);
+      buffer = parsed.rest;
+      for (const { event, data } of parsed.events) {
+        if (event === "token") {
+          text += data.text || "";
+          if (body) body.textContent = text;
+          chatContainer.scrollTop = chatContainer.scrollHeight;
+        } else if (event === "done") {
+          if (timeSpan) timeSpan.textContent = formatTimestamp(data.timestamp || new Date());
+        } else if (event === "error") {
+          throw new Error(data.detail || "stream failed");
+        }
+      }
     }
+
+    if (body && !text) body.textContent = "[empty response]";
+    placeholder = null;
   } catch (err) {
     console.error(err);
     setError(err.message || "Failed to send text message.");
@@ -155,9 +221,72 @@ async function handleTextSubmit(event) {
 // Audio recording + sending
 // ===========================
 
+// Live transcription: stream mic PCM over a WebSocket while the user is still speaking.
+async function startStreamingRecording() {
+  const mic = await navigator.mediaDevices.getUserMedia({ audio: true });
+  const ctx = new AudioContext({ sampleRate: STREAM_SAMPLE_RATE });
+  const url = `${ASR_STREAM_ENDPOINT}?sample_rate=${ctx.sampleRate}&session_id=${encodeURIComponent(SESSION_ID)}`;
+  const ws = new WebSocket(url);
+  ws.binaryType = "arraybuffer";
+  const source = ctx.createMediaStreamSource(mic);
+  const processor = ctx.createScriptProcessor(4096, 1, 1);
+  const userBubble = appendMessage("user", "…", new Date());
+  const finals = [];
+
+  processor.onaudioprocess = (event) => {
+    if (ws.readyState === WebSocket.OPEN) {
+      ws.send(floatTo16BitPCM(event.inputBuffer.getChannelData(0)).buffer);
+    }
+  };
+
+  ws.onmessage = (event) => {
+    const data = JSON.parse(event.data);
+    const body = userBubble.querySelector(".message-text");
+    if (data.type === "partial" || data.type === "final") {
+      if (data.type === "final") finals.push(data.text);
+      const partial = data.type === "partial" ? ` ${data.text}` : "";
+      if (body) body.textContent = (finals.join(" ") + partial).trim() || "…";
+    } else if (data.type === "transcript") {
+      if (body) body.textContent = data.text || "[no transcript]";
+      finals.length = 0;
+    } else if (data.type === "reply") {
+      appendMessage("assistant", data.text || "[empty response]", data.timestamp);
+      recordStatus.textContent = isRecording ? "Recording..." : "Idle";
+    } else if (data.type === "error") {
+      setError(data.detail || "Streaming ASR failed.");
+    }
+  };
+  ws.onerror = () => setError("Streaming ASR connection failed.");
+
+  source.connect(processor);
+  processor.connect(ctx.destination);
+  liveStream = { ws, ctx, source, processor, mic };
+}
+
+function stopStreamingRecording() {
+  if (!liveStream) return;
+  const { ws, ctx, source, processor, mic } = liveStream;
+  liveStream = null;
+  processor.disconnect();
+  source.disconnect();
+  mic.getTracks().forEach((track) => track.stop());
+  ctx.close();
+  // Server finishes the utterance, replies, then closes the socket
+  if (ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify({ type: "end" }));
+}
+
 async function toggleRecording() {
   setError("");
 
+  if (isRecording && liveStream) {
+    stopStreamingRecording();
+    isRecording = false;
+    recordBtn.textContent = "🎙 Start Recording";
+    recordBtn.classList.remove("recording");
+    recordStatus.textContent = "Processing audio...";
+    return;
+  }
+
   if (isRecording) {
     // Stop recording
     if (mediaRecorder && mediaRecorder.state === "recording") {
@@ -170,6 +299,21 @@ async function toggleRecording() {
     return;
   }
 
+  if (USE_STREAMING_ASR && window.WebSocket && window.AudioContext) {
+    try {
+      await startStreamingRecording();
+      isRecording = true;
+      recordBtn.textContent = "■ Stop Recording";
+      recordBtn.classList.add("recording");
+      recordStatus.textContent = "Recording...";
+      return;
+    } catch (err) {
+      console.error(err);
+      stopStreamingRecording();
+      // fall through to whole-clip upload
+    }
+  }
+
   // Start recording
   try {
     const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
@@ -211,6 +355,7 @@ async function sendAudioToServer(audioBlob) {
   const formData = new FormData();
   // Backend: expect field name "audio" or change as needed
   formData.append("audio", audioBlob, "recording.webm");
+  formData.append("session_id", SESSION_ID);
 
   try {
     const res = await fetch(AUDIO_ENDPOINT, {
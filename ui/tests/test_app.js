@@ -15,7 +15,7 @@
     return;
   }
 
-  const { formatTimestamp, extractTextAndTimestamp } = helpers;
+  const { formatTimestamp, extractTextAndTimestamp, parseSSE, floatTo16BitPCM } = helpers;
 
   function runTests() {
     log("Running LLM UI tests...");
@@ -51,6 +51,24 @@
     console.assert(e3.text.length === 0, "Null response text is empty string");
     log(`extractTextAndTimestamp null output: ${JSON.stringify(e3)}`);
 
+    // parseSSE: complete events plus an incomplete remainder
+    const sse = parseSSE(
+      'event: token\ndata: {"text": "Hel"}\n\nevent: token\ndata: {"text": "lo"}\n\nevent: do'
+    );
+    console.assert(sse.events.length === 2, "Should parse two complete events");
+    console.assert(
+      sse.events.map((e) => e.data.text).join("") === "Hello",
+      "Should concatenate token text"
+    );
+    console.assert(sse.rest === "event: do", "Should keep incomplete remainder");
+    log(`parseSSE output: ${JSON.stringify(sse)}`);
+
+    // floatTo16BitPCM: clamps and scales to int16
+    const pcm = floatTo16BitPCM(new Float32Array([0, 1, -1, 2, -0.5]));
+    console.assert(pcm[0] === 0 && pcm[1] === 32767 && pcm[2] === -32768, "Should scale to int16 range");
+    console.assert(pcm[3] === 32767 && pcm[4] === -16384, "Should clamp out-of-range samples");
+    log(`floatTo16BitPCM output: ${Array.from(pcm).join(",")}`);
+
     log("All basic tests executed. Check console for assertion errors.");
   }
 